@@ -35,9 +35,135 @@ OUTPUT_TXT = DATA_DIR / "surf_bases.txt"
 # 结果输出目录
 DATAGET_OUTPUT_DIR = PROJECT_ROOT / "data" / "dataGet_api"
 
+# 交易所/数据源接口地址：默认真实地址；设置 MOCK_EXCHANGE_URL 后全部指向本地模拟服务
+# （python -m dataGet.mock_server），也可逐个覆盖
+MOCK_EXCHANGE_URL: str = os.environ.get("MOCK_EXCHANGE_URL", "").rstrip("/")
+BINANCE_BASE_URL: str = os.environ.get("BINANCE_BASE_URL", MOCK_EXCHANGE_URL or "https://www.binance.com")
+BYBIT_BASE_URL: str = os.environ.get("BYBIT_BASE_URL", MOCK_EXCHANGE_URL or "https://www.bybitglobal.com")
+BYBIT_API_BASE_URL: str = os.environ.get("BYBIT_API_BASE_URL", MOCK_EXCHANGE_URL or "https://api.bybit.com")
+MEXC_BASE_URL: str = os.environ.get("MEXC_BASE_URL", MOCK_EXCHANGE_URL or "https://futures.mexc.com")
+SURF_API_BASE_URL: str = os.environ.get("SURF_API_BASE_URL", MOCK_EXCHANGE_URL or "https://surfv2-api.surf.one")
+WEEX_BASE_URL: str = os.environ.get("WEEX_BASE_URL", MOCK_EXCHANGE_URL or "https://www.weex.com")
+
 # Binance 爬虫运行参数
 # 是否无头（是否显示浏览器窗口）：优先使用 BINANCE_HEADLESS；未设置时继承 SURF_HEADLESS
 BINANCE_HEADLESS: bool = os.environ.get("BINANCE_HEADLESS", str(SURF_HEADLESS)).lower() == "true"
 # 并行线程数默认值（可通过环境变量覆盖）
 BINANCE_MAX_WORKERS: int = int(os.environ.get("BINANCE_MAX_WORKERS", "4"))
+# 调试：brackets 每种请求方式的原始返回都写入原始响应归档（默认只归档胜出的一种）
+BINANCE_DEBUG_DUMPS: bool = os.environ.get("BINANCE_DEBUG_DUMPS", "false").lower() == "true"
+# 共享 HTTP 客户端（dataGet/utils/http_client.py）：按 host 复用连接池
+HTTP2_ENABLED: bool = os.environ.get("HTTP2_ENABLED", "true").lower() == "true"  # h2 随 requirements.txt 中 httpx[http2] 安装；缺失时自动回退 HTTP/1.1
+HTTP_POOL_MAX_CONNECTIONS: int = int(os.environ.get("HTTP_POOL_MAX_CONNECTIONS", "64"))
+HTTP_POOL_MAX_KEEPALIVE: int = int(os.environ.get("HTTP_POOL_MAX_KEEPALIVE", "32"))
+HTTP_KEEPALIVE_EXPIRY: float = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", "90"))
+HTTP_TIMEOUT: float = float(os.environ.get("HTTP_TIMEOUT", "30"))
+HTTP_CONNECT_TIMEOUT: float = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "10"))
+# 整包接口（Binance brackets、MEXC detailV2、SURF profit/stats、CMC listing）的持久化缓存：
+# 条件请求（ETag/Last-Modified）或正文哈希判断未变化时，跳过筛选与结果文件重写（dataGet/utils/http_cache.py）
+HTTP_CACHE_ENABLED: bool = os.environ.get("HTTP_CACHE_ENABLED", "true").lower() == "true"
+HTTP_CACHE_DIR = Path(os.environ.get("HTTP_CACHE_DIR", str(DATAGET_OUTPUT_DIR / "_http_cache")))
+# 原始响应归档（dataGet/utils/raw_archive.py）：原始字节 gzip 压缩、按 sha256 去重存储，index.jsonl 记录每轮对应的内容
+RAW_ARCHIVE_ENABLED: bool = os.environ.get("RAW_ARCHIVE_ENABLED", "true").lower() == "true"
+RAW_ARCHIVE_DIR = Path(os.environ.get("RAW_ARCHIVE_DIR", str(DATAGET_OUTPUT_DIR / "_raw_archive")))
+RAW_ARCHIVE_KEEP_RUNS: int = int(os.environ.get("RAW_ARCHIVE_KEEP_RUNS", "168"))  # 索引只保留最近 N 轮，其余轮次独占的 blob 一并删除；0 表示不清理
+
+# 按 host 的令牌桶限速（dataGet/utils/rate_limit.py）："每秒请求数/桶容量"，0 = 不限速。
+# 键按 host 子串匹配；收到 429 / Retry-After / 限额响应头时自动降速，之后逐步恢复到这里的上限
+RATE_LIMITS: dict = {
+    "bybit": os.environ.get("RATE_LIMIT_BYBIT", "50/100"),
+    "surf": os.environ.get("RATE_LIMIT_SURF", "10/20"),
+    "mexc": os.environ.get("RATE_LIMIT_MEXC", "5/10"),
+    "binance": os.environ.get("RATE_LIMIT_BINANCE", "5/10"),
+    "weex": os.environ.get("RATE_LIMIT_WEEX", "10/20"),  # 直接下载页面只有一个请求；浏览器打开页面同样取一个令牌
+    "default": os.environ.get("RATE_LIMIT_DEFAULT", "0"),
+}
+RATE_LIMIT_ENABLED: bool = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# 单轮运行内所有请求共享的重试次数上限（dataGet/utils/retry_utils.py），0 = 不限
+RETRY_BUDGET_PER_RUN: int = int(os.environ.get("RETRY_BUDGET_PER_RUN", "200"))
+# 按交易所 + 接口的熔断器（dataGet/utils/circuit_breaker.py）：最近 WINDOW 次调用中至少 MIN_CALLS 次、
+# 失败率达到 FAILURE_RATE 时打开，其余 symbol 快速失败；COOLDOWN 秒后放行一个探测请求
+CIRCUIT_ENABLED: bool = os.environ.get("CIRCUIT_ENABLED", "true").lower() == "true"
+CIRCUIT_WINDOW: int = int(os.environ.get("CIRCUIT_WINDOW", "20"))
+CIRCUIT_MIN_CALLS: int = int(os.environ.get("CIRCUIT_MIN_CALLS", "10"))
+CIRCUIT_FAILURE_RATE: float = float(os.environ.get("CIRCUIT_FAILURE_RATE", "0.5"))
+CIRCUIT_COOLDOWN_SEC: float = float(os.environ.get("CIRCUIT_COOLDOWN_SEC", "30"))
+# Bybit 逐 symbol 风险限额：单个 AsyncClient 上的最大在途请求数
+BYBIT_MAX_INFLIGHT: int = int(os.environ.get("BYBIT_MAX_INFLIGHT", "32"))
+# Bybit 批量模式：先用公开接口 /v5/market/risk-limit 一次（按游标分页）取全部 symbol 的档位，
+# 批量结果里没有的目标再逐个请求 symbol-risk；关闭后全部逐个请求
+BYBIT_BULK_ENABLED: bool = os.environ.get("BYBIT_BULK_ENABLED", "true").lower() == "true"
+# SURF 限额并发请求数、Weex 并发浏览器实例数（可先对模拟服务压测再调整）
+SURF_CONCURRENCY: int = int(os.environ.get("SURF_CONCURRENCY", "8"))
+WEEX_CONCURRENCY: int = int(os.environ.get("WEEX_CONCURRENCY", "4"))
+# Weex 风险限额页自身请求的合约元数据接口（probe 抓到的 getMetaDataV2）；浏览器回退按此路径识别页面的数据响应，
+# `--record-fixture` 也请求它录制夹具
+WEEX_API_URL: str = os.environ.get(
+    "WEEX_API_URL",
+    f"{MOCK_EXCHANGE_URL or 'https://http-gateway1.janapw.com'}/api/v1/public/meta/getMetaDataV2?languageType=1",
+)
+# Weex 页面直取模式：先用异步 HTTP 下载服务端渲染的页面、正则解析 ul.list-settle，
+# 页面里没有渲染好的表格（需要浏览器执行脚本）时才交给浏览器；HTML_CONCURRENCY 为在途请求数
+WEEX_HTML_ENABLED: bool = os.environ.get("WEEX_HTML_ENABLED", "true").lower() == "true"
+WEEX_HTML_CONCURRENCY: int = int(os.environ.get("WEEX_HTML_CONCURRENCY", "16"))
+# Weex 浏览器回退：每个浏览器只加载一次页面，之后经页面内的币对下拉框切换（不重新加载整个应用）
+WEEX_SWITCH_ENABLED: bool = os.environ.get("WEEX_SWITCH_ENABLED", "true").lower() == "true"
+
+
+# ========== 流水线运行模式 ==========
+# inprocess：各阶段在同一进程内直接调用 main()，解析结果经进程内缓存传递；
+# subprocess：每个脚本独立子进程运行（隔离性更好，作为回退方案）
+PIPELINE_MODE: str = os.environ.get("PIPELINE_MODE", "inprocess").lower()
+
+
+# ========== 常驻进程刷新节奏（秒） ==========
+# 每个数据源按各自间隔刷新：单请求的 Binance/MEXC 可以接近实时，Weex 浏览器抓取保持低频；
+# 目标列表（SURF 币种）到期时整条流水线全量运行。只有某个数据源内容变化时才重建输出。
+REFRESH_INTERVALS: dict = {
+    "fetch_symbols": int(os.environ.get("REFRESH_SYMBOLS_SEC", "3600")),
+    "cmc_top20": int(os.environ.get("REFRESH_CMC_SEC", "3600")),
+    "binance": int(os.environ.get("REFRESH_BINANCE_SEC", "300")),
+    "bybit": int(os.environ.get("REFRESH_BYBIT_SEC", "600")),
+    "mexc": int(os.environ.get("REFRESH_MEXC_SEC", "300")),
+    "weex": int(os.environ.get("REFRESH_WEEX_SEC", "3600")),
+    "surf": int(os.environ.get("REFRESH_SURF_SEC", "900")),
+}
+# 常驻循环检查到期数据源的最长间隔
+DAEMON_TICK_SEC: int = int(os.environ.get("DAEMON_TICK_SEC", "60"))
+
+# ========== dataGet 任务超时（秒） ==========
+# 子进程运行的任务超时后杀掉整个进程树（含浏览器），返回码记为 124，不再拖住整轮调度；
+# 进程内运行的任务超时后被放弃（线程无法被杀掉），其后续的 dump_json 写出被拦截（json_store.write_guard）。
+# 设为 0 表示不限时（仍受单轮截止时间约束）
+DATAGET_TIMEOUTS: dict = {
+    "cmc_top20": int(os.environ.get("DATAGET_TIMEOUT_CMC", "120")),
+    "binance": int(os.environ.get("DATAGET_TIMEOUT_BINANCE", "300")),
+    "bybit": int(os.environ.get("DATAGET_TIMEOUT_BYBIT", "600")),
+    "mexc": int(os.environ.get("DATAGET_TIMEOUT_MEXC", "300")),
+    "weex": int(os.environ.get("DATAGET_TIMEOUT_WEEX", "1200")),
+    "surf": int(os.environ.get("DATAGET_TIMEOUT_SURF", "600")),
+}
+# 设了超时的抓取任务默认以子进程运行，超时后整树杀掉。列在这里的任务（opt-in，如 "binance,mexc"）在 inprocess
+# 模式下改为进程内运行：超时后线程只能被放弃、无法强杀，写出拦截（json_store.write_guard）只覆盖本线程的
+# dump_json，不覆盖 meta 文件、http_cache、raw_archive、运行清单，也不覆盖线程池里的工作线程。
+# 浏览器任务（weex）始终以子进程运行
+DATAGET_INPROCESS_JOBS: tuple = tuple(
+    x.strip() for x in os.environ.get("DATAGET_INPROCESS_JOBS", "").split(",") if x.strip()
+)
+
+# ========== 单轮时间预算（秒） ==========
+# 抓取阶段的截止时间 = 预算 - 留给制表/入库的时间；到期仍未完成的交易所回退到最后一次成功快照
+RUN_BUDGET_SEC: int = int(os.environ.get("RUN_BUDGET_SEC", "2700"))
+RUN_TABLE_RESERVE_SEC: int = int(os.environ.get("RUN_TABLE_RESERVE_SEC", "600"))
+FETCH_DEADLINE_SEC: int = max(60, RUN_BUDGET_SEC - RUN_TABLE_RESERVE_SEC)
+
+
+# ========== 离线录制/回放（基准测试） ==========
+# off：正常联网；record：联网并把每个 HTTP 响应与 Weex 页面写入夹具目录；replay：只读夹具，不联网
+HTTP_FIXTURE_MODE: str = os.environ.get("HTTP_FIXTURE_MODE", "off").lower()
+HTTP_FIXTURE_DIR = Path(os.environ.get("HTTP_FIXTURE_DIR", str(PROJECT_ROOT / "data" / "fixtures")))
+# 回放时按录制耗时 × 倍率等待（0 = 不等待，只测本地处理；1 = 重现录制时的网络耗时）
+HTTP_FIXTURE_DELAY_SCALE: float = float(os.environ.get("HTTP_FIXTURE_DELAY_SCALE", "0"))
 
+# 制表后是否写入数据库（离线基准测试时关闭）
+TABLEMAKE_WRITE_DB: bool = os.environ.get("TABLEMAKE_WRITE_DB", "true").lower() == "true"
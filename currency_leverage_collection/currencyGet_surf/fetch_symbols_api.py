@@ -1,15 +1,17 @@
-import json
-import time
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import List, Tuple
-
-import httpx
+from typing import Callable, List, Optional, Tuple
 
 from config import settings
+from dataGet.utils import http_cache, retry_utils
+from pipeline import tracing
+from pipeline.json_store import dump_json
+from pipeline.manifest import run_cached
 
-API_URL = "https://surfv2-api.surf.one/public/pair/profit/stats"
+API_URL = f"{settings.SURF_API_BASE_URL}/public/pair/profit/stats"
+# 除限流/5xx/网络错误外，返回正文不是 JSON（如网关错误页）也重试
+FETCH_RETRY = retry_utils.RetryPolicy(attempts=3, base=0.6, cap=5.0, retry_on=retry_utils.DEFAULT_RETRY_ON | {retry_utils.DECODE})
 
 
 @dataclass
@@ -32,9 +34,7 @@ def _save_outputs(pairs: List[SurfPair]) -> Tuple[Path, Path, Path]:
         "pairs": [p.__dict__ for p in pairs],
         "count": len(pairs),
     }
-    settings.OUTPUT_JSON.write_text(
-        json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8"
-    )
+    dump_json(settings.OUTPUT_JSON, payload)
 
     lines = ["pair,base,quote"] + [f"{p.pair},{p.base},{p.quote}" for p in pairs]
     settings.OUTPUT_CSV.write_text("\n".join(lines), encoding="utf-8")
@@ -112,7 +112,12 @@ def _extract_symbol_pair_ids(obj) -> List[dict]:
     return out
 
 
-def fetch_and_save_api() -> Tuple[Path, Path, Path]:
+def fetch_and_save_api(on_pair_ids: Optional[Callable[[Path], None]] = None) -> Tuple[Path, Path, Path]:
+    """调用 SURF API，写出 pair_id.json 与 surf_pairs.*。
+
+    on_pair_ids：pair_id.json 落盘后立即回调（DAG 调度下用于提前放行只依赖 pair_id 的任务）。
+    接口返回与上次相同时不重写任何文件（含 collected_at），下游各交易所的筛选随之跳过。
+    """
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
         "Accept": "application/json, text/plain, */*",
@@ -122,30 +127,37 @@ def fetch_and_save_api() -> Tuple[Path, Path, Path]:
     }
     timeout = settings.SURF_TIMEOUT
 
-    last_err = None
-    for attempt in range(3):
-        try:
-            resp = httpx.get(API_URL, headers=headers, timeout=timeout)
-            resp.raise_for_status()
-            data = resp.json()
-            symbols = _extract_symbols(data)
-            symbol_ids = _extract_symbol_pair_ids(data)
-            break
-        except Exception as e:
-            last_err = e
-            time.sleep(0.6 * (attempt + 1))
-    else:
-        raise RuntimeError(f"调用 API 失败: {last_err}")
+    try:
+        for attempt in FETCH_RETRY.retrying():
+            with attempt, tracing.span("surf.profit_stats", exchange="surf", attempt=attempt.number) as sp:
+                body = http_cache.fetch(API_URL, headers=headers, timeout=timeout)
+                sp.attrs["cache"] = body.how
+                body.json()
+    except Exception as e:
+        raise RuntimeError(f"调用 API 失败: {e}") from e
 
-    # 写出 pair_id.json
     pair_id_path = settings.DATA_DIR / "pair_id.json"
+    run_cached(
+        "surf_pairs", [body.path], lambda: _write_from_payload(body.json(), pair_id_path),
+        lambda _v: [pair_id_path, settings.OUTPUT_JSON, settings.OUTPUT_CSV, settings.OUTPUT_TXT],
+    )
+    if on_pair_ids is not None:
+        on_pair_ids(pair_id_path)
+    return settings.OUTPUT_JSON, settings.OUTPUT_CSV, settings.OUTPUT_TXT
+
+
+def _write_from_payload(data, pair_id_path: Path) -> Tuple[Path, Path, Path]:
+    symbols = _extract_symbols(data)
+    symbol_ids = _extract_symbol_pair_ids(data)
+
+    # 写出 pair_id.json
     pair_id_payload = {
         "source_url": API_URL,
         "collected_at": datetime.now().strftime("%Y-%m-%dT%H:%M:%S%z"),
         "items": symbol_ids,
         "count": len(symbol_ids),
     }
-    pair_id_path.write_text(json.dumps(pair_id_payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    dump_json(pair_id_path, pair_id_payload)
 
     quote = settings.SURF_QUOTE
     pairs: List[SurfPair] = []
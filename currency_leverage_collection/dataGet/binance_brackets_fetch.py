@@ -2,14 +2,20 @@ from __future__ import annotations
 
 import argparse
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, List, Tuple, Set
+from typing import Dict, List, Optional, Tuple, Set
 
 import httpx
 
 from config import settings
+from dataGet.utils import http_cache, http_client, json_stream, raw_archive
+from pipeline import tracing
+from pipeline.json_store import dump_json, load_json
+from pipeline.manifest import is_fresh, run_cached
 
-BAPI_BRACKETS_URL = "https://www.binance.com/bapi/futures/v1/friendly/future/common/brackets"
+BAPI_BRACKETS_URL = f"{settings.BINANCE_BASE_URL}/bapi/futures/v1/friendly/future/common/brackets"
 DEFAULT_HEADERS = {
     "accept": "application/json, text/plain, */*",
     "content-type": "application/json",
@@ -22,78 +28,179 @@ DEFAULT_HEADERS = {
 
 # 无需解析与过滤，仅保存原始返回
 
+# 请求方式（按原有顺序）；上次成功的方式记录在 STRATEGY_PATH，下次优先使用
+ATTEMPTS: List[Tuple[str, Dict]] = [
+    ("post_empty", {"method": "POST", "json": {}}),
+    ("post_contractType", {"method": "POST", "json": {"contractType": "PERPETUAL"}}),
+    ("post_tradeType", {"method": "POST", "json": {"tradeType": "UMFUTURE"}}),
+    ("get_fallback", {"method": "GET", "json": None}),
+]
+STRATEGY_PATH = settings.DATAGET_OUTPUT_DIR / "binance" / "_strategy.json"
+# 流式筛选：条目列表可能所在的键路径（与 _normalize 的兼容顺序一致）与 symbol 字段名
+ITEM_PATHS = [("data",), ("data", "brackets"), ("data", "list"), ("data", "items"), ("data", "rows"), ("data", "result"), ()]
+SYMBOL_KEYS = ("symbol", "s", "pair")
+SELECT_STAGE = "binance.select"
 
-def _fetch_all_brackets(timeout: float = 30.0) -> Tuple[List[Dict], Path]:
-    """一次请求抓取所有 brackets 数据，返回 (items, raw_path)。"""
-    out_dir = settings.DATAGET_OUTPUT_DIR / "binance"
-    out_dir.mkdir(parents=True, exist_ok=True)
-    raw_path = out_dir / "brackets_raw.json"
-
-    def normalize(payload: Dict) -> List[Dict]:
-        """将不同返回结构统一为 item 列表。
-        兼容：
-        - {"code":"000000","data":[...]}
-        - {"data":{"brackets":[...]}}
-        - {"data":{"list":[...]}} / items / rows / result
-        - {"data":{"BTCUSDT":{...}, ...}} map 形式
-        - 顶层直接为列表
-        """
-        data_field = payload.get("data", payload)
-        # 若 data 为 dict，可能内含 list / map
-        if isinstance(data_field, dict):
-            # 直接包含列表键
-            for k in ("brackets", "list", "items", "rows", "result"):
-                v = data_field.get(k)
-                if isinstance(v, list):
-                    return v
-            # 可能是以 symbol 为 key 的 map
-            values = list(data_field.values())
-            if values and all(isinstance(x, dict) for x in values):
-                return values
-            # 兜底：若 dict 内含单个关键键
-            return [data_field]
-        # 顶层即为列表
-        if isinstance(data_field, list):
-            return data_field
+# (选中条目, 缺失目标, 条目总数)
+Selected = Tuple[List[Dict], List[str], int]
+
+
+def _normalize(payload: Dict) -> List[Dict]:
+    """将不同返回结构统一为 item 列表。
+    兼容：
+    - {"code":"000000","data":[...]}
+    - {"data":{"brackets":[...]}}
+    - {"data":{"list":[...]}} / items / rows / result
+    - {"data":{"BTCUSDT":{...}, ...}} map 形式
+    - 顶层直接为列表
+    """
+    if isinstance(payload, list):
+        return payload
+    if not isinstance(payload, dict):
         return []
+    data_field = payload.get("data", payload)
+    # 若 data 为 dict，可能内含 list / map
+    if isinstance(data_field, dict):
+        # 直接包含列表键
+        for k in ("brackets", "list", "items", "rows", "result"):
+            v = data_field.get(k)
+            if isinstance(v, list):
+                return v
+        # 可能是以 symbol 为 key 的 map
+        values = list(data_field.values())
+        if values and all(isinstance(x, dict) for x in values):
+            return values
+        # 兜底：若 dict 内含单个关键键
+        return [data_field]
+    # 顶层即为列表
+    if isinstance(data_field, list):
+        return data_field
+    return []
+
+
+def _load_strategy() -> Optional[str]:
+    try:
+        tag = json.loads(STRATEGY_PATH.read_text(encoding="utf-8")).get("tag")
+    except Exception:
+        return None
+    return tag if any(t == tag for t, _ in ATTEMPTS) else None
+
+
+def _save_strategy(tag: str) -> None:
+    try:
+        STRATEGY_PATH.parent.mkdir(parents=True, exist_ok=True)
+        STRATEGY_PATH.write_text(json.dumps({"tag": tag, "at": time.strftime("%Y-%m-%d %H:%M:%S")}, ensure_ascii=False), encoding="utf-8")
+    except Exception:
+        pass
+
+
+def _select_inputs(cached: http_cache.CachedBody) -> List[Path]:
+    return [cached.path, settings.OUTPUT_JSON]
+
+
+def _select(cached: http_cache.CachedBody, wanted: Set[str]) -> Selected:
+    """按目标筛选 brackets：流式扫描正文，只解析目标 symbol 的条目；返回 (选中条目, 缺失目标, 条目总数)。
+
+    正文不是列表结构（如以 symbol 为 key 的 map）时回退到整包解析。
+    """
+    sel = json_stream.select(cached.path, ITEM_PATHS, wanted.__contains__, SYMBOL_KEYS)
+    if sel is None:
+        items = _normalize(cached.json())
+        selected, missing = _filter_items(items, wanted)
+        return selected, missing, len(items)
+    by_exact = {sym: it for sym, it in sel.items}  # 重复时与 _filter_items 一致，后者覆盖前者
+    selected = [by_exact[sym] for sym in sorted(wanted) if sym in by_exact]
+    missing = [sym for sym in sorted(wanted) if sym not in by_exact]
+    return selected, missing, sel.total
+
+
+def _attempt(client: httpx.Client, tag: str, req: Dict, timeout: float, out_dir: Path,
+             wanted: Set[str]) -> Optional[Tuple[Optional[Selected], http_cache.CachedBody]]:
+    """按一种请求方式抓取；有效时返回 (筛选结果, 缓存正文)，否则返回 None（请求异常照常抛出）。
+
+    正文未变化且上次已据此筛选写出（清单中该阶段仍新鲜）时不再扫描正文，筛选结果为 None，
+    由 main 中的 run_cached 直接沿用上次的 binance_selected.json。
+    """
+    cached = http_cache.fetch(
+        BAPI_BRACKETS_URL, method=req["method"], client=client,
+        headers=DEFAULT_HEADERS, json_body=req["json"], timeout=timeout,
+    )
+    if settings.BINANCE_DEBUG_DUMPS:
+        # 调试模式：本次尝试的原始返回也归档（相同内容只存一份）
+        try:
+            raw_archive.archive("binance", f"brackets.{tag}", cached.path)
+        except Exception:
+            pass
+    if not cached.changed and is_fresh(SELECT_STAGE, _select_inputs(cached)):
+        return None, cached
+    selected = _select(cached, wanted)
+    return (selected, cached) if selected[2] else None
 
-    with httpx.Client(timeout=timeout) as client:
-        attempts = [
-            ("post_empty", {"method": "POST", "json": {}}),
-            ("post_contractType", {"method": "POST", "json": {"contractType": "PERPETUAL"}}),
-            ("post_tradeType", {"method": "POST", "json": {"tradeType": "UMFUTURE"}}),
-            ("get_fallback", {"method": "GET", "json": None}),
-        ]
-        for tag, req in attempts:
+
+def _race(client: httpx.Client, attempts: List[Tuple[str, Dict]], timeout: float, out_dir: Path,
+          wanted: Set[str]) -> Optional[Tuple[str, Tuple[Optional[Selected], http_cache.CachedBody]]]:
+    """多种请求方式并发发出，取最先返回有效结果的一种；其余请求不再等待。"""
+    if not attempts:
+        return None
+    ex = ThreadPoolExecutor(max_workers=len(attempts), thread_name_prefix="binance-race")
+    fut_map = {ex.submit(tracing.wrap(_attempt), client, tag, req, timeout, out_dir, wanted): tag for tag, req in attempts}
+    try:
+        for fut in as_completed(fut_map):
             try:
-                if req["method"] == "POST":
-                    r = client.post(BAPI_BRACKETS_URL, headers=DEFAULT_HEADERS, json=req["json"]) 
-                else:
-                    r = client.get(BAPI_BRACKETS_URL, headers=DEFAULT_HEADERS)
-                r.raise_for_status()
-                data = r.json()
-                # 保存本次尝试的原始返回
-                try:
-                    (out_dir / f"{tag}_raw.json").write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
-                except Exception:
-                    pass
-                items = normalize(data)
-                if items:
-                    # 最终成功则也写一份通用 raw
-                    try:
-                        raw_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
-                    except Exception:
-                        pass
-                    return items, raw_path
+                res = fut.result()
             except Exception:
                 continue
-        return [], raw_path
+            if res is not None:
+                return fut_map[fut], res
+    finally:
+        ex.shutdown(wait=False, cancel_futures=True)
+    return None
+
+
+def _fetch_all_brackets(wanted: Set[str], timeout: float = 30.0) -> Tuple[Optional[Selected], Optional[Path], Optional[http_cache.CachedBody]]:
+    """抓取所有 brackets 数据并按目标筛选，返回 (筛选结果, 归档路径, 缓存正文)。
+
+    全部失败时返回 (None, None, None)；正文未变化且上次的筛选结果仍可沿用时筛选结果为 None。
+
+    先用上次成功的请求方式（无记录时用第一种）；失败后其余方式并发竞速，先得到有效结果者胜出，
+    并记为下次的首选。胜出的原始返回按内容归档（raw_archive），相同内容只存一份。
+    """
+    out_dir = settings.DATAGET_OUTPUT_DIR / "binance"
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    client = http_client.shared(BAPI_BRACKETS_URL)
+    preferred = _load_strategy() or ATTEMPTS[0][0]
+    first = [(t, r) for t, r in ATTEMPTS if t == preferred]
+    rest = [(t, r) for t, r in ATTEMPTS if t != preferred]
+
+    with tracing.span("binance.brackets_strategy", preferred=preferred) as sp:
+        try:
+            res = _attempt(client, preferred, first[0][1], timeout, out_dir, wanted)
+            won = (preferred, res) if res is not None else None
+        except Exception:
+            won = None
+        if won is None:
+            won = _race(client, rest, timeout, out_dir, wanted)
+            sp.attrs["raced"] = True
+        sp.attrs["strategy"] = won[0] if won else None
+    if won is None:
+        return None, None, None
+
+    tag, (selected, cached) = won
+    if tag != preferred:
+        _save_strategy(tag)
+    # 成功时归档原始字节（每轮登记一次，内容未变化时不重复存储）
+    try:
+        raw_path = raw_archive.archive("binance", "brackets", cached.path, strategy=tag)
+    except Exception:
+        raw_path = None
+    return selected, raw_path, cached
 
 
 def _load_target_symbols() -> Set[str]:
     """从 surf_pairs.json 读取 USDT 交易对，生成如 'KUSDT' 的目标符号集。"""
     surf_path = Path(__file__).resolve().parent.parent / "data" / "currency_kinds" / "surf_pairs.json"
-    data = json.loads(surf_path.read_text(encoding="utf-8"))
+    data = load_json(surf_path)
     pairs = data.get("pairs") or []
     symbols: Set[str] = set()
     for it in pairs:
@@ -142,40 +249,56 @@ def _filter_items(items: List[Dict], wanted: Set[str]) -> Tuple[List[Dict], List
     return out, missing
 
 
-def main() -> Path:
-    # 1) 请求并将原始返回落盘到 brackets_raw.json
-    items, raw_path = _fetch_all_brackets()
+def _write_selected(selected: List[Dict], missing: List[str], total: int, wanted: Set[str],
+                    raw_path: Optional[Path], selected_path: Path, meta_path: Path) -> Path:
+    dump_json(selected_path, selected)
+    meta = {
+        "source_raw": str(raw_path) if raw_path else None,
+        "total_items_all": total,
+        "wanted_count": len(wanted),
+        "selected_count": len(selected),
+        "missing_count": len(missing),
+        "missing": missing[:300],
+        "unmatched": missing[:300],
+    }
+    meta_path.write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+    return selected_path
 
-    # 2) 识别/过滤：仅保留 surf_pairs.json 中的 USDT 符号
+
+def main() -> Path:
+    # 1) 识别目标：仅保留 surf_pairs.json 中的 USDT 符号（抓取时即按目标流式筛选）
     try:
         wanted = _load_target_symbols()
     except Exception:
         wanted = set()
 
+    # 2) 请求并归档原始返回
+    with tracing.span("binance.fetch_brackets", exchange="binance") as sp:
+        selection, raw_path, cached = _fetch_all_brackets(wanted)
+        if selection is not None:
+            sp.attrs.update(items=selection[2], selected=len(selection[0]))
+        sp.attrs["cache"] = cached.how if cached else None
+
     out_dir = settings.DATAGET_OUTPUT_DIR / "binance"
     out_dir.mkdir(parents=True, exist_ok=True)
     selected_path = out_dir / "binance_selected.json"
     meta_path = out_dir / "binance_selected_meta.json"
 
-    if items and wanted:
-        selected, missing = _filter_items(items, wanted)
-        selected_path.write_text(json.dumps(selected, ensure_ascii=False, indent=2), encoding="utf-8")
-        meta = {
-            "source_raw": str(raw_path),
-            "total_items_all": len(items),
-            "wanted_count": len(wanted),
-            "selected_count": len(selected),
-            "missing_count": len(missing),
-            "missing": missing[:300],
-            "unmatched": missing[:300],
-        }
-        meta_path.write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+    total = selection[2] if selection is not None else 0
+    if wanted and cached is not None:
+        def write() -> Path:
+            # 抓取时已跳过扫描、但此时仍需重跑（如输出文件被改动）才补做筛选
+            selected, missing, n = selection if selection is not None else _select(cached, wanted)
+            return _write_selected(selected, missing, n, wanted, raw_path, selected_path, meta_path)
+
+        # 原始返回与目标列表都未变化时跳过筛选与写出，binance_selected.json 保持不变（下游据此判断无变化）
+        run_cached(SELECT_STAGE, _select_inputs(cached), write, lambda p: [p, meta_path])
     else:
         # 落空时也写入空结构，便于排查
-        selected_path.write_text(json.dumps([], ensure_ascii=False, indent=2), encoding="utf-8")
+        dump_json(selected_path, [])
         meta = {
-            "source_raw": str(raw_path),
-            "total_items_all": len(items),
+            "source_raw": str(raw_path) if raw_path else None,
+            "total_items_all": total,
             "wanted_count": len(wanted),
             "selected_count": 0,
             "missing_count": len(wanted),
@@ -184,7 +307,7 @@ def main() -> Path:
         }
         meta_path.write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
 
-    return raw_path
+    return raw_path or selected_path
 
 
 if __name__ == "__main__":
@@ -192,4 +315,4 @@ if __name__ == "__main__":
     _ = parser.parse_args()
 
     out = main()
-    print(f"已保存原始文件: {out}")
+    print(f"已保存: {out}")
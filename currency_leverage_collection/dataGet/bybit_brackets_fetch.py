@@ -1,17 +1,27 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
 import json
+import math
+import time
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
-import httpx
-
 from config import settings
-from dataGet.utils.multithread_utils import run_multithread
+from dataGet.utils import circuit_breaker, http_client, raw_archive, retry_utils
+from pipeline import tracing
+from pipeline.json_store import append_jsonl, dump_json, load_json
+from dataGet.utils.multithread_utils import print_progress_bar
 
-BYBIT_BASE = "https://www.bybitglobal.com"
+BYBIT_BASE = settings.BYBIT_BASE_URL
 API_SYMBOL_RISK = "/x-api/contract/v5/public/support/symbol-risk"
+# 批量来源：公开行情接口，一次返回全部 USDT 永续的风险限额档位（游标分页）
+BYBIT_API_BASE = settings.BYBIT_API_BASE_URL
+API_RISK_LIMIT = "/v5/market/risk-limit"
+BULK_MAX_PAGES = 50
+# 逐 symbol 请求遇到限流/5xx/网络错误时退避重试（协程内 asyncio.sleep，不占线程）
+SYMBOL_RETRY = retry_utils.RetryPolicy(attempts=3, base=0.5, cap=8.0)
 
 DEFAULT_HEADERS = {
     "accept": "application/json, text/plain, */*",
@@ -27,7 +37,7 @@ DEFAULT_HEADERS = {
 def _load_target_symbols_from_surf() -> List[str]:
     """从 surf_pairs.json 读取 base 与 quote，筛选 USDT，拼接为 BASEUSDT。"""
     surf_path = settings.OUTPUT_JSON  # data/currency_kinds/surf_pairs.json
-    data = json.loads(surf_path.read_text(encoding="utf-8"))
+    data = load_json(surf_path)
     targets: List[str] = []
     for p in data.get("pairs", []):
         base = str(p.get("base", "")).upper().strip()
@@ -50,20 +60,172 @@ def _load_target_symbols_from_surf() -> List[str]:
 # 不再调用 brief-symbol-list，按用户要求直接使用 surf 提供的目标列表
 
 
-def _fetch_symbol_risk(symbol: str, timeout: float = 25.0) -> Dict[str, Any]:
-    url = f"{BYBIT_BASE}{API_SYMBOL_RISK}?symbol={symbol}"
-    with httpx.Client(timeout=timeout, headers=DEFAULT_HEADERS) as client:
-        r = client.get(url)
+def _extract_tiers(data: Any) -> List[Dict[str, Any]]:
+    """兼容 {ret_code, result:{list:[...]}}，返回该 symbol 的档位列表。"""
+    if isinstance(data, dict):
+        result = data.get("result") or {}
+        if isinstance(result, dict):
+            lst = result.get("list")
+            if isinstance(lst, list):
+                return lst
+    return []
+
+
+def _plain2(v: Any) -> str:
+    """数值最多保留两位小数并去掉末尾的 0（"100.00" → "100"，"12.50" → "12.5"），与 symbol-risk 的写法一致。"""
+    try:
+        return f"{float(v):.2f}".rstrip("0").rstrip(".")
+    except (TypeError, ValueError):
+        return "" if v is None else str(v).strip()
+
+
+def _percent2(v: Any) -> str:
+    """小数费率 → symbol-risk 的百分数字符串（"0.005" → "0.5%"，"0.0111" → "1.11%"）。"""
+    try:
+        return f"{_plain2(float(v) * 100)}%"
+    except (TypeError, ValueError):
+        return "" if v is None else str(v).strip()
+
+
+def _bulk_tier(row: Dict[str, Any], gear: int) -> Dict[str, Any]:
+    """/v5/market/risk-limit 的一档转换为 symbol-risk 的字段与写法（制表只认后者）。
+
+    两个来源混在同一个 bybit_selected.json 里：杠杆统一为最多两位小数的字符串，费率统一为百分数，
+    同一档位无论来自哪个接口，输出内容都相同。v5 的 id 是风险限额记录号而非档位序号，gear 由调用方按档位顺序给出。
+    """
+    return {
+        "gear": str(gear),
+        "storingLocationValue": _plain2(row.get("riskLimitValue")),
+        "maintenanceMarginRate": _percent2(row.get("maintenanceMargin")),
+        "initialMarginRate": _percent2(row.get("initialMargin")),
+        "maximumLever": _plain2(row.get("maxLeverage")),
+        "mmDeduction": row.get("mmDeduction") or "",
+    }
+
+
+def _bulk_tiers(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """同一 symbol 的 v5 档位按 riskLimitValue 升序排列，gear 取排序后的位置（1 起），与 symbol-risk 一致。"""
+    def cap(row: Dict[str, Any]) -> float:
+        try:
+            return float(row.get("riskLimitValue"))
+        except (TypeError, ValueError):
+            return math.inf
+    return [_bulk_tier(row, i + 1) for i, row in enumerate(sorted(rows, key=cap))]
+
+
+def _fetch_bulk(timeout: float) -> Tuple[Dict[str, List[Dict[str, Any]]], List[bytes]]:
+    """按游标翻页读取全部 symbol 的档位；返回 ({symbol: [档位]}, 各页原始字节)。任何一页失败即抛出。"""
+    url = f"{BYBIT_API_BASE}{API_RISK_LIMIT}"
+    rows: Dict[str, List[Dict[str, Any]]] = {}
+    pages: List[bytes] = []
+    cursor = ""
+    seen = set()
+    for _ in range(BULK_MAX_PAGES):
+        params = {"category": "linear"}
+        if cursor:
+            params["cursor"] = cursor
+        r = http_client.get(url, params=params, timeout=timeout, extensions={"trace_attrs": {"page": len(pages) + 1}})
         r.raise_for_status()
-        return {
-            "symbol": symbol,
-            "url": url,
-            "status": r.status_code,
-            "data": r.json(),
-        }
+        data = r.json()
+        if not isinstance(data, dict) or data.get("retCode") not in (0, "0"):
+            raise ValueError(f"risk-limit 返回异常: {str(data)[:200]}")
+        pages.append(r.content)
+        result = data.get("result") or {}
+        for row in result.get("list") or []:
+            sym = str(row.get("symbol") or "").upper()
+            if sym:
+                rows.setdefault(sym, []).append(row)
+        cursor = str(result.get("nextPageCursor") or "")
+        if not cursor or cursor in seen:
+            break
+        seen.add(cursor)
+    return {sym: _bulk_tiers(lst) for sym, lst in rows.items()}, pages
+
+
+def _percentile(values: List[float], q: float) -> float:
+    """最近秩百分位（q 取 0~100）。"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[k]
+
 
+class _StreamWriter:
+    """结果到达即按间隔追加到 bybit_selected.partial.jsonl（每次只写新增的 symbol），结束时一次性写出
+    bybit_selected.json 并删除部分结果文件；中途被截止时间放弃时部分结果留在 .partial.jsonl 里。"""
 
-def main(max_symbols: Optional[int] = None, max_workers: Optional[int] = None) -> Path:
+    def __init__(self, path: Path, symbols: List[str], flush_sec: float = 1.0):
+        self.path = path
+        self.partial = path.with_suffix(".partial.jsonl")
+        self.symbols = symbols
+        self.flush_sec = flush_sec
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.raw: Dict[str, bytes] = {}  # 逐 symbol 请求的原始响应字节（归档用）
+        self._unwritten: List[str] = []
+        self._flushed_at = time.monotonic()
+        self.partial.unlink(missing_ok=True)
+
+    def add(self, item: Dict[str, Any], raw: Optional[bytes] = None) -> None:
+        self.results[item["symbol"]] = item
+        self._unwritten.append(item["symbol"])
+        if raw is not None:
+            self.raw[item["symbol"]] = raw
+        print_progress_bar(len(self.results), len(self.symbols))
+        if time.monotonic() - self._flushed_at >= self.flush_sec:
+            self.append()
+
+    def combined(self) -> Dict[str, List[Dict[str, Any]]]:
+        # 按目标列表顺序输出，内容不变时文件字节也不变（增量跳过按文件哈希判断）
+        return {sym: _extract_tiers(self.results[sym].get("data")) for sym in self.symbols if sym in self.results}
+
+    def ordered_results(self) -> List[Dict[str, Any]]:
+        return [self.results[sym] for sym in self.symbols if sym in self.results]
+
+    def append(self) -> None:
+        """把上次追加之后到达的结果写入 .partial.jsonl（每行 {"symbol", "tiers"}）。"""
+        syms, self._unwritten = self._unwritten, []
+        append_jsonl(self.partial, ({"symbol": sym, "tiers": _extract_tiers(self.results[sym].get("data"))} for sym in syms))
+        self._flushed_at = time.monotonic()
+
+    def flush(self) -> None:
+        """最终写出：按目标顺序整体写一次 bybit_selected.json，部分结果文件随之删除。"""
+        dump_json(self.path, self.combined())
+        self._unwritten.clear()
+        self.partial.unlink(missing_ok=True)
+
+
+async def _fetch_all(symbols: List[str], max_inflight: int, timeout: float, writer: _StreamWriter) -> List[float]:
+    """一个 AsyncClient + 信号量限制在途请求数；返回每个请求的耗时（秒）。"""
+    sem = asyncio.Semaphore(max(1, max_inflight))
+    latencies: List[float] = []
+    breaker = circuit_breaker.get("bybit", "symbol-risk")
+
+    async with http_client.async_client(BYBIT_BASE, max_connections=max_inflight) as client:
+
+        async def one(symbol: str) -> None:
+            url = f"{BYBIT_BASE}{API_SYMBOL_RISK}?symbol={symbol}"
+            async with sem:
+                t0 = time.perf_counter()
+                try:
+                    async for attempt in SYMBOL_RETRY.aretrying():
+                        with attempt, breaker.guard():
+                            r = await client.get(url, headers=DEFAULT_HEADERS, timeout=timeout,
+                                                 extensions={"trace_attrs": {"symbol": symbol, "attempt": attempt.number}})
+                            r.raise_for_status()
+                            item: Dict[str, Any] = {"symbol": symbol, "url": url, "status": r.status_code, "data": r.json()}
+                            raw: Optional[bytes] = r.content
+                except Exception as e:
+                    item, raw = {"symbol": symbol, "url": url, "error": str(e)}, None
+                latencies.append(time.perf_counter() - t0)
+            writer.add(item, raw)
+
+        await asyncio.gather(*(one(sym) for sym in symbols))
+    return latencies
+
+
+def main(max_symbols: Optional[int] = None, max_inflight: Optional[int] = None, timeout: float = 25.0,
+         bulk: Optional[bool] = None) -> Path:
     out_dir = settings.DATAGET_OUTPUT_DIR / "bybit"
     out_dir.mkdir(parents=True, exist_ok=True)
 
@@ -75,63 +237,81 @@ def main(max_symbols: Optional[int] = None, max_workers: Optional[int] = None) -
     # Step 2. 按用户要求：不做交集，直接使用 surf 列表
     final_syms = list(target_syms)
 
-    # Step 3. 并发拉取 support/symbol-risk
-    if max_workers is None:
-        try:
-            max_workers = int(getattr(settings, "BINANCE_MAX_WORKERS", 8))
-        except Exception:
-            max_workers = 8
+    combined_file = out_dir / "bybit_selected.json"
+    writer = _StreamWriter(combined_file, final_syms)
+    t0 = time.perf_counter()
 
-    def job(sym: str) -> Optional[Dict[str, Any]]:
-        try:
-            return _fetch_symbol_risk(sym)
-        except Exception as e:
-            return {"symbol": sym, "error": str(e)}
-
-    results = run_multithread(func=job, data_list=final_syms, max_workers=max_workers, show_progress=True)
-
-    # Step 4. 落盘 raw（合并成一个文件）
-    out_file = out_dir / "support_symbol_risk_raw.json"
-    out_file.write_text(json.dumps({"symbols": final_syms, "results": results}, ensure_ascii=False, indent=2), encoding="utf-8")
-
-    # 额外：提取每个 symbol 的 result.list，输出一个便于直接消费的合并文件
-    combined: Dict[str, Any] = {}
-    for item in results:
-        sym = item.get("symbol") if isinstance(item, dict) else None
-        data = item.get("data") if isinstance(item, dict) else None
-        tiers = []
-        if isinstance(data, dict):
-            # 兼容 {ret_code, result:{list:[...]}}
-            ret_code = data.get("ret_code")
-            result = data.get("result") or {}
-            if isinstance(result, dict):
-                lst = result.get("list")
-                if isinstance(lst, list):
-                    tiers = lst
-        if sym:
-            combined[sym] = tiers
+    # Step 3. 批量模式：一次（分页）取全部档位，目标中有的直接写入
+    bulk = bulk if bulk is not None else settings.BYBIT_BULK_ENABLED
+    bulk_pages: List[bytes] = []
+    bulk_error: Optional[str] = None
+    if bulk:
+        bulk_url = f"{BYBIT_API_BASE}{API_RISK_LIMIT}?category=linear"
+        with tracing.span("bybit.bulk_risk_limit", exchange="bybit") as sp:
+            try:
+                bulk_tiers, bulk_pages = _fetch_bulk(timeout)
+            except Exception as e:
+                bulk_tiers, bulk_error = {}, str(e)
+                print(f"批量接口失败，全部改为逐个请求: {e}")
+            sp.attrs.update(pages=len(bulk_pages), symbols=len(bulk_tiers))
+        for sym in final_syms:
+            if bulk_tiers.get(sym):
+                writer.add({"symbol": sym, "url": bulk_url, "source": "bulk", "data": {"result": {"list": bulk_tiers[sym]}}})
+    fallback_syms = [sym for sym in final_syms if sym not in writer.results]
+    if bulk:
+        print(f"批量接口覆盖 {len(final_syms) - len(fallback_syms)}/{len(final_syms)} 个（{len(bulk_pages)} 页），其余 {len(fallback_syms)} 个逐个请求")
 
-    combined_file = out_dir / "bybit_selected.json"
-    combined_file.write_text(json.dumps(combined, ensure_ascii=False, indent=2), encoding="utf-8")
+    # Step 4. 其余 symbol 异步并发拉取 support/symbol-risk，结果边到边追加到 bybit_selected.partial.jsonl
+    max_inflight = max_inflight or settings.BYBIT_MAX_INFLIGHT
+    latencies: List[float] = []
+    p50 = p95 = 0.0
+    if fallback_syms:
+        print(f"异步拉取 {len(fallback_syms)} 个 symbol，在途上限 {max_inflight}...")
+        with tracing.span("bybit.fetch_symbol_risk", exchange="bybit", symbols=len(fallback_syms), max_inflight=max_inflight) as sp:
+            latencies = asyncio.run(_fetch_all(fallback_syms, max_inflight, timeout, writer))
+            p50, p95 = _percentile(latencies, 50), _percentile(latencies, 95)
+            sp.attrs.update(p50_ms=round(p50 * 1000, 1), p95_ms=round(p95 * 1000, 1))
+    wall = time.perf_counter() - t0
+    results = writer.ordered_results()
+    errors = sum(1 for r in results if "error" in r)
+    print(f"Bybit 完成 {len(results)} 个（失败 {errors}），用时 {wall:.1f}s，逐个请求延迟 p50={p50 * 1000:.0f}ms p95={p95 * 1000:.0f}ms")
+
+    # Step 5. 归档原始响应（逐 symbol 的返回各自按内容去重，未变化的 symbol 不重复存储）与最终的合并文件
+    raw_path = raw_archive.archive_parts("bybit", "symbol_risk", writer.raw, symbols=len(final_syms))
+    if bulk_pages:
+        raw_archive.archive_parts("bybit", "risk_limit_bulk", {f"page{i:03d}": b for i, b in enumerate(bulk_pages, 1)})
+    writer.flush()
 
     # 同时保存 meta
     meta = {
         "requested_from_surf": len(target_syms),
         "intersect_count": len(final_syms),
         "results_count": len(results),
+        "errors_count": errors,
         "api_symbol_risk": f"{BYBIT_BASE}{API_SYMBOL_RISK}?symbol=",
+        "api_risk_limit": f"{BYBIT_API_BASE}{API_RISK_LIMIT}?category=linear" if bulk else None,
+        "bulk_pages": len(bulk_pages),
+        "bulk_count": len(final_syms) - len(fallback_syms),
+        "bulk_error": bulk_error,
+        "fallback_count": len(fallback_syms),
         "selected_file": str(combined_file),
+        "raw_archive": str(raw_path) if raw_path else None,
+        "max_inflight": max_inflight,
+        "wall_sec": round(wall, 3),
+        "latency_ms": {"p50": round(p50 * 1000, 1), "p95": round(p95 * 1000, 1), "max": round(max(latencies, default=0.0) * 1000, 1)},
+        "circuit": circuit_breaker.snapshot("bybit"),
     }
     (out_dir / "bybit_selected_meta.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
 
-    return out_file
+    return combined_file
 
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Bybit: 拉取 brief-symbol-list 与 support/symbol-risk（与 surf_pairs.json 交集），仅保存原始 raw")
+    parser = argparse.ArgumentParser(description="Bybit: 批量 risk-limit + 缺失目标逐个 support/symbol-risk（目标取自 surf_pairs.json），仅保存原始 raw")
     parser.add_argument("--max-symbols", type=int, default=None, help="最多处理的交易对数量（调试用）")
-    parser.add_argument("--max-workers", type=int, default=None, help="最大并发线程数")
+    parser.add_argument("--max-inflight", type=int, default=None, help="最大在途请求数（默认 settings.BYBIT_MAX_INFLIGHT）")
+    parser.add_argument("--no-bulk", action="store_true", help="不用批量接口，全部逐个请求")
     args = parser.parse_args()
 
-    out = main(max_symbols=args.max_symbols, max_workers=args.max_workers)
+    out = main(max_symbols=args.max_symbols, max_inflight=args.max_inflight, bulk=False if args.no_bulk else None)
     print(f"已保存: {out}")
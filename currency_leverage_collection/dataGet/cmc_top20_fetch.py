@@ -3,9 +3,12 @@ from __future__ import annotations
 import json
 import re
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
-import httpx
+from dataGet.utils import http_cache, http_client
+from pipeline import tracing
+from pipeline.json_store import dump_json
+from pipeline.manifest import run_cached
 
 BASE_URL = "https://coinmarketcap.com/"
 DATA_API = (
@@ -30,17 +33,13 @@ SYMBOL_HTML_RE = re.compile(r'class="[^"\n]*coin-item-symbol[^"\n]*">\s*([A-Z0-9
 
 
 def _fetch_home() -> str:
-    with httpx.Client(timeout=30.0, headers=HEADERS) as client:
-        resp = client.get(BASE_URL)
-        resp.raise_for_status()
-        return resp.text
+    resp = http_client.get(BASE_URL, headers=HEADERS, timeout=30.0)
+    resp.raise_for_status()
+    return resp.text
 
 
-def _fetch_data_api() -> dict:
-    with httpx.Client(timeout=30.0, headers=HEADERS) as client:
-        r = client.get(DATA_API)
-        r.raise_for_status()
-        return r.json()
+def _fetch_data_api() -> http_cache.CachedBody:
+    return http_cache.fetch(DATA_API, headers=HEADERS, timeout=30.0)
 
 
 def _parse_next_data(html: str) -> Dict[str, Any]:
@@ -68,21 +67,20 @@ def _fetch_coingecko_top(limit: int = 60) -> List[Dict[str, Any]]:
         "https://api.coingecko.com/api/v3/coins/markets"
         f"?vs_currency=usd&order=market_cap_desc&per_page={limit}&page=1&sparkline=false&price_change_percentage=24h"
     )
-    with httpx.Client(timeout=30.0, headers=HEADERS) as client:
-        r = client.get(url)
-        r.raise_for_status()
-        data = r.json()
-        out: List[Dict[str, Any]] = []
-        if isinstance(data, list):
-            for it in data:
-                if not isinstance(it, dict):
-                    continue
-                sym = str(it.get("symbol") or "").upper().strip()
-                if not sym:
-                    continue
-                mc = _to_float(it.get("market_cap"))
-                out.append({"name": sym, "marketcap": mc})
-        return out
+    r = http_client.get(url, headers=HEADERS, timeout=30.0)
+    r.raise_for_status()
+    data = r.json()
+    out: List[Dict[str, Any]] = []
+    if isinstance(data, list):
+        for it in data:
+            if not isinstance(it, dict):
+                continue
+            sym = str(it.get("symbol") or "").upper().strip()
+            if not sym:
+                continue
+            mc = _to_float(it.get("market_cap"))
+            out.append({"name": sym, "marketcap": mc})
+    return out
 
 
 def _extract_listing(data: Dict[str, Any]) -> List[Dict[str, Any]]:
@@ -168,10 +166,11 @@ def _extract_market_cap(item: Dict[str, Any]) -> float | None:
 EXCLUDE = {"USDT", "USDC"}
 
 
-def fetch_top20() -> List[Dict[str, Any]]:
-    # 1) 优先尝试 data-api（稳定 JSON）
+def fetch_top20(api_json: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    # 1) 优先尝试 data-api（稳定 JSON）；api_json 为 None 表示 data-api 请求失败，直接走回退
     try:
-        api_json = _fetch_data_api()
+        if api_json is None:
+            raise RuntimeError("data-api unavailable")
         data = api_json.get("data") or {}
         crypto = data.get("cryptoCurrencyList") or data.get("list") or []
         result: List[Dict[str, Any]] = []
@@ -250,10 +249,27 @@ def fetch_top20() -> List[Dict[str, Any]]:
     raise RuntimeError("Unable to obtain 20 symbols after all fallbacks (CMC + HTML + CoinGecko)")
 
 
+def _top20_from_cache(api: http_cache.CachedBody) -> Path:
+    try:
+        api_json = api.json()
+    except ValueError:
+        # data-api 返回非 JSON（如 HTML 拦截页）时与请求失败一样走回退
+        api_json = None
+    return dump_json(OUT_FILE, fetch_top20(api_json))
+
+
 def main() -> Path:
-    data = fetch_top20()
-    OUT_FILE.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
-    return OUT_FILE
+    with tracing.span("cmc.fetch_top20", exchange="cmc") as sp:
+        try:
+            api = _fetch_data_api()
+        except Exception:
+            api = None
+        if api is None:
+            return dump_json(OUT_FILE, fetch_top20())
+        sp.attrs["cache"] = api.how
+        # data-api 返回未变化时跳过解析，cmc_top20.json 保持不变
+        path, _skipped = run_cached("cmc_top20", [api.path], lambda: _top20_from_cache(api), lambda p: [p])
+    return path
 
 
 if __name__ == "__main__":
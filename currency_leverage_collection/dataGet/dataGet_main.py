@@ -1,17 +1,30 @@
 from __future__ import annotations
 
+import importlib
+import json
+import os
+import signal
 import sys
 import subprocess
+import threading
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import traceback
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config import settings
+from dataGet.utils import circuit_breaker, rate_limit, retry_utils
+from pipeline import last_good, tracing
+from pipeline.json_store import WriteCancelled, write_guard
+from pipeline.dag import DagJob, DagScheduler, JobRecord
 
 BASE_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BASE_DIR.parent
 PYTHON = sys.executable or "python"
 
-# 五个数据获取脚本（按需调整路径）
+# 数据获取脚本（按需调整路径）
 SCRIPTS = {
+    "cmc_top20": BASE_DIR / "cmc_top20_fetch.py",
     "binance": BASE_DIR / "binance_brackets_fetch.py",
     "bybit": BASE_DIR / "bybit_brackets_fetch.py",
     "mexc": BASE_DIR / "mexc_brackets_fetch.py",
@@ -19,11 +32,118 @@ SCRIPTS = {
     "surf": BASE_DIR / "surf_limits_fetch.py",
 }
 
+# 进程内模式：脚本对应的模块入口与参数（与各脚本 __main__ 中的默认调用保持一致）
+MODULES: Dict[str, Tuple[str, Dict[str, Any]]] = {
+    "cmc_top20": ("dataGet.cmc_top20_fetch", {}),
+    "binance": ("dataGet.binance_brackets_fetch", {}),
+    "bybit": ("dataGet.bybit_brackets_fetch", {}),
+    "mexc": ("dataGet.mexc_brackets_fetch", {}),
+    "weex": ("dataGet.weex_brackets_fetch", {"headless": True, "render_timeout": 15.0, "concurrency": settings.WEEX_CONCURRENCY}),
+    "surf": ("dataGet.surf_limits_fetch", {"concurrency": settings.SURF_CONCURRENCY}),
+}
+
+# 各任务真正依赖的输入产物与产出（DAG 调度用）：
+# - CMC 不依赖任何上游；
+# - 四家交易所只依赖目标列表 surf_pairs；
+# - SURF 限额只依赖 pair_id。
+JOB_DEPS: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+    "cmc_top20": ((), ("cmc_top20",)),
+    "binance": (("surf_pairs",), ("binance",)),
+    "bybit": (("surf_pairs",), ("bybit",)),
+    "mexc": (("surf_pairs",), ("mexc",)),
+    "weex": (("surf_pairs",), ("weex",)),
+    "surf": (("pair_id",), ("surf_limits",)),
+}
+
+# 各任务的结果文件（常驻模式据此判断数据是否变化）
+_OUT = PROJECT_ROOT / "data" / "dataGet_api"
+OUTPUT_FILES: Dict[str, Path] = {
+    "cmc_top20": _OUT / "cmc" / "cmc_top20.json",
+    "binance": _OUT / "binance" / "binance_selected.json",
+    "bybit": _OUT / "bybit" / "bybit_selected.json",
+    "mexc": _OUT / "mexc" / "mexc_selected.json",
+    "weex": _OUT / "weex" / "weex_selected.json",
+    "surf": _OUT / "surf" / "surf_limits.json",
+}
+
+# 交易所产物（制表阶段的软依赖）
+EXCHANGE_ARTIFACTS: Tuple[str, ...] = ("binance", "bybit", "mexc", "weex", "surf_limits")
+
 LOG_DIR = BASE_DIR.parent / "data" / "dataGet_api" / "_logs"
 LOG_DIR.mkdir(parents=True, exist_ok=True)
 
+# 超时返回码（与 coreutils timeout 一致）
+TIMEOUT_RC = 124
+# 脚本正常退出但结果文件为空（如全部请求失败时写出 []）：按失败处理，制表回退到最后一次成功快照
+EMPTY_RC = 3
+# 上次被放弃的进程内线程仍未结束、本次无法启动（未设超时的任务；设了超时的改以子进程运行）
+STUCK_RC = 75
+# 浏览器类任务始终以子进程运行：卡死的 Chrome 只有在独立进程树里才能被可靠地杀掉
+ISOLATED = {"weex"}
+
+# 运行中的任务：子进程可以整树杀掉；进程内线程无法强杀，只能标记放弃并拦截其后续写出
+_RUNNING_LOCK = threading.Lock()
+_PROCS: Dict[str, subprocess.Popen] = {}
+_THREADS: Dict[str, Tuple[threading.Thread, threading.Event]] = {}
+_ABANDONED_AT: Dict[str, float] = {}  # 进程内线程被放弃的时刻，用于报告卡住了多久
+
+# 历史耗时（秒，指数平均），用于最长任务优先；无记录时用经验值
+DURATIONS_PATH = LOG_DIR / "_durations.json"
+DEFAULT_DURATIONS: Dict[str, float] = {
+    "weex": 600.0,
+    "bybit": 120.0,
+    "surf": 60.0,
+    "binance": 30.0,
+    "mexc": 30.0,
+    "cmc_top20": 10.0,
+}
+_DUR_LOCK = threading.Lock()
+
 
-def _run_script(name: str, script_path: Path, extra_args: List[str] | None = None) -> Tuple[str, int, Path, Path, float]:
+def load_durations() -> Dict[str, float]:
+    out = dict(DEFAULT_DURATIONS)
+    try:
+        data = json.loads(DURATIONS_PATH.read_text(encoding="utf-8"))
+        out.update({k: float(v) for k, v in data.items()})
+    except Exception:
+        pass
+    return out
+
+
+def _record_duration(name: str, dur: float) -> None:
+    with _DUR_LOCK:
+        hist = load_durations()
+        prev = hist.get(name)
+        hist[name] = round(dur if prev is None else 0.7 * prev + 0.3 * dur, 2)
+        DURATIONS_PATH.write_text(json.dumps(hist, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def _child_env() -> Dict[str, str]:
+    """子进程环境：保证项目根在 PYTHONPATH 中，`from config import settings` 可直接导入。"""
+    env = dict(os.environ)
+    paths = [str(PROJECT_ROOT)]
+    if env.get("PYTHONPATH"):
+        paths.append(env["PYTHONPATH"])
+    env["PYTHONPATH"] = os.pathsep.join(paths)
+    return tracing.child_env(env)
+
+
+def _kill_tree(proc: subprocess.Popen) -> None:
+    """杀掉子进程及其派生的全部进程（chromedriver / Chrome 等）。"""
+    try:
+        if os.name == "nt":
+            subprocess.call(["taskkill", "/T", "/F", "/PID", str(proc.pid)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, OSError):
+        pass
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def _run_script(name: str, script_path: Path, extra_args: List[str] | None = None, python: str = PYTHON, timeout: Optional[float] = None) -> Tuple[str, int, Optional[Path], Optional[Path], float]:
     start = time.time()
     extra_args = extra_args or []
     if not script_path.exists():
@@ -32,69 +152,240 @@ def _run_script(name: str, script_path: Path, extra_args: List[str] | None = Non
     stdout_path = LOG_DIR / f"{name}.stdout.log"
     stderr_path = LOG_DIR / f"{name}.stderr.log"
 
+    # 子进程放入独立的进程组，超时时可整组杀掉
+    group = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP} if os.name == "nt" else {"start_new_session": True}
     with stdout_path.open("w", encoding="utf-8", buffering=1) as f_out, stderr_path.open("w", encoding="utf-8", buffering=1) as f_err:
-        cmd = [PYTHON, str(script_path), *extra_args]
-        proc = subprocess.Popen(cmd, stdout=f_out, stderr=f_err, cwd=str(BASE_DIR))
-        rc = proc.wait()
+        cmd = [python, str(script_path), *extra_args]
+        proc = subprocess.Popen(cmd, stdout=f_out, stderr=f_err, cwd=str(BASE_DIR), env=_child_env(), **group)
+        with _RUNNING_LOCK:
+            _PROCS[name] = proc
+        try:
+            rc = proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            print(f"[{name}] 超时 {timeout:.0f}s，终止进程树", file=f_err)
+            _kill_tree(proc)
+            rc = TIMEOUT_RC
+        finally:
+            with _RUNNING_LOCK:
+                if _PROCS.get(name) is proc:
+                    del _PROCS[name]
     dur = time.time() - start
     return name, rc, stdout_path, stderr_path, dur
 
 
-def main(parallel: int = 4) -> None:
-    # 先抓取 CMC Top20（过滤 USDT/USDC）
-    cmc_script = BASE_DIR / "cmc_top20_fetch.py"
-    if cmc_script.exists():
-        print("[cmc_top20] 开始获取 CoinMarketCap Top20（排除 USDT/USDC）…")
-        name, rc, outp, errp, dur = _run_script("cmc_top20", cmc_script, [])
-        status = "OK" if rc == 0 else f"FAIL({rc})"
-        print(f"[cmc_top20] 完成: {status} 用时 {dur:.1f}s  日志: {outp.name} / {errp.name}")
+def _call_module(name: str, mod: Any, kwargs: Dict[str, Any], cancelled: threading.Event) -> int:
+    try:
+        with write_guard(cancelled):
+            mod.main(**kwargs)
+        return 0
+    except WriteCancelled as e:
+        print(f"[{name}] {e}", file=sys.stderr)
+        return TIMEOUT_RC
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception:
+        print(f"[{name}] 异常:\n{traceback.format_exc()}", file=sys.stderr)
+        return 1
+
+
+def _run_module(name: str, timeout: Optional[float] = None) -> Tuple[str, int, Optional[Path], Optional[Path], float]:
+    """进程内直接调用抓取脚本的 main()，输出沿用当前进程的 stdout/stderr。
+
+    线程无法被强制终止：超时或被 abort() 放弃后不再等待（返回 TIMEOUT_RC），该线程之后的 dump_json
+    被拦截（json_store.write_guard）；线程仍未结束时不会再启动同一任务的第二个副本（返回 STUCK_RC）。
+    """
+    start = time.time()
+    stuck = _stuck_for(name)
+    if stuck is not None:
+        print(f"[{name}] 上次被放弃的线程已卡住 {stuck:.0f}s 仍未结束，本次不再启动", file=sys.stderr)
+        return name, STUCK_RC, None, None, 0.0
+    module, kwargs = MODULES[name]
+    t0 = time.time()
+    mod = importlib.import_module(module)
+    import_dur = time.time() - t0
+    box: Dict[str, int] = {}
+    cancelled = threading.Event()
+    # 线程带上当前上下文：span 挂在任务 span 之下，追踪写入本轮的文件
+    run = tracing.wrap(lambda: box.update(rc=_call_module(name, mod, kwargs, cancelled)))
+    worker = threading.Thread(target=run, name=f"dataGet-{name}", daemon=True)
+    with _RUNNING_LOCK:
+        _THREADS[name] = (worker, cancelled)
+    worker.start()
+    end = None if timeout is None else time.monotonic() + timeout
+    while worker.is_alive() and not cancelled.is_set():
+        worker.join(0.5 if end is None else max(0.0, min(0.5, end - time.monotonic())))
+        if end is not None and time.monotonic() >= end:
+            break
+    if worker.is_alive():
+        cancelled.set()
+        with _RUNNING_LOCK:
+            _ABANDONED_AT.setdefault(name, time.time())
+        print(f"[{name}] 超时或已被放弃，不再等待（之后的结果写出被拦截）", file=sys.stderr)
+        rc = TIMEOUT_RC
     else:
-        print("[cmc_top20] 跳过：脚本不存在")
+        rc = box.get("rc", 1)
+    dur = time.time() - start
+    print(f"[{name}] 导入 {import_dur:.2f}s")
+    return name, rc, None, None, dur
 
-    # 任务列表：可在此为各脚本添加自定义参数
-    jobs: List[Tuple[str, Path, List[str]]] = [
-        ("binance", SCRIPTS["binance"], []),
-        ("bybit", SCRIPTS["bybit"], []),
-        ("mexc", SCRIPTS["mexc"], []),
-        ("weex", SCRIPTS["weex"], []),
-        ("surf", SCRIPTS["surf"], []),
-    ]
 
-    print(f"将并行运行 {len(jobs)} 个数据获取任务（线程池大小={parallel}）...\n日志目录: {LOG_DIR}")
+def abort(name: str) -> None:
+    """放弃一个运行中的任务：子进程杀掉整个进程树；进程内线程标记放弃，之后的结果写出被拦截。"""
+    with _RUNNING_LOCK:
+        proc = _PROCS.get(name)
+        thread = _THREADS.get(name)
+    if proc is not None and proc.poll() is None:
+        print(f"[{name}] 已被放弃，终止进程树")
+        _kill_tree(proc)
+    if thread is not None and thread[0].is_alive():
+        thread[1].set()
+        with _RUNNING_LOCK:
+            _ABANDONED_AT.setdefault(name, time.time())
 
-    results: Dict[str, Dict[str, str]] = {}
-    with ThreadPoolExecutor(max_workers=max(1, parallel)) as ex:
-        fut_map = {ex.submit(_run_script, name, path, args): name for (name, path, args) in jobs}
-        for fut in as_completed(fut_map):
-            name = fut_map[fut]
+
+def _stuck_for(name: str) -> Optional[float]:
+    """同名任务上次被放弃的进程内线程仍在运行时，返回它被放弃后已过去的秒数；否则返回 None。"""
+    with _RUNNING_LOCK:
+        prev = _THREADS.get(name)
+        if prev is None or not prev[0].is_alive():
+            _ABANDONED_AT.pop(name, None)
+            return None
+        return time.time() - _ABANDONED_AT.get(name, time.time())
+
+
+def _run_job(name: str, script_path: Path, extra_args: List[str], mode: str, python: str = PYTHON) -> Tuple[str, int, Optional[Path], Optional[Path], float]:
+    timeout = settings.DATAGET_TIMEOUTS.get(name) or None
+    # 进程内运行：未设超时的任务，或显式列入 DATAGET_INPROCESS_JOBS 的任务（超时后放弃线程，只拦截其 dump_json）；
+    # 其余设了超时的任务必须能被整树杀掉，以子进程运行
+    inprocess_ok = timeout is None or name in settings.DATAGET_INPROCESS_JOBS
+    if mode == "inprocess" and name in MODULES and name not in ISOLATED and inprocess_ok:
+        stuck = _stuck_for(name)
+        if stuck is None or timeout is None:
+            return _run_module(name, timeout=timeout)
+        # 上次的线程卡住时，设了超时的任务改以子进程运行，不让一个卡死的线程拖垮之后的每一轮
+        print(f"[{name}] 上次被放弃的线程已卡住 {stuck:.0f}s 仍未结束，本次改以子进程运行", file=sys.stderr)
+    return _run_script(name, script_path, extra_args, python=python, timeout=timeout)
+
+
+def _log_names(outp: Optional[Path], errp: Optional[Path]) -> str:
+    if outp is None or errp is None:
+        return "(进程内)"
+    return f"{outp.name} / {errp.name}"
+
+
+def build_jobs(mode: str, results: Dict[str, Dict[str, str]], python: str = PYTHON, only: Optional[Iterable[str]] = None) -> List[DagJob]:
+    """构造抓取任务的 DAG 节点；每个任务结束后把结果写入 results 并打印一行状态。
+
+    only：仅构造其中列出的任务（常驻模式下本轮到期的数据源）。
+    """
+
+    def make(name: str, gave_up: threading.Event):
+        def run() -> int:
+            if gave_up.is_set():
+                return TIMEOUT_RC
             try:
-                n, rc, outp, errp, dur = fut.result()
-                results[name] = {
-                    "returncode": str(rc),
-                    "stdout": str(outp),
-                    "stderr": str(errp),
-                    "duration_sec": f"{dur:.2f}",
-                }
-                status = "OK" if rc == 0 else f"FAIL({rc})"
-                print(f"[{name}] 完成: {status} 用时 {dur:.1f}s  日志: {outp.name} / {errp.name}")
+                _, rc, outp, errp, dur = _run_job(name, SCRIPTS[name], [], mode, python=python)
             except Exception as e:
-                results[name] = {
-                    "returncode": "EXC",
-                    "stdout": "",
-                    "stderr": str(e),
-                    "duration_sec": "-1",
-                }
+                results[name] = {"returncode": "EXC", "stdout": "", "stderr": str(e), "duration_sec": "-1"}
                 print(f"[{name}] 异常: {e}")
+                return 1
+            results[name] = {
+                "returncode": str(rc),
+                "stdout": str(outp or "-"),
+                "stderr": str(errp or "-"),
+                "duration_sec": f"{dur:.2f}",
+            }
+            if gave_up.is_set():
+                # 调度器已按截止时间放弃：制表已读过快照，迟到的结果不登记为最后一次成功
+                results[name]["returncode"] = str(TIMEOUT_RC)
+                print(f"[{name}] 已超过本轮截止时间被放弃，结果不计入本轮 用时 {dur:.1f}s")
+                return TIMEOUT_RC
+            if rc != TIMEOUT_RC:
+                # 超时的耗时只是上限，不计入历史
+                _record_duration(name, dur)
+            if rc == 0 and not last_good.save(name, OUTPUT_FILES[name]):
+                rc = EMPTY_RC
+                results[name]["returncode"] = str(rc)
+            status = "OK" if rc == 0 else {TIMEOUT_RC: "TIMEOUT", EMPTY_RC: "EMPTY", STUCK_RC: "STUCK"}.get(rc, f"FAIL({rc})")
+            print(f"[{name}] 完成: {status} 用时 {dur:.1f}s  日志: {_log_names(outp, errp)}")
+            return rc
+        return run
 
+    def cancel(name: str, gave_up: threading.Event):
+        def stop() -> None:
+            gave_up.set()
+            abort(name)
+        return stop
+
+    # 同时就绪的任务按历史耗时从长到短提交
+    durations = load_durations()
+    wanted = set(only) if only is not None else None
+    jobs: List[DagJob] = []
+    for name, (inputs, outputs) in JOB_DEPS.items():
+        if wanted is not None and name not in wanted:
+            continue
+        gave_up = threading.Event()
+        jobs.append(DagJob(
+            name=name, func=make(name, gave_up), inputs=inputs, outputs=outputs,
+            priority=durations.get(name, 0.0), expires=True, cancel=cancel(name, gave_up),
+        ))
+    return jobs
+
+
+def write_freshness(records: Dict[str, JobRecord], ran: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """本轮抓取的数据源按是否按时成功标记新鲜度；未抓取的沿用现有文件。"""
+    ran = set(ran)
+    ok = {name: name not in ran or (name in records and records[name].status == "ok") for name in JOB_DEPS}
+    fresh = last_good.write_freshness(ok)
+    for name, f in fresh.items():
+        if f["status"] == "stale":
+            print(f"[{name}] 本轮未按时成功，回退到最后一次成功快照（{f['age_sec']}s 前）")
+        elif f["status"] == "missing":
+            print(f"[{name}] 本轮未按时成功，且没有可用快照")
+    return fresh
+
+
+def print_summary(results: Dict[str, Dict[str, str]], records: Optional[Dict[str, JobRecord]] = None) -> None:
     print("\n=== 汇总 ===")
     for name in SCRIPTS.keys():
         r = results.get(name)
         if not r:
             print(f"- {name}: 未运行")
             continue
-        print(f"- {name}: rc={r['returncode']} dur={r['duration_sec']}s out={r['stdout']} err={r['stderr']}")
+        rec = (records or {}).get(name)
+        wait = ""
+        if rec is not None and rec.started_at is not None and rec.ready_at is not None:
+            # 排队等待（就绪→开始）与实际运行分开统计
+            wait = f" wait={rec.started_at - rec.ready_at:.2f}s"
+        print(f"- {name}: rc={r['returncode']} run={r['duration_sec']}s{wait} out={r['stdout']} err={r['stderr']}")
+
+
+def main(parallel: Optional[int] = None, mode: Optional[str] = None, deadline: Optional[float] = None) -> None:
+    mode = mode or settings.PIPELINE_MODE
+    trace_path = tracing.ensure_trace("dataGet_main")
+    retry_utils.new_run()
+    circuit_breaker.new_run()
+
+    # 独立运行时 surf_pairs / pair_id 已由上一步写好，视为初始就绪产物
+    results: Dict[str, Dict[str, str]] = {}
+    jobs = build_jobs(mode, results)
+    # 线程池默认与任务数一致，任何任务都不必排在别的任务后面
+    workers = max(1, parallel or len(jobs))
+    print(f"按依赖图运行 {len(jobs)} 个数据获取任务（线程池大小={workers}, 模式={mode}）...\n日志目录: {LOG_DIR}")
+    sched = DagScheduler(jobs, initial=("surf_pairs", "pair_id"), max_workers=workers, deadline=deadline or settings.FETCH_DEADLINE_SEC)
+    with tracing.span("dataGet_main", mode=mode):
+        sched.run()
+
+    print_summary(results, sched.records)
+    write_freshness(sched.records, sched.jobs)
+    print(sched.report())
+    print(rate_limit.describe())
+    print(retry_utils.describe())
+    print(circuit_breaker.describe())
+    print(f"追踪文件: {trace_path}")
 
 
 if __name__ == "__main__":
-    # 默认线程池容量=4，如需调整可直接改 main(parallel=..)
-    main(parallel=4)
+    # 线程池默认按任务数开满，如需限制可传 main(parallel=..)
+    # 独立运行时默认以子进程隔离各抓取脚本
+    main(mode="subprocess")
@@ -3,15 +3,19 @@ from __future__ import annotations
 import argparse
 import json
 from pathlib import Path
-from typing import Any, Dict, List, Optional
-
-import httpx
+from typing import Any, Dict, List, Optional, Tuple
 
 from config import settings
+from dataGet.utils import http_cache, json_stream, raw_archive
+from pipeline import tracing
+from pipeline.json_store import dump_json, load_json
+from pipeline.manifest import run_cached
 
-MEXC_BASE = "https://futures.mexc.com"
+MEXC_BASE = settings.MEXC_BASE_URL
 API_DETAIL_V2 = "/api/v1/contract/detailV2?client=web"
 API_TICKER = "/api/v1/contract/ticker?"  # 全量ticker
+# 流式筛选时 ticker 列表可能所在的键路径（与 _price_map 的兼容顺序一致）
+TICKER_PATHS = [("data",), ("symbolTicker",), ("list",), ()]
 
 DEFAULT_HEADERS = {
     "accept": "application/json, text/plain, */*",
@@ -38,7 +42,7 @@ def _num(v):
 def _load_target_symbols_flat_from_surf() -> List[str]:
     """从 surf_pairs.json 读取 base 与 quote，筛选 USDT，拼接为 BASEUSDT（无下划线）。"""
     surf_path = settings.OUTPUT_JSON  # data/currency_kinds/surf_pairs.json
-    data = json.loads(surf_path.read_text(encoding="utf-8"))
+    data = load_json(surf_path)
     targets: List[str] = []
     for p in data.get("pairs", []):
         base = str(p.get("base", "")).upper().strip()
@@ -55,23 +59,38 @@ def _load_target_symbols_flat_from_surf() -> List[str]:
     return sorted(set(targets))
 
 
-def _fetch_detail_v2(timeout: float = 30.0) -> Dict[str, Any]:
-    url = f"{MEXC_BASE}{API_DETAIL_V2}"
-    with httpx.Client(timeout=timeout, headers=DEFAULT_HEADERS) as client:
-        r = client.get(url)
-        r.raise_for_status()
-        return r.json()
+def _fetch_detail_v2(timeout: float = 30.0) -> http_cache.CachedBody:
+    return http_cache.fetch(f"{MEXC_BASE}{API_DETAIL_V2}", headers=DEFAULT_HEADERS, timeout=timeout)
+
+
+def _fetch_tickers(timeout: float = 20.0) -> http_cache.CachedBody:
+    return http_cache.fetch(f"{MEXC_BASE}{API_TICKER}", headers=DEFAULT_HEADERS, timeout=timeout)
+
+
+def _flat(sym: str) -> str:
+    return "".join(ch for ch in sym if ch.isalnum())
+
 
+def _detail_items(detail: http_cache.CachedBody, targets_flat: List[str]) -> Tuple[Optional[List[Dict[str, Any]]], int]:
+    """流式扫描 detailV2 的 data，只解析目标 symbol（去掉下划线后匹配）的条目；返回 (条目, data 条目总数)。"""
+    wanted = set(targets_flat)
+    sel = json_stream.select(detail.path, [("data",)], lambda s: _flat(s) in wanted)
+    if sel is None:
+        return None, 0
+    return [it for _, it in sel.items], sel.total
 
-def _fetch_tickers(timeout: float = 20.0) -> Dict[str, float]:
-    """获取全量 ticker，返回 { 'BTC_USDT': price_float, ... }。
+
+def _ticker_data(tickers: http_cache.CachedBody, targets_flat: List[str]) -> Any:
+    """只取目标 symbol 的 ticker；结构无法识别时回退到整包解析。"""
+    wanted = set(targets_flat)
+    sel = json_stream.select(tickers.path, TICKER_PATHS, lambda s: _flat(s) in wanted, ("symbol", "s"))
+    return [it for _, it in sel.items] if sel is not None else tickers.json()
+
+
+def _price_map(data: Any) -> Dict[str, float]:
+    """全量 ticker 转为 { 'BTC_USDT': price_float, ... }。
     兼容字段名：lastPrice、last_price、price、last
     """
-    url = f"{MEXC_BASE}{API_TICKER}"
-    with httpx.Client(timeout=timeout, headers=DEFAULT_HEADERS) as client:
-        r = client.get(url)
-        r.raise_for_status()
-        data = r.json()
     price_map: Dict[str, float] = {}
     # 期望 data 为 list
     lst = None
@@ -94,8 +113,8 @@ def _fetch_tickers(timeout: float = 20.0) -> Dict[str, float]:
     return price_map
 
 
-def _extract_combined(detail: Dict[str, Any], targets_flat: List[str], price_map: Dict[str, float]) -> tuple[Dict[str, Any], Dict[str, List[str]]]:
-    """从 detailV2 的 data 中筛选出 USDT 计价目标，并转换为 { BTCUSDT: [tiers...] }。
+def _extract_combined(data_list: Optional[List[Dict[str, Any]]], targets_flat: List[str], price_map: Dict[str, float]) -> tuple[Dict[str, Any], Dict[str, List[str]]]:
+    """从 detailV2 的 data 条目（已按目标预筛）中筛选出 USDT 计价目标，并转换为 { BTCUSDT: [tiers...] }。
 
     唯一性匹配策略：
     - 先基于 API 全量构建 flat 符号索引：flat = symbol.replace('_','')
@@ -112,7 +131,6 @@ def _extract_combined(detail: Dict[str, Any], targets_flat: List[str], price_map
         state_ok = 1 if it.get("state") == 0 else 0
         return (has_rlcs, rlcs_len, state_ok)
 
-    data_list = detail.get("data")
     if not isinstance(data_list, list):
         # 返回空字典与空诊断
         return result, {"matched": [], "no_tiers": [], "unmatched": list(targets_flat)}
@@ -206,36 +224,49 @@ def main(max_symbols: Optional[int] = None) -> Path:
     if max_symbols:
         target_syms_flat = target_syms_flat[:max_symbols]
 
-    # 2) 拉取 detailV2（一次性大包）
-    detail = _fetch_detail_v2()
-    # 2.1) 拉取全量 ticker 价格
-    price_map = _fetch_tickers()
+    # 2) 拉取 detailV2（一次性大包，带缓存：未变化时 304 或哈希一致）
+    with tracing.span("mexc.fetch", exchange="mexc") as sp:
+        detail = _fetch_detail_v2()
+        # 2.1) 拉取全量 ticker 价格
+        tickers = _fetch_tickers()
+        sp.attrs.update(detail_cache=detail.how, ticker_cache=tickers.how)
 
-    # 3) 落盘原始返回
-    raw_file = out_dir / "detailV2_raw.json"
-    raw_file.write_text(json.dumps(detail, ensure_ascii=False, indent=2), encoding="utf-8")
+    # 3) 归档原始返回：原始字节压缩、按内容去重（未变化时只登记本轮，不重复存储）
+    raw_file = raw_archive.archive("mexc", "detailV2", detail.path)
+    raw_archive.archive("mexc", "ticker", tickers.path)
 
-    # 4) 提取合并（以 BTCUSDT 作为键，值为 rlcs 列表）
-    combined, diag = _extract_combined(detail, target_syms_flat, price_map)
+    # 4) 提取合并（以 BTCUSDT 作为键，值为 rlcs 列表）；detailV2、ticker 与目标列表都未变化时跳过
     combined_file = out_dir / "mexc_selected.json"
-    combined_file.write_text(json.dumps(combined, ensure_ascii=False, indent=2), encoding="utf-8")
-
-    # 5) meta
-    meta = {
-        "targets_from_surf": len(target_syms_flat),
-        "matched_count": len(diag.get("matched", [])),
-        "no_tiers_count": len(diag.get("no_tiers", [])),
-        "unmatched_count": len(diag.get("unmatched", [])),
-        "api_detail_v2": f"{MEXC_BASE}{API_DETAIL_V2}",
-        "note": "keys are BASEQUOTE (no underscore), tiers from rlcs: lv, vol, mmr, imr, mlev",
-        "selected_file": str(combined_file),
-    }
-    (out_dir / "mexc_selected_meta.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
-    # 额外输出诊断列表
-    (out_dir / "detailV2_unmatched.txt").write_text("\n".join(diag.get("unmatched", [])), encoding="utf-8")
-    (out_dir / "detailV2_no_tiers.txt").write_text("\n".join(diag.get("no_tiers", [])), encoding="utf-8")
-
-    return raw_file
+
+    def select() -> Path:
+        with tracing.span("mexc.extract", exchange="mexc") as sp:
+            items, total = _detail_items(detail, target_syms_flat)
+            combined, diag = _extract_combined(items, target_syms_flat, _price_map(_ticker_data(tickers, target_syms_flat)))
+            sp.attrs.update(scanned=total, parsed=len(items or []))
+        dump_json(combined_file, combined)
+
+        # 5) meta
+        meta = {
+            "targets_from_surf": len(target_syms_flat),
+            "detail_items_total": total,
+            "matched_count": len(diag.get("matched", [])),
+            "no_tiers_count": len(diag.get("no_tiers", [])),
+            "unmatched_count": len(diag.get("unmatched", [])),
+            "api_detail_v2": f"{MEXC_BASE}{API_DETAIL_V2}",
+            "note": "keys are BASEQUOTE (no underscore), tiers from rlcs: lv, vol, mmr, imr, mlev",
+            "selected_file": str(combined_file),
+        }
+        (out_dir / "mexc_selected_meta.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+        # 额外输出诊断列表
+        (out_dir / "detailV2_unmatched.txt").write_text("\n".join(diag.get("unmatched", [])), encoding="utf-8")
+        (out_dir / "detailV2_no_tiers.txt").write_text("\n".join(diag.get("no_tiers", [])), encoding="utf-8")
+        return combined_file
+
+    run_cached(
+        "mexc.select", [detail.path, tickers.path, settings.OUTPUT_JSON], select,
+        lambda p: [p], force=bool(max_symbols),
+    )
+    return raw_file or combined_file
 
 
 if __name__ == "__main__":
@@ -0,0 +1,419 @@
+"""
+本地模拟交易所服务（压测并发参数用，不连外网、不会被封）
+
+    python -m dataGet.mock_server --port 8900 --symbols 300 --latency-ms 80 --latency-p95-ms 400 --rps 20
+    MOCK_EXCHANGE_URL=http://127.0.0.1:8900 python main.py      # 所有抓取脚本指向模拟服务
+
+模拟的接口（按路径路由，与真实接口返回结构一致）：
+- binance_brackets   POST/GET /bapi/futures/v1/friendly/future/common/brackets
+- bybit_symbol_risk  GET /x-api/contract/v5/public/support/symbol-risk?symbol=BTCUSDT
+- bybit_risk_limit   GET /v5/market/risk-limit?category=linear&cursor=...（每页 BULK_PAGE_SIZE 个 symbol；
+                     约 2% 的币种不在批量列表中，模拟新上线币种，用于验证逐个请求的回退）
+- mexc_detail        GET /api/v1/contract/detailV2
+- mexc_ticker        GET /api/v1/contract/ticker
+- surf_stats         GET /public/pair/profit/stats
+- surf_config        GET /pool/pair/config?pair_id=1
+- weex_page          GET /zh-CN/futures/introduction/risk-limit?code=cmt_btcusdt
+
+每个接口可单独配置（--profile JSON：{"default": {...}, "bybit_symbol_risk": {...}}），字段见 `Profile`：
+延迟分布（fixed/uniform/normal/lognormal，统一用中位数与 P95 描述）、每秒请求数上限与并发上限
+（超出返回 429 + Retry-After）、随机 429 比例、随机 5xx 比例。
+成功响应带 ETag，请求携带相同的 If-None-Match 时返回 304（验证条件请求缓存）。
+GET /_stats 返回各接口的请求数、429/5xx 次数与峰值并发，退出时也会打印。
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+BULK_PAGE_SIZE = 100
+_MAJORS = ["BTC", "ETH", "SOL", "BNB", "XRP", "DOGE", "ADA", "TRX", "AVAX", "LINK", "TON", "DOT", "LTC", "BCH", "NEAR"]
+
+
+@dataclass
+class Profile:
+    latency: str = "fixed"  # fixed / uniform / normal / lognormal
+    latency_ms: float = 0.0  # 中位数（fixed 时即固定值）
+    latency_p95_ms: float = 0.0  # P95，决定分布宽度
+    rps: float = 0.0  # 每秒请求数上限（令牌桶），0 = 不限
+    burst: float = 0.0  # 令牌桶容量，0 = 与 rps 相同
+    max_inflight: int = 0  # 并发上限，0 = 不限
+    rate_429: float = 0.0  # 额外随机 429 的比例
+    retry_after: float = 1.0  # 429 的 Retry-After（秒）
+    error_rate: float = 0.0  # 随机 5xx 的比例
+
+    @classmethod
+    def from_dict(cls, base: "Profile", data: Dict[str, Any]) -> "Profile":
+        known = {f.name for f in fields(cls)}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(f"未知的配置项: {', '.join(sorted(unknown))}")
+        return cls(**{**asdict(base), **data})
+
+    def sample_delay(self, rng: random.Random) -> float:
+        """返回本次请求的延迟（秒）。"""
+        med = max(0.0, self.latency_ms)
+        p95 = max(med, self.latency_p95_ms)
+        if self.latency == "fixed" or p95 == med:
+            ms = med
+        elif self.latency == "uniform":
+            half = (p95 - med) / 0.9
+            ms = rng.uniform(med - half, med + half)
+        elif self.latency == "normal":
+            ms = rng.gauss(med, (p95 - med) / 1.645)
+        elif self.latency == "lognormal":
+            ms = rng.lognormvariate(math.log(max(med, 1e-3)), math.log(p95 / max(med, 1e-3)) / 1.645)
+        else:
+            raise ValueError(f"未知的延迟分布: {self.latency}")
+        return max(0.0, ms) / 1000.0
+
+
+class _Endpoint:
+    """单个接口的限流状态与统计。"""
+
+    def __init__(self, name: str, profile: Profile):
+        self.name = name
+        self.profile = profile
+        self.tokens = profile.burst or profile.rps
+        self.refilled_at = time.monotonic()
+        self.inflight = 0
+        self.stats = {"requests": 0, "ok": 0, "429": 0, "5xx": 0, "peak_inflight": 0, "delay_sec": 0.0}
+        self.lock = threading.Lock()
+
+    def admit(self, rng: random.Random) -> Optional[Tuple[int, str]]:
+        """登记一次请求；需要拒绝时返回 (状态码, 原因)。"""
+        p = self.profile
+        with self.lock:
+            self.stats["requests"] += 1
+            if p.rps > 0:
+                now = time.monotonic()
+                cap = p.burst or p.rps
+                self.tokens = min(cap, self.tokens + (now - self.refilled_at) * p.rps)
+                self.refilled_at = now
+                if self.tokens < 1.0:
+                    self.stats["429"] += 1
+                    return 429, "rate limit"
+                self.tokens -= 1.0
+            if p.max_inflight and self.inflight >= p.max_inflight:
+                self.stats["429"] += 1
+                return 429, "too many concurrent requests"
+            if p.rate_429 and rng.random() < p.rate_429:
+                self.stats["429"] += 1
+                return 429, "injected 429"
+            if p.error_rate and rng.random() < p.error_rate:
+                self.stats["5xx"] += 1
+                return rng.choice((500, 502, 503)), "injected error"
+            self.inflight += 1
+            self.stats["peak_inflight"] = max(self.stats["peak_inflight"], self.inflight)
+        return None
+
+    def done(self, delay: float) -> None:
+        with self.lock:
+            self.inflight -= 1
+            self.stats["ok"] += 1
+            self.stats["delay_sec"] += delay
+
+
+# ---- 确定性的模拟数据 ----
+def _seed_of(text: str) -> int:
+    return int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def make_bases(n: int) -> List[str]:
+    extra = [f"C{i:03d}" for i in range(max(0, n - len(_MAJORS)))]
+    return (_MAJORS + extra)[:n]
+
+
+def _tiers(base: str) -> List[Dict[str, float]]:
+    """每个币种 3~8 档：名义价值逐档翻倍，杠杆逐档减半，维持保证金率逐档上升。"""
+    r = random.Random(_seed_of(base))
+    n = r.randint(3, 8)
+    cap = 50_000.0 * (20 if base in _MAJORS[:2] else 1) * r.choice((1, 2, 5))
+    lev = r.choice((125, 100, 75, 50, 25))
+    mmr = r.choice((0.004, 0.005, 0.01, 0.02))
+    out = []
+    floor = 0.0
+    for i in range(n):
+        out.append({"lv": i + 1, "floor": floor, "cap": cap, "lev": max(1, int(lev)), "mmr": round(mmr, 4)})
+        floor, cap, lev, mmr = cap, cap * 2, lev / 2, mmr * 2
+    return out
+
+
+def _price(base: str) -> float:
+    return round(0.01 + random.Random(_seed_of("px" + base)).random() * 1000, 4)
+
+
+class MockData:
+    def __init__(self, bases: List[str]):
+        self.bases = bases
+        self.pair_ids = {b: str(1000 + i) for i, b in enumerate(bases)}
+        self.by_pair_id = {v: k for k, v in self.pair_ids.items()}
+
+    def binance_brackets(self, q: Dict[str, str]) -> Tuple[int, Any]:
+        items = []
+        for b in self.bases:
+            items.append({
+                "symbol": f"{b}USDT",
+                "riskBrackets": [{
+                    "bracketSeq": t["lv"],
+                    "bracketNotionalFloor": t["floor"],
+                    "bracketNotionalCap": t["cap"],
+                    "bracketMaintenanceMarginRate": t["mmr"],
+                    "maxOpenPosLeverage": t["lev"],
+                } for t in _tiers(b)],
+            })
+        return 200, {"code": "000000", "data": {"brackets": items}, "success": True}
+
+    def bybit_symbol_risk(self, q: Dict[str, str]) -> Tuple[int, Any]:
+        sym = (q.get("symbol") or "").upper()
+        base = sym[:-4] if sym.endswith("USDT") else sym
+        if base not in self.pair_ids:
+            return 200, {"ret_code": 10001, "ret_msg": "symbol not found", "result": {}}
+        # 与真实接口写法一致：费率为百分数字符串，数值去掉末尾的 0
+        lst = [{
+            "gear": str(t["lv"]),
+            "storingLocationValue": f"{t['cap']:.0f}",
+            "maintenanceMarginRate": f"{round(t['mmr'] * 100, 2):g}%",
+            "initialMarginRate": f"{round(100 / t['lev'], 2):g}%",
+            "maximumLever": str(t["lev"]),
+            "mmDeduction": "",
+        } for t in _tiers(base)]
+        return 200, {"ret_code": 0, "ret_msg": "OK", "result": {"list": lst}}
+
+    def bybit_risk_limit(self, q: Dict[str, str]) -> Tuple[int, Any]:
+        listed = [b for b in self.bases if b in _MAJORS or _seed_of("bulk" + b) % 50]
+        try:
+            start = int(q.get("cursor") or 0)
+        except ValueError:
+            return 200, {"retCode": 10001, "retMsg": "invalid cursor", "result": {}}
+        page = listed[start:start + BULK_PAGE_SIZE]
+        # 与真实接口一致：id 是全局的风险限额记录号，不等于档位序号
+        lst = [{
+            "id": int(self.pair_ids[b]) * 100 + t["lv"],
+            "symbol": f"{b}USDT",
+            "riskLimitValue": str(t["cap"]),
+            "maintenanceMargin": str(t["mmr"]),
+            "initialMargin": str(round(1 / t["lev"], 4)),
+            "isLowestRisk": 1 if t["lv"] == 1 else 0,
+            "maxLeverage": f"{t['lev']:.2f}",
+            "mmDeduction": "",
+        } for b in page for t in _tiers(b)]
+        nxt = str(start + BULK_PAGE_SIZE) if start + BULK_PAGE_SIZE < len(listed) else ""
+        return 200, {"retCode": 0, "retMsg": "OK", "result": {"category": "linear", "list": lst, "nextPageCursor": nxt}}
+
+    def mexc_detail(self, q: Dict[str, str]) -> Tuple[int, Any]:
+        data = []
+        for b in self.bases:
+            cs = 0.0001 if b == "BTC" else 1.0
+            px = _price(b)
+            data.append({
+                "symbol": f"{b}_USDT",
+                "cs": cs,
+                "state": 0,
+                "rlcs": [{
+                    "lv": t["lv"],
+                    "vol": round(t["cap"] / (cs * px)),
+                    "mmr": t["mmr"],
+                    "imr": round(1 / t["lev"], 4),
+                    "mlev": t["lev"],
+                } for t in _tiers(b)],
+            })
+        return 200, {"success": True, "code": 0, "data": data}
+
+    def mexc_ticker(self, q: Dict[str, str]) -> Tuple[int, Any]:
+        return 200, {"success": True, "code": 0, "data": [{"symbol": f"{b}_USDT", "lastPrice": _price(b)} for b in self.bases]}
+
+    def surf_stats(self, q: Dict[str, str]) -> Tuple[int, Any]:
+        lst = [{"symbol": b, "pair_id": pid} for b, pid in self.pair_ids.items()]
+        return 200, {"errno": "200", "data": {"list": lst}}
+
+    def surf_config(self, q: Dict[str, str]) -> Tuple[int, Any]:
+        base = self.by_pair_id.get(q.get("pair_id") or "")
+        if base is None:
+            return 404, {"errno": "404", "msg": "pair not found"}
+        top = _tiers(base)[0]
+        return 200, {"errno": "200", "data": {
+            "pair_name": f"{base}/USDT",
+            "max_leverage": top["lev"],
+            "max_order_size": str(top["cap"]),
+            "max_mmr": top["mmr"],
+        }}
+
+    def weex_page(self, q: Dict[str, str]) -> Tuple[int, str]:
+        code = (q.get("code") or "").lower()
+        base = code[len("cmt_"):-len("usdt")].upper() if code.startswith("cmt_") and code.endswith("usdt") else ""
+        rows = ['<li class="list-title"><span>档位</span><span>持仓数量</span><span>最高杠杆</span><span>维持保证金率</span></li>']
+        if base in self.pair_ids:
+            for t in _tiers(base):
+                rows.append(
+                    f'<li><span>{t["lv"]}</span><span>{t["floor"]:,.0f} ~ {t["cap"]:,.0f} USDT</span>'
+                    f'<span>{t["lev"]}x</span><span>{t["mmr"] * 100:.2f}%</span></li>'
+                )
+        # 与真实页面一样带当前币对标签；未知合约按默认合约 BTC/USDT 显示
+        label = f'<span class="coin-pair">{base if base in self.pair_ids else "BTC"}/USDT<i class="el-icon-arrow-down"></i></span>'
+        return 200, f'<!doctype html><html><body>{label}<ul class="list-settle">{"".join(rows)}</ul></body></html>'
+
+
+ROUTES: Dict[str, str] = {
+    "/bapi/futures/v1/friendly/future/common/brackets": "binance_brackets",
+    "/x-api/contract/v5/public/support/symbol-risk": "bybit_symbol_risk",
+    "/v5/market/risk-limit": "bybit_risk_limit",
+    "/api/v1/contract/detailV2": "mexc_detail",
+    "/api/v1/contract/ticker": "mexc_ticker",
+    "/public/pair/profit/stats": "surf_stats",
+    "/pool/pair/config": "surf_config",
+    "/zh-CN/futures/introduction/risk-limit": "weex_page",
+}
+
+
+class MockExchangeServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 512  # 压测时瞬间建立大量连接，默认的 5 会导致 SYN 重传、凭空多出约 1s 延迟
+
+    def __init__(self, addr: Tuple[str, int], data: MockData, profiles: Dict[str, Profile], seed: Optional[int] = None):
+        super().__init__(addr, _Handler)
+        self.data = data
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        default = profiles.get("default", Profile())
+        self.endpoints = {name: _Endpoint(name, profiles.get(name, default)) for name in ROUTES.values()}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        out = {}
+        for name, ep in self.endpoints.items():
+            with ep.lock:
+                s = dict(ep.stats)
+            delay = s.pop("delay_sec")
+            s["avg_delay_ms"] = round(delay / s["ok"] * 1000, 1) if s["ok"] else 0.0
+            out[name] = s
+        return out
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: MockExchangeServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt: str, *args: Any) -> None:  # 压测时请求量大，不逐条打印
+        pass
+
+    def _send(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        if isinstance(body, str):
+            raw, ctype = body.encode("utf-8"), "text/html; charset=utf-8"
+        else:
+            raw, ctype = json.dumps(body, ensure_ascii=False).encode("utf-8"), "application/json"
+        if status == 200:
+            etag = f'"{hashlib.md5(raw).hexdigest()}"'
+            headers = {**(headers or {}), "ETag": etag}
+            if self.headers.get("If-None-Match") == etag:
+                status, raw = 304, b""
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(raw)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _handle(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        parts = urlsplit(self.path)
+        if parts.path == "/_stats":
+            self._send(200, self.server.stats())
+            return
+        name = ROUTES.get(parts.path.rstrip("/") or "/")
+        if name is None:
+            self._send(404, {"error": f"unknown path {parts.path}"})
+            return
+        ep = self.server.endpoints[name]
+        with self.server.rng_lock:
+            rejected = ep.admit(self.server.rng)
+            delay = ep.profile.sample_delay(self.server.rng)
+        if rejected is not None:
+            status, reason = rejected
+            headers = {"Retry-After": f"{ep.profile.retry_after:g}"} if status == 429 else None
+            self._send(status, {"error": reason}, headers)
+            return
+        try:
+            time.sleep(delay)
+            q = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+            handler: Callable[[Dict[str, str]], Tuple[int, Any]] = getattr(self.server.data, name)
+            status, body = handler(q)
+            self._send(status, body)
+        finally:
+            ep.done(delay)
+
+    do_GET = _handle
+    do_POST = _handle
+
+
+def load_profiles(path: Optional[str], default: Profile) -> Dict[str, Profile]:
+    profiles = {"default": default}
+    if not path:
+        return profiles
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    base = Profile.from_dict(default, raw.pop("default", {}) or {})
+    profiles["default"] = base
+    for name, cfg in raw.items():
+        if name not in ROUTES.values():
+            raise ValueError(f"未知的接口: {name}（可选: {', '.join(ROUTES.values())}）")
+        profiles[name] = Profile.from_dict(base, cfg or {})
+    return profiles
+
+
+def serve(host: str = "127.0.0.1", port: int = 0, symbols: int = 300,
+          profiles: Optional[Dict[str, Profile]] = None, seed: Optional[int] = None) -> MockExchangeServer:
+    """在后台线程启动模拟服务并返回（port=0 时自动分配端口，见 server.base_url）。"""
+    srv = MockExchangeServer((host, port), MockData(make_bases(symbols)), profiles or {}, seed=seed)
+    threading.Thread(target=srv.serve_forever, name="mock_exchange", daemon=True).start()
+    return srv
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="本地模拟交易所服务（延迟、429、错误注入）")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8900)
+    ap.add_argument("--symbols", type=int, default=300, help="模拟的币种数量")
+    ap.add_argument("--profile", help="按接口配置的 JSON 文件")
+    ap.add_argument("--seed", type=int, default=None, help="随机种子（延迟/注入可复现）")
+    d = Profile()
+    for f in fields(Profile):
+        ap.add_argument(f"--{f.name.replace('_', '-')}", type=type(getattr(d, f.name)), default=getattr(d, f.name),
+                        help=f"所有接口的默认 {f.name}")
+    args = ap.parse_args(argv)
+
+    default = Profile(**{f.name: getattr(args, f.name) for f in fields(Profile)})
+    srv = serve(args.host, args.port, args.symbols, load_profiles(args.profile, default), seed=args.seed)
+    print(f"[mock] 已启动 {srv.base_url}（{args.symbols} 个币种），设置 MOCK_EXCHANGE_URL={srv.base_url} 让抓取脚本指向本服务")
+    print(f"[mock] 统计: {srv.base_url}/_stats，Ctrl+C 退出")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.shutdown()
+        print(json.dumps(srv.stats(), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
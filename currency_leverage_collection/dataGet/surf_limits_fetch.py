@@ -10,6 +10,9 @@ from typing import Any, Dict, List, Tuple
 import httpx
 
 from config import settings
+from dataGet.utils import circuit_breaker, http_client, retry_utils
+from pipeline import tracing
+from pipeline.json_store import dump_json, load_json
 
 PAIR_ID_JSON = settings.DATA_DIR / "pair_id.json"
 OUT_BASE = settings.DATAGET_OUTPUT_DIR / "surf"
@@ -17,7 +20,7 @@ OUT_BASE.mkdir(parents=True, exist_ok=True)
 OUT_JSON = OUT_BASE / "surf_limits.json"
 OUT_META = OUT_BASE / "surf_limits_meta.json"
 
-API_DETAIL = "https://surfv2-api.surf.one/pool/pair/config"
+API_DETAIL = f"{settings.SURF_API_BASE_URL}/pool/pair/config"
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
@@ -31,7 +34,7 @@ HEADERS = {
 def _load_pair_ids(path: Path) -> List[Tuple[str, str]]:
     if not path.exists():
         raise FileNotFoundError(f"pair_id.json 不存在: {path}")
-    data = json.loads(path.read_text(encoding="utf-8"))
+    data = load_json(path)
     items = data.get("items") or []
     out: List[Tuple[str, str]] = []
     for it in items:
@@ -45,47 +48,50 @@ def _load_pair_ids(path: Path) -> List[Tuple[str, str]]:
     return out
 
 
+@retry_utils.RetryPolicy(attempts=3, base=0.4, cap=5.0, retry_on=retry_utils.DEFAULT_RETRY_ON | {retry_utils.DECODE})
+def _get_detail(client: httpx.Client, pair_id: str, timeout: float) -> Any:
+    with circuit_breaker.get("surf", "pair_config").guard():
+        r = client.get(API_DETAIL, params={"pair_id": pair_id}, headers=HEADERS, timeout=timeout)
+        r.raise_for_status()
+    return r.json()
+
+
 def _fetch_one(client: httpx.Client, symbol: str, pair_id: str, timeout: float) -> Dict[str, Any]:
-    params = {"pair_id": pair_id}
-    for attempt in range(3):
-        try:
-            r = client.get(API_DETAIL, params=params, headers=HEADERS, timeout=timeout)
-            r.raise_for_status()
-            obj = r.json()
-            data = obj.get("data") or {}
-            pair_name = str(data.get("pair_name") or f"{symbol}/USDT").strip()
-            max_leverage = data.get("max_leverage")
-            max_order_size = data.get("max_order_size") or data.get("pair_max_hold_limit")
-            max_mmr = data.get("max_mmr")
-            # 规范数据类型
-            try:
-                max_leverage = int(max_leverage) if max_leverage is not None else None
-            except Exception:
-                max_leverage = None
-            try:
-                # 可能是字符串数字，保留为字符串或转浮点
-                mos = str(max_order_size) if max_order_size is not None else None
-            except Exception:
-                mos = None
-            try:
-                mmr = float(max_mmr) if max_mmr is not None else None
-            except Exception:
-                mmr = None
-            return {
-                "symbol": symbol,
-                "pair_id": pair_id,
-                "pair_name": pair_name,
-                "max_leverage": max_leverage,
-                "max_order_size": mos,
-                "max_mmr": mmr,
-                "source_url": f"{API_DETAIL}?pair_id={pair_id}",
-            }
-        except Exception:
-            time.sleep(0.4 * (attempt + 1))
+    try:
+        data = _get_detail(client, pair_id, timeout).get("data") or {}
+    except Exception as e:
+        return {
+            "symbol": symbol,
+            "pair_id": pair_id,
+            "error": "circuit_open" if isinstance(e, circuit_breaker.CircuitOpen) else "request_failed",
+            "kind": retry_utils.classify(e),
+            "source_url": f"{API_DETAIL}?pair_id={pair_id}",
+        }
+    pair_name = str(data.get("pair_name") or f"{symbol}/USDT").strip()
+    max_leverage = data.get("max_leverage")
+    max_order_size = data.get("max_order_size") or data.get("pair_max_hold_limit")
+    max_mmr = data.get("max_mmr")
+    # 规范数据类型
+    try:
+        max_leverage = int(max_leverage) if max_leverage is not None else None
+    except Exception:
+        max_leverage = None
+    try:
+        # 可能是字符串数字，保留为字符串或转浮点
+        mos = str(max_order_size) if max_order_size is not None else None
+    except Exception:
+        mos = None
+    try:
+        mmr = float(max_mmr) if max_mmr is not None else None
+    except Exception:
+        mmr = None
     return {
         "symbol": symbol,
         "pair_id": pair_id,
-        "error": "request_failed",
+        "pair_name": pair_name,
+        "max_leverage": max_leverage,
+        "max_order_size": mos,
+        "max_mmr": mmr,
         "source_url": f"{API_DETAIL}?pair_id={pair_id}",
     }
 
@@ -97,9 +103,10 @@ def main(concurrency: int = 6, timeout: float = None) -> None:
     results: List[Dict[str, Any]] = []
     errors: List[Dict[str, Any]] = []
 
-    with httpx.Client(http2=True) as client:
+    client = http_client.shared(API_DETAIL)
+    with tracing.span("surf.fetch_limits", exchange="surf", pairs=len(pairs), concurrency=concurrency):
         with ThreadPoolExecutor(max_workers=max(1, concurrency)) as ex:
-            fut_map = {ex.submit(_fetch_one, client, sym, pid, timeout): (sym, pid) for sym, pid in pairs}
+            fut_map = {ex.submit(tracing.wrap(_fetch_one), client, sym, pid, timeout): (sym, pid) for sym, pid in pairs}
             for fut in as_completed(fut_map):
                 sym, pid = fut_map[fut]
                 try:
@@ -112,7 +119,7 @@ def main(concurrency: int = 6, timeout: float = None) -> None:
                     errors.append({"symbol": sym, "pair_id": pid, "error": str(e)})
 
     # 写出
-    OUT_JSON.write_text(json.dumps({"items": results}, ensure_ascii=False, indent=2), encoding="utf-8")
+    dump_json(OUT_JSON, {"items": results})
     meta = {
         "source": API_DETAIL,
         "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
@@ -120,10 +127,11 @@ def main(concurrency: int = 6, timeout: float = None) -> None:
         "ok": len(results),
         "errors": len(errors),
         "error_samples": errors[:50],
+        "circuit": circuit_breaker.snapshot("surf"),
     }
     OUT_META.write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
     print(f"已写出: {OUT_JSON} (ok={len(results)}/{len(pairs)}), meta: {OUT_META}")
 
 
 if __name__ == "__main__":
-    main(concurrency=8)
+    main(concurrency=settings.SURF_CONCURRENCY)
@@ -0,0 +1,198 @@
+"""
+按交易所 + 接口的熔断器
+
+某个数据源整体异常（Weex 页面普遍超时、Bybit 大面积 5xx）时，剩余的每个 symbol 不再各自耗满超时与重试：
+
+- closed：正常放行，记录最近 CIRCUIT_WINDOW 次调用的成败；至少 CIRCUIT_MIN_CALLS 次且失败率
+  达到 CIRCUIT_FAILURE_RATE 时打开；
+- open：直接抛出 `CircuitOpen`（不发请求、不重试）；CIRCUIT_COOLDOWN_SEC 秒后转为 half_open；
+- half_open：只放行一个探测请求，成功则关闭，失败则重新打开并再等一个冷却期，其余调用仍快速失败。
+
+只有服务端/网络类失败计入失败率（5xx、超时、连接错误，见 retry_utils.classify）。只有正常返回与 404
+（单个 symbol 不存在）算成功；其他 4xx（限流 429 由 rate_limit 处理、403 可能是被封禁）与解析错误
+既不算失败也不算成功：不计入失败率，也不能让 half_open 的探测关闭熔断器（探测名额释放，下一次调用再探测）。状态切换记录在 `snapshot()` 里，各抓取脚本写入自己的 meta 文件。
+
+用法：
+    with circuit_breaker.get("bybit", "symbol-risk").guard():
+        r = client.get(url)
+        r.raise_for_status()
+"""
+
+from __future__ import annotations
+
+import contextlib
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+import httpx
+
+from config import settings
+from dataGet.utils import retry_utils
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_FAILURE_KINDS = frozenset({retry_utils.SERVER, retry_utils.TIMEOUT, retry_utils.NETWORK})
+
+
+class CircuitOpen(Exception):
+    """熔断器打开时的快速失败；retry_utils 将其归为 other，不会重试。"""
+
+
+def is_failure(exc: BaseException) -> bool:
+    return retry_utils.classify(exc) in _FAILURE_KINDS
+
+
+def is_success(exc: BaseException) -> bool:
+    """抛出异常但仍说明服务正常：只有 404。"""
+    return isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code == 404
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, window: int, failure_rate: float, min_calls: int, cooldown: float,
+                 failure_test: Callable[[BaseException], bool] = is_failure,
+                 success_test: Callable[[BaseException], bool] = is_success):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = max(1, min_calls)
+        self.cooldown = cooldown
+        self.failure_test = failure_test
+        self.success_test = success_test
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.outcomes: Deque[bool] = deque(maxlen=max(1, window))  # True = 失败
+        self.counters = {"calls": 0, "failures": 0, "rejected": 0, "ignored": 0}
+        self.transitions: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def _move(self, to: str, reason: str) -> None:
+        self.transitions.append({
+            "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "from": self.state,
+            "to": to,
+            "reason": reason,
+        })
+        print(f"[熔断] {self.name}: {self.state} -> {to}（{reason}）")
+        self.state = to
+
+    def allow(self) -> bool:
+        """是否放行本次调用；放行后必须调用 record()。"""
+        if not settings.CIRCUIT_ENABLED:
+            return True
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self._move(HALF_OPEN, f"冷却 {self.cooldown:g}s 后探测")
+            if self.state == HALF_OPEN:
+                if self.probing:
+                    self.counters["rejected"] += 1
+                    return False
+                self.probing = True
+                return True
+            if self.state == OPEN:
+                self.counters["rejected"] += 1
+                return False
+            return True
+
+    def record(self, ok: bool) -> None:
+        if not settings.CIRCUIT_ENABLED:
+            return
+        with self._lock:
+            self.counters["calls"] += 1
+            if not ok:
+                self.counters["failures"] += 1
+            if self.state == HALF_OPEN:
+                self.probing = False
+                if ok:
+                    self.outcomes.clear()
+                    self._move(CLOSED, "探测成功")
+                else:
+                    self.opened_at = time.monotonic()
+                    self._move(OPEN, "探测失败")
+                return
+            if self.state == OPEN:
+                # 打开前已在途的请求，结果不再影响状态
+                return
+            self.outcomes.append(not ok)
+            fails = sum(self.outcomes)
+            if len(self.outcomes) >= self.min_calls and fails / len(self.outcomes) >= self.failure_rate:
+                self.opened_at = time.monotonic()
+                self._move(OPEN, f"最近 {len(self.outcomes)} 次失败 {fails} 次")
+
+    def ignore(self) -> None:
+        """既不算成功也不算失败的结果：不计入失败率，只释放探测名额（half_open 保持不变）。"""
+        if not settings.CIRCUIT_ENABLED:
+            return
+        with self._lock:
+            self.counters["ignored"] += 1
+            self.probing = False
+
+    @contextlib.contextmanager
+    def guard(self) -> Iterator[None]:
+        """打开时抛出 CircuitOpen；否则执行代码块并按其结果记录成败。"""
+        if not self.allow():
+            raise CircuitOpen(f"{self.name} 熔断中，跳过请求")
+        try:
+            yield
+        except Exception as e:
+            if self.failure_test(e):
+                self.record(False)
+            elif self.success_test(e):
+                self.record(True)
+            else:
+                self.ignore()
+            raise
+        except BaseException:
+            # 被取消（如 asyncio.CancelledError）不算成败，但要释放探测名额
+            with self._lock:
+                self.probing = False
+            raise
+        self.record(True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self.state, **self.counters, "transitions": list(self.transitions)}
+
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_LOCK = threading.Lock()
+
+
+def get(exchange: str, endpoint: str) -> CircuitBreaker:
+    name = f"{exchange}:{endpoint}"
+    with _LOCK:
+        b = _BREAKERS.get(name)
+        if b is None:
+            b = _BREAKERS[name] = CircuitBreaker(
+                name,
+                window=settings.CIRCUIT_WINDOW,
+                failure_rate=settings.CIRCUIT_FAILURE_RATE,
+                min_calls=settings.CIRCUIT_MIN_CALLS,
+                cooldown=settings.CIRCUIT_COOLDOWN_SEC,
+            )
+        return b
+
+
+def new_run() -> None:
+    """新一轮运行：所有熔断器回到 closed。"""
+    with _LOCK:
+        _BREAKERS.clear()
+
+
+def snapshot(exchange: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """各熔断器的状态、计数与状态切换记录；给出 exchange 时只取该交易所的。"""
+    with _LOCK:
+        items = list(_BREAKERS.items())
+    return {name: b.snapshot() for name, b in items if exchange is None or name.split(":", 1)[0] == exchange}
+
+
+def describe() -> str:
+    items = snapshot()
+    tripped = {n: s for n, s in items.items() if s["transitions"]}
+    if not tripped:
+        return "熔断: 无"
+    parts = [f"{n}={s['state']}（切换 {len(s['transitions'])} 次，快速失败 {s['rejected']} 次）" for n, s in sorted(tripped.items())]
+    return "熔断: " + ", ".join(parts)
@@ -0,0 +1,202 @@
+"""
+HTTP 响应与 Weex 页面的录制/回放夹具
+
+- record：正常联网，同时把每个 HTTP 响应（状态码、头、解码后的正文、耗时）与 Weex 页面 HTML
+  写入夹具目录；
+- replay：不联网，按 方法 + URL（查询参数排序）+ 请求体 命中夹具直接返回；未录制的请求抛出
+  `FixtureMissing`（属于 httpx.TransportError，抓取脚本按网络错误处理）；
+- off（默认）：不介入。
+
+模式与目录取自 settings.HTTP_FIXTURE_MODE / HTTP_FIXTURE_DIR，调用时读取，便于基准测试在运行前切换。
+回放时可按 settings.HTTP_FIXTURE_DELAY_SCALE 倍率重现录制时的耗时（0 = 不等待）。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import httpx
+
+from config import settings
+
+# 解码后的正文重新交给 httpx 时，这些头已不再成立
+_DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+class FixtureMissing(httpx.TransportError):
+    """回放模式下请求未录制。"""
+
+
+def mode() -> str:
+    return str(settings.HTTP_FIXTURE_MODE or "off").lower()
+
+
+def fixture_dir() -> Path:
+    return Path(settings.HTTP_FIXTURE_DIR)
+
+
+def _norm_url(url: str) -> str:
+    parts = urlsplit(str(url))
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return f"{parts.scheme}://{parts.netloc}{parts.path}" + (f"?{query}" if query else "")
+
+
+def request_key(method: str, url: str, body: bytes = b"") -> str:
+    h = hashlib.sha1()
+    h.update(method.upper().encode("ascii"))
+    h.update(b" " + _norm_url(url).encode("utf-8") + b"\n")
+    h.update(body or b"")
+    return h.hexdigest()[:20]
+
+
+def _http_path(method: str, url: str, body: bytes) -> Path:
+    host = urlsplit(str(url)).netloc.replace(":", "_") or "_"
+    return fixture_dir() / "http" / host / f"{request_key(method, url, body)}.json"
+
+
+def _write(path: Path, obj: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}_{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(obj, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _keep_headers(headers: httpx.Headers) -> list:
+    return [(k, v) for k, v in headers.items() if k.lower() not in _DROP_HEADERS]
+
+
+def save_response(request: httpx.Request, status: int, headers: httpx.Headers, body: bytes, elapsed: float) -> Path:
+    try:
+        payload: Dict[str, Any] = {"text": body.decode("utf-8")}
+    except UnicodeDecodeError:
+        payload = {"b64": base64.b64encode(body).decode("ascii")}
+    path = _http_path(request.method, str(request.url), request.content)
+    _write(path, {
+        "method": request.method,
+        "url": _norm_url(str(request.url)),
+        "status": status,
+        "headers": _keep_headers(headers),
+        "elapsed": round(elapsed, 4),
+        "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        **payload,
+    })
+    return path
+
+
+def load_response(request: httpx.Request) -> tuple[httpx.Response, float]:
+    path = _http_path(request.method, str(request.url), request.content)
+    try:
+        rec = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        raise FixtureMissing(f"未录制的请求: {request.method} {_norm_url(str(request.url))}", request=request) from None
+    body = base64.b64decode(rec["b64"]) if "b64" in rec else rec.get("text", "").encode("utf-8")
+    resp = httpx.Response(rec["status"], headers=rec.get("headers") or [], content=body, request=request)
+    return resp, float(rec.get("elapsed") or 0.0)
+
+
+def _delay(elapsed: float) -> float:
+    return max(0.0, elapsed * float(settings.HTTP_FIXTURE_DELAY_SCALE or 0.0))
+
+
+class RecordingTransport(httpx.BaseTransport):
+    """真实请求之后把响应落盘，再把（已解码的）响应交回调用方。"""
+
+    def __init__(self, inner: httpx.BaseTransport):
+        self._inner = inner
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        t0 = time.perf_counter()
+        resp = self._inner.handle_request(request)
+        try:
+            body = resp.read()
+        finally:
+            resp.close()
+        save_response(request, resp.status_code, resp.headers, body, time.perf_counter() - t0)
+        return httpx.Response(resp.status_code, headers=_keep_headers(resp.headers), content=body, request=request)
+
+    def close(self) -> None:
+        self._inner.close()
+
+
+class AsyncRecordingTransport(httpx.AsyncBaseTransport):
+    """RecordingTransport 的异步版本。"""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport):
+        self._inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        t0 = time.perf_counter()
+        resp = await self._inner.handle_async_request(request)
+        try:
+            body = await resp.aread()
+        finally:
+            await resp.aclose()
+        save_response(request, resp.status_code, resp.headers, body, time.perf_counter() - t0)
+        return httpx.Response(resp.status_code, headers=_keep_headers(resp.headers), content=body, request=request)
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+class ReplayTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """只读夹具，不建立任何连接；同步/异步客户端均可使用。"""
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        resp, elapsed = load_response(request)
+        if _delay(elapsed):
+            time.sleep(_delay(elapsed))
+        return resp
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        resp, elapsed = load_response(request)
+        if _delay(elapsed):
+            await asyncio.sleep(_delay(elapsed))
+        return resp
+
+
+def transport(http2: bool = False, asynchronous: bool = False) -> Optional[Any]:
+    """按当前模式返回要挂到 httpx.Client/AsyncClient 上的 transport；off 模式返回 None（使用默认 transport）。"""
+    m = mode()
+    if m == "record":
+        if asynchronous:
+            return AsyncRecordingTransport(httpx.AsyncHTTPTransport(http2=http2))
+        return RecordingTransport(httpx.HTTPTransport(http2=http2))
+    if m == "replay":
+        return ReplayTransport()
+    return None
+
+
+# ---- 浏览器页面（Weex） ----
+def _page_path(url: str) -> Path:
+    return fixture_dir() / "pages" / f"{request_key('GET', url)}.html"
+
+
+def save_page(url: str, html: str) -> None:
+    if mode() != "record":
+        return
+    path = _page_path(url)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}_{threading.get_ident()}.tmp")
+    tmp.write_text(f"<!-- {_norm_url(url)} -->\n{html}", encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def load_page(url: str) -> Optional[str]:
+    """回放模式下返回录制的页面 HTML；未录制返回 None。"""
+    try:
+        return _page_path(url).read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,139 @@
+"""
+整包接口的持久化 HTTP 缓存（条件请求 + 正文哈希）
+
+Binance brackets、MEXC detailV2、SURF profit/stats、CMC listing 每次返回整包数据，小时级别内很少变化。
+`fetch()` 把正文边下载边原样写入 settings.HTTP_CACHE_DIR（<请求键>.body + <请求键>.meta.json），下次请求时：
+- 上次响应带 ETag / Last-Modified 的，发送 If-None-Match / If-Modified-Since，304 直接沿用缓存正文；
+- 服务端不支持条件请求的照常下载，与缓存正文的 sha256 比较；
+内容未变化时缓存正文不重写（文件哈希与 mtime 都不变），返回 changed=False。
+
+调用方据此跳过：筛选步骤以 `CachedBody.path` 为输入交给 manifest.run_cached，未变化时不再筛选、
+不重写 *_selected.json；下游的增量跳过（制表、建议规则、发布）与常驻模式的变化判断随之得到“无变化”。
+`CachedBody.json()` 经 json_store 读取，同一进程内未变化的正文不会重复解析。
+
+settings.HTTP_CACHE_ENABLED=false 时不发条件请求、每次都视为有变化（缓存文件照常写出，便于排查）。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import httpx
+
+from config import settings
+from dataGet.utils import fixtures, http_client
+from pipeline.json_store import load_json
+
+
+@dataclass
+class CachedBody:
+    url: str
+    path: Path  # 缓存的正文文件；内容不变时不重写，可直接作为增量跳过的输入
+    changed: bool
+    how: str  # fetched（新内容）/ not_modified（304）/ same_hash（下载后哈希相同）
+
+    def json(self) -> Any:
+        """解析后的正文（共享缓存对象，不要原地修改）。"""
+        return load_json(self.path)
+
+    def content(self) -> bytes:
+        return self.path.read_bytes()
+
+
+def cache_dir() -> Path:
+    return Path(settings.HTTP_CACHE_DIR)
+
+
+def _paths(key: str) -> tuple[Path, Path]:
+    d = cache_dir()
+    return d / f"{key}.body", d / f"{key}.meta.json"
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}_{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _read_meta(path: Path) -> Dict[str, Any]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def fetch(
+    url: str,
+    method: str = "GET",
+    client: Optional[httpx.Client] = None,
+    headers: Optional[Dict[str, str]] = None,
+    params: Optional[Dict[str, Any]] = None,
+    json_body: Any = None,
+    timeout: float = 30.0,
+) -> CachedBody:
+    """发送（条件）请求并更新缓存；非 2xx/304 照常抛出 httpx.HTTPStatusError。"""
+    client = client or http_client.shared(url)
+    req = client.build_request(method, url, headers=headers, params=params, json=json_body, timeout=timeout)
+    key = fixtures.request_key(req.method, str(req.url), req.content)
+    body_path, meta_path = _paths(key)
+    enabled = settings.HTTP_CACHE_ENABLED
+    prev = _read_meta(meta_path) if enabled and body_path.exists() else {}
+    if prev.get("etag"):
+        req.headers["If-None-Match"] = prev["etag"]
+    if prev.get("last_modified"):
+        req.headers["If-Modified-Since"] = prev["last_modified"]
+
+    # 正文边下载边写入临时文件并计算哈希，整包数据不在内存里停留
+    resp = client.send(req, stream=True)
+    try:
+        now = time.strftime("%Y-%m-%d %H:%M:%S")
+        if resp.status_code == 304 and prev:
+            prev["checked_at"] = now
+            _write_atomic(meta_path, json.dumps(prev, ensure_ascii=False, indent=2).encode("utf-8"))
+            return CachedBody(url=url, path=body_path, changed=False, how="not_modified")
+        resp.raise_for_status()
+
+        body_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = body_path.with_name(f"{body_path.name}.{os.getpid()}_{threading.get_ident()}.tmp")
+        sha = hashlib.sha256()
+        size = 0
+        try:
+            with tmp.open("wb") as f:
+                for chunk in resp.iter_bytes():
+                    sha.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+    finally:
+        resp.close()
+
+    digest = sha.hexdigest()
+    same = bool(prev) and prev.get("sha256") == digest
+    if same:
+        tmp.unlink(missing_ok=True)
+    else:
+        os.replace(tmp, body_path)
+    meta = {
+        "method": req.method,
+        "url": str(req.url),
+        "status": resp.status_code,
+        "etag": resp.headers.get("etag"),
+        "last_modified": resp.headers.get("last-modified"),
+        "sha256": digest,
+        "size": size,
+        "changed_at": prev.get("changed_at") if same else now,
+        "checked_at": now,
+    }
+    _write_atomic(meta_path, json.dumps(meta, ensure_ascii=False, indent=2).encode("utf-8"))
+    return CachedBody(url=url, path=body_path, changed=not same, how="same_hash" if same else "fetched")
@@ -0,0 +1,163 @@
+"""
+dataGet 共享的 httpx 客户端（按 host 复用连接池）
+
+所有抓取脚本经这里取客户端，而不是每个请求/函数各自 `with httpx.Client()`：
+- 每个 host 一个长连接客户端（keep-alive、连接池上限见 settings.HTTP_POOL_*），线程安全，
+  同一进程内各线程、各阶段、常驻模式的各轮之间复用连接，省去重复的 TCP/TLS 握手；
+- settings.HTTP2_ENABLED（默认开启，h2 由 requirements.txt 的 httpx[http2] 提供）时使用 HTTP/2（同一连接多路复用并发请求）；
+- 统一的默认请求头（UA/Accept/Accept-Language），交易所特有的头在请求时传入；
+- 自动挂上追踪钩子：交易所属性继承自当前 span，单个请求可用
+  `extensions={"trace_attrs": {...}}` 追加属性；请求抛出异常（超时、连接错误）时同样记录 span；
+- 自动挂上按 host 的令牌桶限速（dataGet/utils/rate_limit.py，回放夹具时不限速）；
+- 按 settings.HTTP_FIXTURE_MODE 换成录制/回放 transport（见 dataGet/utils/fixtures.py）。
+
+共享客户端由本模块管理，调用方不要关闭；进程退出时统一关闭（`close_all`）。
+异步客户端绑定事件循环，不放入注册表：`async with async_client(url) as c:` 按次创建，配置相同。
+"""
+
+from __future__ import annotations
+
+import atexit
+import importlib.util
+import threading
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from config import settings
+from dataGet.utils import fixtures, rate_limit
+from pipeline import tracing
+
+HAS_H2 = importlib.util.find_spec("h2") is not None
+
+DEFAULT_HEADERS = {
+    "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "accept": "application/json, text/plain, */*",
+    "accept-language": "zh-CN,zh;q=0.9,en;q=0.8",
+}
+
+_CLIENTS: Dict[Tuple[str, str], httpx.Client] = {}
+_LOCK = threading.Lock()
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url if "://" in url else f"https://{url}")
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.HTTP_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def _event_hooks(asynchronous: bool) -> Dict[str, list]:
+    # 先限速再计时：追踪中的 HTTP span 只包含网络耗时
+    hooks = tracing.httpx_hooks(asynchronous=asynchronous)
+    if fixtures.mode() != "replay":
+        limiter = rate_limit.httpx_hooks(asynchronous=asynchronous)
+        hooks = {k: limiter[k] + hooks[k] for k in hooks}
+    return hooks
+
+
+def _failed_request(request: httpx.Request, exc: BaseException) -> httpx.Request:
+    # 重定向链中出错时异常带着实际失败的那个请求
+    try:
+        return getattr(exc, "request", None) or request
+    except RuntimeError:
+        return request
+
+
+class _Client(httpx.Client):
+    def send(self, request: httpx.Request, **kwargs: Any) -> httpx.Response:
+        try:
+            return super().send(request, **kwargs)
+        except Exception as e:
+            tracing.http_error(_failed_request(request, e), e)
+            raise
+
+
+class _AsyncClient(httpx.AsyncClient):
+    async def send(self, request: httpx.Request, **kwargs: Any) -> httpx.Response:
+        try:
+            return await super().send(request, **kwargs)
+        except Exception as e:
+            tracing.http_error(_failed_request(request, e), e)
+            raise
+
+
+def _client_kwargs(asynchronous: bool = False) -> Dict[str, Any]:
+    http2 = settings.HTTP2_ENABLED and HAS_H2
+    kwargs: Dict[str, Any] = {
+        "headers": DEFAULT_HEADERS,
+        "timeout": httpx.Timeout(settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT),
+        "event_hooks": _event_hooks(asynchronous),
+        "follow_redirects": True,
+    }
+    transport = fixtures.transport(http2=http2, asynchronous=asynchronous)
+    if transport is not None:
+        kwargs["transport"] = transport
+    else:
+        kwargs.update(http2=http2, limits=_limits())
+    return kwargs
+
+
+def _build() -> httpx.Client:
+    return _Client(**_client_kwargs())
+
+
+def shared(url: str) -> httpx.Client:
+    """url（或 host）所属 host 的共享客户端；不存在时创建。"""
+    key = (_origin(url), fixtures.mode())
+    c = _CLIENTS.get(key)
+    if c is not None and not c.is_closed:
+        return c
+    with _LOCK:
+        c = _CLIENTS.get(key)
+        if c is None or c.is_closed:
+            c = _CLIENTS[key] = _build()
+        return c
+
+
+def async_client(url: str, max_connections: Optional[int] = None) -> httpx.AsyncClient:
+    """异步客户端（连接池上限可按并发窗口调大）；调用方用 async with 管理生命周期。"""
+    kwargs = _client_kwargs(asynchronous=True)
+    if max_connections and "limits" in kwargs:
+        kwargs["limits"] = httpx.Limits(
+            max_connections=max(max_connections, settings.HTTP_POOL_MAX_CONNECTIONS),
+            max_keepalive_connections=max(max_connections, settings.HTTP_POOL_MAX_KEEPALIVE),
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        )
+    return _AsyncClient(base_url=_origin(url), **kwargs)
+
+
+def get(url: str, **kwargs: Any) -> httpx.Response:
+    """用共享客户端发 GET；kwargs 同 httpx.Client.get（headers/params/timeout/extensions）。"""
+    return shared(url).get(url, **kwargs)
+
+
+def post(url: str, **kwargs: Any) -> httpx.Response:
+    return shared(url).post(url, **kwargs)
+
+
+def stats() -> Dict[str, str]:
+    """已创建的共享客户端（调试用）。"""
+    with _LOCK:
+        return {f"{origin} [{mode}]": ("closed" if c.is_closed else "open") for (origin, mode), c in _CLIENTS.items()}
+
+
+def close_all() -> None:
+    with _LOCK:
+        clients = list(_CLIENTS.values())
+        _CLIENTS.clear()
+    for c in clients:
+        try:
+            c.close()
+        except Exception:
+            pass
+
+
+atexit.register(close_all)
@@ -0,0 +1,122 @@
+"""
+整包 JSON 的流式筛选
+
+Binance brackets、MEXC detailV2/ticker 返回全部合约的整包列表，而我们只需要其中 SURF 的 USDT 目标。
+`select()` 以 mmap 方式扫描磁盘上的正文（http_cache 已把响应边下载边落盘），只做结构扫描：
+
+- 用正则整段跳过非括号内容与字符串（C 实现），Python 层只按括号迭代，定位指定键路径下的数组（如 ("data",)）；
+- 对数组中的每个对象只读取其顶层的 symbol 字段，`keep(symbol)` 为真的条目才 json.loads 成对象；
+- 其余条目不建 Python 对象，峰值内存随目标数量而不是整包大小增长。
+
+找不到候选路径下的数组时返回 None，调用方回退到整包解析（兼容 map 形式等少见结构）。
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+_STR = rb'"[^"\\]*(?:\\.[^"\\]*)*"'
+# 一段：若干非括号字符或完整字符串，直到下一个结构括号（字符串内的括号被整体跳过）
+_SEG = re.compile(rb'[^"\[\]{}]*(?:' + _STR + rb'[^"\[\]{}]*)*([\[\]{}])')
+# 段末尾的键（"key": 紧接着就是括号），只在定位数组时使用
+_LAST_KEY = re.compile(rb'"((?:[^"\\]|\\.)*)"\s*:\s*$')
+_LBRACE, _RBRACE, _LBRACK = 0x7B, 0x7D, 0x5B
+
+
+@dataclass
+class Selection:
+    path: Tuple[str, ...]  # 命中的数组键路径
+    total: int = 0  # 数组中对象条目总数
+    items: List[Tuple[str, Any]] = field(default_factory=list)  # 保留的 (symbol, 条目)
+
+
+def _symbol_pattern(symbol_keys: Sequence[str]) -> "re.Pattern[bytes]":
+    # 前面必须是 { 或 ,（从上一个括号处开始匹配）：转义在字符串值里的 \"symbol\" 不会被误认为键
+    names = b"|".join(re.escape(k.encode("utf-8")) for k in symbol_keys)
+    return re.compile(rb'[{,]\s*"(' + names + rb')"\s*:\s*(' + _STR + rb')')
+
+
+def scan(
+    buf: Any,
+    array_paths: Iterable[Sequence[str]],
+    keep: Callable[[str], bool],
+    symbol_keys: Sequence[str] = ("symbol",),
+) -> Optional[Selection]:
+    """在 bytes/mmap 中找到第一个位于候选键路径下的数组并筛选其中的对象；未找到返回 None。
+
+    array_paths：键路径列表，() 表示顶层即数组；symbol_keys：条目里 symbol 字段的候选名（靠前者优先）。
+    Python 层只按括号迭代，字符串、数字等由正则整段跳过。
+    """
+    targets = {tuple(k.encode("utf-8") for k in p) for p in array_paths}
+    sym_re = _symbol_pattern(symbol_keys)
+    rank = {k.encode("utf-8"): i for i, k in enumerate(symbol_keys)}
+
+    kinds: List[int] = []  # 已打开容器的类型（{ 或 [）
+    keys: List[Optional[bytes]] = []  # 各容器在父对象中的键（父为数组或顶层时为 None）
+    array_depth: Optional[int] = None
+    sel: Optional[Selection] = None
+    elem_start = -1
+    found: Dict[bytes, bytes] = {}
+
+    for m in _SEG.finditer(buf):
+        pos = m.start(1)
+        c = buf[pos]
+        depth = len(kinds)
+        if array_depth is not None and depth == array_depth + 1 and elem_start >= 0:
+            # 条目顶层的一段：找 symbol 字段
+            for km in sym_re.finditer(buf, m.start() - 1, pos):
+                found.setdefault(km.group(1), km.group(2))
+
+        if c == _LBRACE or c == _LBRACK:
+            key = None
+            if array_depth is None and depth and kinds[-1] == _LBRACE:
+                km = _LAST_KEY.search(buf, m.start(), pos)
+                key = km.group(1) if km else None
+            if array_depth is None and c == _LBRACK and (depth == 0 or key is not None):
+                path = tuple(keys[1:]) + ((key,) if depth else ())
+                if path in targets and all(k is not None for k in keys[1:]):
+                    sel = Selection(path=tuple(p.decode("utf-8") for p in path))
+                    array_depth = depth + 1
+            elif array_depth is not None and depth == array_depth and c == _LBRACE:
+                elem_start = pos
+                found = {}
+            kinds.append(c)
+            keys.append(key)
+            continue
+
+        # 右括号
+        kinds.pop()
+        keys.pop()
+        if array_depth is None:
+            continue
+        depth -= 1
+        if depth == array_depth and c == _RBRACE and elem_start >= 0:
+            sel.total += 1
+            if found:
+                raw = found[min(found, key=rank.__getitem__)]
+                sym = json.loads(raw)
+                if isinstance(sym, str) and sym.strip() and keep(sym.strip().upper()):
+                    sel.items.append((sym.strip().upper(), json.loads(buf[elem_start:m.end()])))
+            elem_start = -1
+        elif depth < array_depth:
+            return sel
+    return sel
+
+
+def select(
+    path: Path,
+    array_paths: Iterable[Sequence[str]],
+    keep: Callable[[str], bool],
+    symbol_keys: Sequence[str] = ("symbol",),
+) -> Optional[Selection]:
+    """对磁盘上的 JSON 文件执行 scan()（mmap，不整体读入内存）。"""
+    path = Path(path)
+    if not path.exists() or path.stat().st_size == 0:
+        return None
+    with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return scan(mm, array_paths, keep, symbol_keys)
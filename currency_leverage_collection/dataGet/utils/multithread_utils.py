@@ -3,6 +3,7 @@
 """
 
 import sys
+import contextvars
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 def print_progress_bar(current=0, total=0, bar_length=50):
@@ -42,8 +43,8 @@ def run_multithread(func=None, data_list=None, max_workers=8, show_progress=True
         print(f"使用 {max_workers} 个线程处理 {total} 个任务...")
     
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # 提交所有任务，并记录索引
-        future_to_index = {executor.submit(func, data): i for i, data in enumerate(data_list)}
+        # 提交所有任务，并记录索引（复制调用方上下文，保证追踪 span 等上下文变量在线程内可见）
+        future_to_index = {executor.submit(contextvars.copy_context().run, func, data): i for i, data in enumerate(data_list)}
         
         # 处理完成的任务
         for future in as_completed(future_to_index):
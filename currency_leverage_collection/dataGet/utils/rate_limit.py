@@ -0,0 +1,243 @@
+"""
+按 host 的令牌桶限速（线程与 asyncio 通用）
+
+- 每个 host 一个桶，速率与容量取自 settings.RATE_LIMITS（"每秒请求数/桶容量"，按 host 子串匹配，
+  未匹配的用 default，0 = 不限速）；
+- `acquire(url)` 在线程内阻塞等待、`await acquire_async(url)` 在协程内等待，各取一个令牌。
+  桶状态只在锁内计算（不在锁内等待），同一个桶可被多个线程与事件循环同时使用；
+- `observe(url, status, headers)` 按响应自适应：
+  - 429（或带 Retry-After 的 503）：速率减半（不低于上限的 1/20），整个 host 暂停到 Retry-After 之后；
+  - 限额响应头（X-RateLimit-Remaining/Reset、X-Bapi-Limit-Status/Reset-Timestamp）剩余为 0 时暂停到重置时刻；
+  - 成功响应：每次恢复上限的 2%，直到配置的上限；
+- 共享 httpx 客户端经 `httpx_hooks()` 自动接入（见 http_client）；Weex 浏览器打开页面前调用 `acquire`；
+- `stats()` / `describe()` 给出各 host 的当前速率、请求数、被限次数与累计等待时间。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+from urllib.parse import urlsplit
+
+from config import settings
+
+MIN_FRACTION = 0.05  # 降速下限：配置上限的 1/20
+RECOVER_STEP = 0.02  # 每个成功响应恢复上限的 2%
+DEFAULT_PAUSE = 1.0  # 429 未带 Retry-After 时的暂停（秒）
+MAX_PAUSE = 300.0  # 响应头给出的暂停上限（秒），防止异常值卡死整轮
+
+
+def _parse_limit(spec: Any) -> Tuple[float, float]:
+    """"20/40" -> (20.0, 40.0)；"20" -> (20.0, 20.0)；"0" -> 不限速。"""
+    text = str(spec or "0").strip()
+    rate_s, _, burst_s = text.partition("/")
+    rate = max(0.0, float(rate_s or 0))
+    burst = max(1.0, float(burst_s)) if burst_s else max(1.0, rate)
+    return rate, burst
+
+
+def _num(v: Optional[str]) -> Optional[float]:
+    try:
+        return float(v) if v is not None and str(v).strip() != "" else None
+    except ValueError:
+        return None
+
+
+def _until(value: float, now: float) -> float:
+    """重置时刻可能是 epoch 毫秒、epoch 秒或相对秒数，统一换算成距现在的秒数。"""
+    if value > 1e12:
+        return value / 1000.0 - now
+    if value > 1e9:
+        return value - now
+    return value
+
+
+def pause_from_headers(headers: Mapping[str, str], now: Optional[float] = None) -> Optional[float]:
+    """从 Retry-After 与常见限额响应头推算需要暂停的秒数；无需暂停返回 None。"""
+    now = time.time() if now is None else now
+    pauses: List[float] = []
+    ra = headers.get("retry-after")
+    if ra:
+        sec = _num(ra)
+        if sec is None:
+            try:
+                sec = parsedate_to_datetime(ra).timestamp() - now
+            except (TypeError, ValueError):
+                sec = None
+        if sec is not None:
+            pauses.append(sec)
+    for remaining_key, reset_key in (
+        ("x-ratelimit-remaining", "x-ratelimit-reset"),
+        ("x-bapi-limit-status", "x-bapi-limit-reset-timestamp"),
+    ):
+        remaining = _num(headers.get(remaining_key))
+        reset = _num(headers.get(reset_key))
+        if remaining is not None and remaining <= 0 and reset is not None:
+            pauses.append(_until(reset, now))
+    pauses = [p for p in pauses if p > 0]
+    return min(max(pauses), MAX_PAUSE) if pauses else None
+
+
+class TokenBucket:
+    def __init__(self, host: str, rate: float, burst: float):
+        self.host = host
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.counters = {"requests": 0, "throttled": 0, "waits": 0, "wait_sec": 0.0}
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """取一个令牌（不足时透支，排在已透支的请求之后），返回调用方需要等待的秒数。"""
+        with self._lock:
+            now = time.monotonic()
+            self.counters["requests"] += 1
+            wait = 0.0
+            if self.rate > 0:
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                self.tokens -= 1.0
+                if self.tokens < 0:
+                    wait = -self.tokens / self.rate
+            wait = max(wait, self.blocked_until - now)
+            if wait > 0:
+                self.counters["waits"] += 1
+                self.counters["wait_sec"] += wait
+            return wait
+
+    def observe(self, status: int, headers: Mapping[str, str]) -> None:
+        pause = pause_from_headers(headers)
+        throttled = status == 429 or (status == 503 and pause is not None)
+        with self._lock:
+            if throttled:
+                self.counters["throttled"] += 1
+                if self.max_rate > 0:
+                    self.rate = max(self.max_rate * MIN_FRACTION, self.rate * 0.5)
+                    self.tokens = min(self.tokens, 0.0)
+                if pause is None:
+                    pause = DEFAULT_PAUSE
+            elif status < 400 and 0 < self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * RECOVER_STEP)
+            if pause:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + pause)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "rate": round(self.rate, 3),
+                "max_rate": self.max_rate,
+                "burst": self.burst,
+                "blocked_for": round(max(0.0, self.blocked_until - time.monotonic()), 3),
+                **{k: round(v, 3) if isinstance(v, float) else v for k, v in self.counters.items()},
+            }
+
+
+_BUCKETS: Dict[str, TokenBucket] = {}
+_LOCK = threading.Lock()
+
+
+def _host(url: Any) -> str:
+    text = str(url)
+    parts = urlsplit(text if "://" in text else f"https://{text}")
+    return (parts.netloc or text).lower()
+
+
+def _config_for(host: str) -> Tuple[float, float]:
+    limits: Dict[str, Any] = settings.RATE_LIMITS
+    for key, spec in limits.items():
+        if key != "default" and key in host:
+            return _parse_limit(spec)
+    return _parse_limit(limits.get("default"))
+
+
+def bucket(url: Any) -> TokenBucket:
+    host = _host(url)
+    b = _BUCKETS.get(host)
+    if b is not None:
+        return b
+    with _LOCK:
+        b = _BUCKETS.get(host)
+        if b is None:
+            b = _BUCKETS[host] = TokenBucket(host, *_config_for(host))
+        return b
+
+
+def acquire(url: Any) -> float:
+    """线程内取一个令牌（必要时阻塞等待），返回等待的秒数。"""
+    if not settings.RATE_LIMIT_ENABLED:
+        return 0.0
+    wait = bucket(url).reserve()
+    if wait > 0:
+        time.sleep(wait)
+    return wait
+
+
+async def acquire_async(url: Any) -> float:
+    """协程内取一个令牌（必要时 await 等待），返回等待的秒数。"""
+    if not settings.RATE_LIMIT_ENABLED:
+        return 0.0
+    wait = bucket(url).reserve()
+    if wait > 0:
+        await asyncio.sleep(wait)
+    return wait
+
+
+def observe(url: Any, status: int, headers: Mapping[str, str]) -> None:
+    if settings.RATE_LIMIT_ENABLED:
+        bucket(url).observe(status, headers)
+
+
+def httpx_hooks(asynchronous: bool = False) -> Dict[str, List[Callable[..., Any]]]:
+    """httpx 事件钩子：发请求前取令牌，收到响应后按状态码与响应头调整速率。
+
+    等待时间写入请求的 trace_attrs（rate_wait_ms），追踪里的 HTTP span 只计网络耗时。
+    """
+
+    def note_wait(request: Any, wait: float) -> None:
+        if wait > 0:
+            attrs = dict(request.extensions.get("trace_attrs") or {})
+            attrs["rate_wait_ms"] = round(wait * 1000, 1)
+            request.extensions["trace_attrs"] = attrs
+
+    def on_response(response: Any) -> None:
+        observe(response.request.url, response.status_code, response.headers)
+
+    if asynchronous:
+        async def on_request_async(request: Any) -> None:
+            note_wait(request, await acquire_async(request.url))
+
+        async def on_response_async(response: Any) -> None:
+            on_response(response)
+
+        return {"request": [on_request_async], "response": [on_response_async]}
+
+    def on_request(request: Any) -> None:
+        note_wait(request, acquire(request.url))
+
+    return {"request": [on_request], "response": [on_response]}
+
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    with _LOCK:
+        buckets = list(_BUCKETS.values())
+    return {b.host: b.snapshot() for b in buckets}
+
+
+def describe() -> str:
+    items = stats()
+    if not items:
+        return "限速: 本进程未发出受控请求"
+    lines = ["=== 限速（按 host） ==="]
+    for host, s in sorted(items.items()):
+        cap = f"{s['rate']:g}/{s['max_rate']:g} rps" if s["max_rate"] > 0 else "不限速"
+        lines.append(
+            f"  {host:<32} {cap}  请求 {s['requests']}  被限 {s['throttled']}  等待 {s['waits']} 次 / {s['wait_sec']:.1f}s"
+            + (f"  暂停中 {s['blocked_for']:.1f}s" if s["blocked_for"] else "")
+        )
+    return "\n".join(lines)
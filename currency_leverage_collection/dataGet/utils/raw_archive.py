@@ -0,0 +1,232 @@
+"""
+原始响应归档（gzip 压缩 + 按内容寻址）
+
+各抓取脚本不再把解析后的原始响应 json.dumps(indent=2) 重写成 *_raw.json（既费 CPU，每小时覆盖又丢历史），
+而是把响应的原始字节存进 settings.RAW_ARCHIVE_DIR：
+
+- `blobs/<sha256 前两位>/<sha256>.gz`：按原始字节的 sha256 寻址，相同内容只存一份；
+- `archive(source, name, data)`：归档一个整包响应（bytes 或磁盘文件，文件按块读取、不整体读入内存）；
+- `archive_parts(source, name, parts)`：归档一组响应（如 Bybit 逐 symbol 的返回），每个部分各自寻址，
+  另存一份 {部分名: sha256} 清单，未变化的 symbol 在历次运行间不重复占用空间；
+- `index.jsonl`：每次归档追加一行 {run_id, at, source, name, sha256, size, kind, ...}，
+  run_id 取本轮追踪文件名（同一轮的父子进程一致），用 `entries()` / `load()` 按运行取回原始内容；
+- `compact(keep_runs)`：索引只保留最近 keep_runs 轮，删除不再被引用的 blob（含 parts 清单里的各部分），
+  制表结束时与 runs.compact() 一同调用（settings.RAW_ARCHIVE_KEEP_RUNS）。
+
+查看：python -m dataGet.utils.raw_archive [--run RUN_ID] [--source binance]
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Set, Union
+
+from config import settings
+from pipeline import tracing
+
+_CHUNK = 1 << 20
+_LOCK = threading.Lock()
+_PROCESS_RUN = time.strftime("%Y%m%d_%H%M%S")
+# 比这更新的 blob 不清理：可能是其他进程刚 put()、还没来得及登记到索引的
+_COMPACT_GRACE_SEC = 600
+
+
+def archive_dir() -> Path:
+    return Path(settings.RAW_ARCHIVE_DIR)
+
+
+def index_path() -> Path:
+    return archive_dir() / "index.jsonl"
+
+
+def run_id() -> str:
+    """本轮运行标识：沿用追踪文件名（父进程传给子进程），没有追踪时用本进程的启动时间。"""
+    tf = tracing.trace_file()
+    return tf.stem if tf else _PROCESS_RUN
+
+
+def blob_path(sha: str) -> Path:
+    return archive_dir() / "blobs" / sha[:2] / f"{sha}.gz"
+
+
+def _sha256(data: Union[bytes, Path]) -> tuple[str, int]:
+    if isinstance(data, (bytes, bytearray)):
+        return hashlib.sha256(data).hexdigest(), len(data)
+    h = hashlib.sha256()
+    size = 0
+    with Path(data).open("rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b""):
+            h.update(chunk)
+            size += len(chunk)
+    return h.hexdigest(), size
+
+
+def put(data: Union[bytes, Path]) -> tuple[str, int, bool]:
+    """按内容存入一份原始字节；返回 (sha256, 原始大小, 是否新写入)。"""
+    sha, size = _sha256(data)
+    path = blob_path(sha)
+    if path.exists():
+        # 复用已有 blob 时刷新 mtime，compact() 据此避开刚被引用、尚未登记索引的文件
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return sha, size, False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}_{threading.get_ident()}.tmp")
+    try:
+        # mtime=0：同样的内容压缩结果逐字节一致
+        with tmp.open("wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0) as gz:
+            if isinstance(data, (bytes, bytearray)):
+                gz.write(data)
+            else:
+                with Path(data).open("rb") as src:
+                    shutil.copyfileobj(src, gz, _CHUNK)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return sha, size, True
+
+
+def get(sha: str) -> bytes:
+    return gzip.decompress(blob_path(sha).read_bytes())
+
+
+def _append_index(entry: Dict[str, Any]) -> None:
+    line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+    index_path().parent.mkdir(parents=True, exist_ok=True)
+    with _LOCK, index_path().open("a", encoding="utf-8") as f:
+        f.write(line)
+
+
+def archive(source: str, name: str, data: Union[bytes, Path], **extra: Any) -> Optional[Path]:
+    """归档一个整包响应并登记到索引；返回压缩文件路径（关闭归档时返回 None）。"""
+    if not settings.RAW_ARCHIVE_ENABLED:
+        return None
+    sha, size, new = put(data)
+    _append_index({
+        "run_id": run_id(), "at": time.strftime("%Y-%m-%d %H:%M:%S"), "source": source, "name": name,
+        "kind": "blob", "sha256": sha, "size": size, "new": new, **extra,
+    })
+    return blob_path(sha)
+
+
+def archive_parts(source: str, name: str, parts: Mapping[str, bytes], **extra: Any) -> Optional[Path]:
+    """归档一组响应：各部分分别寻址，清单 {部分名: sha256} 作为一个 blob 登记到索引；返回清单路径。"""
+    if not settings.RAW_ARCHIVE_ENABLED:
+        return None
+    shas: Dict[str, str] = {}
+    total = new_parts = 0
+    for key, data in parts.items():
+        sha, size, new = put(data)
+        shas[key] = sha
+        total += size
+        new_parts += int(new)
+    manifest = json.dumps({"parts": shas}, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    sha, _, _ = put(manifest)
+    _append_index({
+        "run_id": run_id(), "at": time.strftime("%Y-%m-%d %H:%M:%S"), "source": source, "name": name,
+        "kind": "parts", "sha256": sha, "size": total, "parts": len(shas), "new_parts": new_parts, **extra,
+    })
+    return blob_path(sha)
+
+
+def entries(run: Optional[str] = None, source: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """按写入顺序读取索引，可按 run_id / source 过滤。"""
+    path = index_path()
+    if not path.exists():
+        return
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                e = json.loads(line)
+            except ValueError:
+                continue
+            if (run is None or e.get("run_id") == run) and (source is None or e.get("source") == source):
+                yield e
+
+
+def load(entry: Mapping[str, Any]) -> Union[bytes, Dict[str, bytes]]:
+    """取回索引项对应的原始字节；kind=parts 时返回 {部分名: 原始字节}。"""
+    if entry.get("kind") == "parts":
+        manifest = json.loads(get(entry["sha256"]))
+        return {k: get(s) for k, s in manifest.get("parts", {}).items()}
+    return get(entry["sha256"])
+
+
+def _referenced(entry: Mapping[str, Any]) -> Set[str]:
+    """索引项引用的全部 blob：本身，以及 kind=parts 清单里的各部分。"""
+    sha = entry.get("sha256")
+    if not sha:
+        return set()
+    refs = {sha}
+    if entry.get("kind") == "parts":
+        try:
+            refs.update(json.loads(get(sha)).get("parts", {}).values())
+        except (OSError, ValueError):
+            pass
+    return refs
+
+
+def compact(keep_runs: int = settings.RAW_ARCHIVE_KEEP_RUNS) -> int:
+    """索引只保留最近 keep_runs 个 run_id，并删除不再被引用的 blob；返回删除的 blob 数（keep_runs<=0 不清理）。"""
+    path = index_path()
+    if keep_runs <= 0 or not path.exists():
+        return 0
+    started = time.time()
+    with _LOCK:
+        lines: List[str] = []
+        order: Dict[str, None] = {}
+        with path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    e = json.loads(line)
+                except ValueError:
+                    continue
+                lines.append(line)
+                order.setdefault(str(e.get("run_id")), None)
+        kept_runs = set(list(order)[-keep_runs:])
+        kept = [line for line in lines if str(json.loads(line).get("run_id")) in kept_runs]
+        if len(kept) < len(lines):
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            tmp.write_text("".join(kept), encoding="utf-8")
+            os.replace(tmp, path)
+    live: Set[str] = set()
+    for line in kept:
+        live |= _referenced(json.loads(line))
+    removed = 0
+    blobs = archive_dir() / "blobs"
+    for blob in blobs.glob("*/*.gz") if blobs.exists() else ():
+        if blob.name[:-3] in live:
+            continue
+        try:
+            if blob.stat().st_mtime > started - _COMPACT_GRACE_SEC:
+                continue
+            blob.unlink()
+            removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+def _main() -> None:
+    ap = argparse.ArgumentParser(description="列出原始响应归档（按运行）")
+    ap.add_argument("--run", default=None, help="只看某一轮（run_id）")
+    ap.add_argument("--source", default=None, help="只看某个数据源，如 binance")
+    args = ap.parse_args()
+    for e in entries(args.run, args.source):
+        extra = f" parts={e['parts']}(新 {e['new_parts']})" if e.get("kind") == "parts" else (" 新" if e.get("new") else "")
+        print(f"{e['run_id']}  {e['source']}/{e['name']}  {e['sha256'][:12]}  {e['size']}B{extra}")
+
+
+if __name__ == "__main__":
+    _main()
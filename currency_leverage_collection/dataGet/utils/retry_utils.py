@@ -1,232 +1,233 @@
 """
 重试工具
-解决API访问频限问题
+按异常类型与 HTTP 状态码分类决定是否重试（不再匹配错误信息中的关键字）
+
+- `classify(exc)`：throttled（429、带 Retry-After 的 503）/ server（5xx）/ timeout / network（连接类错误）/
+  decode（返回内容不是合法 JSON）/ client（其余 4xx，不重试）/ fatal（回放夹具缺失等）/ other；
+- `RetryPolicy`：封顶的指数退避 + 全抖动（等待在 0 ~ min(cap, base·2^n) 之间均匀取值），
+  限流响应带 Retry-After 时至少等到该时刻；同步函数用 time.sleep，协程用 asyncio.sleep；
+- 每轮运行共享一个重试预算（settings.RETRY_BUDGET_PER_RUN），耗尽后不再重试，避免整轮被重试拖住；
+  常驻进程在每轮开始时调用 `new_run()` 重置。
+
+用法：
+    @RetryPolicy(attempts=3)
+    def fetch(): ...                      # 同步、异步函数都可以直接装饰
+
+    for attempt in POLICY.retrying():     # 上下文管理器形式（协程内用 async for ... in POLICY.aretrying()）
+        with attempt:
+            r = client.get(url)
+            r.raise_for_status()
 """
 
-import time
+from __future__ import annotations
+
+import asyncio
 import functools
+import inspect
+import json
 import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, FrozenSet, Iterator, Optional
+
+import httpx
+
+from config import settings
+from dataGet.utils.fixtures import FixtureMissing
+from dataGet.utils.rate_limit import pause_from_headers
+
+THROTTLED = "throttled"
+SERVER = "server"
+TIMEOUT = "timeout"
+NETWORK = "network"
+DECODE = "decode"
+CLIENT = "client"
+FATAL = "fatal"
+OTHER = "other"
+
+DEFAULT_RETRY_ON: FrozenSet[str] = frozenset({THROTTLED, SERVER, TIMEOUT, NETWORK})
+
+
+def classify(exc: BaseException) -> str:
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        if status == 429 or (status == 503 and exc.response.headers.get("retry-after")):
+            return THROTTLED
+        if status == 408:
+            return TIMEOUT
+        return SERVER if status >= 500 else CLIENT
+    if isinstance(exc, FixtureMissing):
+        return FATAL
+    if isinstance(exc, httpx.TimeoutException):
+        return TIMEOUT
+    if isinstance(exc, httpx.TransportError):
+        return NETWORK
+    if isinstance(exc, (json.JSONDecodeError, UnicodeDecodeError)):
+        return DECODE
+    return OTHER
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return pause_from_headers(exc.response.headers)
+    return None
+
+
+class RetryBudget:
+    """一轮运行内所有调用共享的重试次数上限（线程安全）。"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self._lock:
+            if self.limit > 0 and self.used >= self.limit:
+                return False
+            self.used += 1
+            return True
+
+    def reset(self, limit: Optional[int] = None) -> None:
+        with self._lock:
+            self.used = 0
+            if limit is not None:
+                self.limit = limit
+
+
+BUDGET = RetryBudget(settings.RETRY_BUDGET_PER_RUN)
+_STATS: Counter = Counter()
+_STATS_LOCK = threading.Lock()
+
+
+def new_run() -> None:
+    """新一轮运行：重置重试预算与统计。"""
+    BUDGET.reset(settings.RETRY_BUDGET_PER_RUN)
+    with _STATS_LOCK:
+        _STATS.clear()
+
+
+def stats() -> Dict[str, int]:
+    with _STATS_LOCK:
+        out = dict(_STATS)
+    out["budget_used"] = BUDGET.used
+    out["budget_limit"] = BUDGET.limit
+    return out
+
+
+def describe() -> str:
+    s = stats()
+    kinds = ", ".join(f"{k}={v}" for k, v in sorted(s.items()) if k not in ("budget_used", "budget_limit", "exhausted"))
+    line = f"重试: 预算 {s['budget_used']}/{s['budget_limit'] or '不限'}" + (f"（{kinds}）" if kinds else "")
+    if s.get("exhausted"):
+        line += f"，预算耗尽后放弃 {s['exhausted']} 次"
+    return line
+
+
+class Attempt:
+    """一次尝试；`with attempt:` 内抛出的可重试异常被吞掉，由外层循环等待后重试。"""
+
+    def __init__(self, policy: "RetryPolicy", number: int):
+        self.policy = policy
+        self.number = number
+        self.error: Optional[BaseException] = None
+        self.retry_in: Optional[float] = None
+
+    def __enter__(self) -> "Attempt":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Optional[BaseException], tb: Any) -> bool:
+        if exc is None or not isinstance(exc, Exception):
+            return False
+        delay = self.policy.next_delay(exc, self.number)
+        if delay is None:
+            return False
+        self.error, self.retry_in = exc, delay
+        return True
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    attempts: int = 3  # 总尝试次数（含第一次）
+    base: float = 0.5  # 退避基数（秒）
+    cap: float = 10.0  # 单次等待上限（秒）
+    retry_on: FrozenSet[str] = DEFAULT_RETRY_ON
+    max_retry_after: float = 60.0  # Retry-After 最多等待（秒）
+    budget: RetryBudget = field(default=BUDGET, compare=False)
+
+    def next_delay(self, exc: BaseException, number: int) -> Optional[float]:
+        """第 number 次尝试失败后的等待秒数；不应重试时返回 None。"""
+        kind = classify(exc)
+        if kind not in self.retry_on or number >= self.attempts:
+            return None
+        if not self.budget.take():
+            with _STATS_LOCK:
+                _STATS["exhausted"] += 1
+            return None
+        with _STATS_LOCK:
+            _STATS[kind] += 1
+        delay = random.uniform(0.0, min(self.cap, self.base * (2 ** (number - 1))))
+        after = _retry_after(exc)
+        if after is not None:
+            delay = max(delay, min(after, self.max_retry_after))
+        return delay
+
+    def retrying(self) -> Iterator[Attempt]:
+        for number in range(1, max(1, self.attempts) + 1):
+            attempt = Attempt(self, number)
+            yield attempt
+            if attempt.retry_in is None:
+                return
+            time.sleep(attempt.retry_in)
+
+    async def aretrying(self) -> AsyncIterator[Attempt]:
+        for number in range(1, max(1, self.attempts) + 1):
+            attempt = Attempt(self, number)
+            yield attempt
+            if attempt.retry_in is None:
+                return
+            await asyncio.sleep(attempt.retry_in)
+
+    def call(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        for attempt in self.retrying():
+            with attempt:
+                return func(*args, **kwargs)
+
+    async def acall(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        async for attempt in self.aretrying():
+            with attempt:
+                return await func(*args, **kwargs)
+
+    def __call__(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        """作为装饰器使用；协程函数得到异步包装。"""
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                return await self.acall(func, *args, **kwargs)
+
+            return async_wrapper
 
-def retry_on_limit(max_retries=None, sleep_time=60):
-    """
-    通用重试装饰器（遇到频限错误自动 sleep & 重试）
-    
-    :param max_retries: int|None, 最大重试次数，None表示无限重试
-    :param sleep_time: int, 重试前等待时间（秒），默认60
-    """
-    def decorator(func):
         @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            retry_count = 0
-            
-            while True:
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    msg = str(e)
-                    
-                    # 判断是否是频限相关错误
-                    limit_keywords = [
-                        "每分钟最多访问", "频次", "频率", "访问过于频繁",
-                        "rate limit", "too many requests", "quota exceeded",
-                        "访问次数超限", "请求过于频繁", "API调用频率超限"
-                    ]
-                    
-                    is_limit_error = any(keyword in msg for keyword in limit_keywords)
-                    
-                    if is_limit_error:
-                        retry_count += 1
-                        
-                        # 检查是否超过最大重试次数
-                        if max_retries is not None and retry_count > max_retries:
-                            print(f"[{func.__name__}] 重试次数超过限制({max_retries})，停止重试")
-                            raise e
-                        
-                        # 增加随机延迟，避免同时重试
-                        actual_sleep = sleep_time + random.uniform(0, 30)
-                        print(f"[{func.__name__}] 访问频次限制，第{retry_count}次重试，等待{actual_sleep:.1f}秒...")
-                        time.sleep(actual_sleep)
-                        continue  # 重试
-                    else:
-                        # 非频限异常，直接抛出
-                        print(f"[{func.__name__}] 非频限错误: {msg}")
-                        raise e
-        
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            return self.call(func, *args, **kwargs)
+
         return wrapper
-    return decorator
+
+
+# ---- 兼容旧接口（参数含义不变，判断改为按类型分类） ----
+def retry_on_limit(max_retries=None, sleep_time=60):
+    """遇到限流（429 等）时退避重试；max_retries=None 时由本轮重试预算兜底。"""
+    return RetryPolicy(attempts=(max_retries if max_retries is not None else 100) + 1, base=1.0,
+                       cap=float(sleep_time), retry_on=frozenset({THROTTLED}))
+
 
 def retry_on_network(max_retries=3, sleep_time=5):
-    """
-    网络错误重试装饰器
-    
-    :param max_retries: int, 最大重试次数，默认3
-    :param sleep_time: int, 重试前等待时间（秒），默认5
-    """
-    def decorator(func):
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            retry_count = 0
-            
-            while True:
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    msg = str(e)
-                    
-                    # 判断是否是网络相关错误
-                    network_keywords = [
-                        "连接", "网络", "timeout", "超时", "connection",
-                        "网络错误", "连接失败", "请求超时", "网络超时"
-                    ]
-                    
-                    is_network_error = any(keyword in msg for keyword in network_keywords)
-                    
-                    if is_network_error:
-                        retry_count += 1
-                        
-                        if retry_count > max_retries:
-                            print(f"[{func.__name__}] 网络重试次数超过限制({max_retries})，停止重试")
-                            raise e
-                        
-                        print(f"[{func.__name__}] 网络错误，第{retry_count}次重试，等待{sleep_time}秒...")
-                        time.sleep(sleep_time)
-                        continue
-                    else:
-                        print(f"[{func.__name__}] 非网络错误: {msg}")
-                        raise e
-        
-        return wrapper
-    return decorator
+    """网络、超时类错误退避重试。"""
+    return RetryPolicy(attempts=max_retries + 1, base=1.0, cap=float(sleep_time), retry_on=frozenset({NETWORK, TIMEOUT}))
+
 
 def smart_retry(max_retries=5, limit_sleep=120, network_sleep=10):
-    """
-    智能重试装饰器（同时处理频限和网络错误）
-    
-    :param max_retries: int, 最大重试次数，默认5
-    :param limit_sleep: int, 频限错误等待时间（秒），默认120
-    :param network_sleep: int, 网络错误等待时间（秒），默认10
-    """
-    def decorator(func):
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            retry_count = 0
-            
-            while True:
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    msg = str(e)
-                    retry_count += 1
-                    
-                    # 判断错误类型
-                    limit_keywords = [
-                        "每分钟最多访问", "频次", "频率", "访问过于频繁",
-                        "rate limit", "too many requests", "quota exceeded",
-                        "访问次数超限", "请求过于频繁", "API调用频率超限"
-                    ]
-                    
-                    network_keywords = [
-                        "连接", "网络", "timeout", "超时", "connection",
-                        "网络错误", "连接失败", "请求超时", "网络超时"
-                    ]
-                    
-                    is_limit_error = any(keyword in msg for keyword in limit_keywords)
-                    is_network_error = any(keyword in msg for keyword in network_keywords)
-                    
-                    if retry_count > max_retries:
-                        print(f"[{func.__name__}] 重试次数超过限制({max_retries})，停止重试")
-                        raise e
-                    
-                    if is_limit_error:
-                        # 对于限流错误，使用递增的等待时间
-                        actual_sleep = limit_sleep + (retry_count - 1) * 30 + random.uniform(0, 60)
-                        print(f"[{func.__name__}] 访问频次限制，第{retry_count}次重试，等待{actual_sleep:.1f}秒...")
-                        time.sleep(actual_sleep)
-                        continue
-                    elif is_network_error:
-                        actual_sleep = network_sleep + random.uniform(0, 10)
-                        print(f"[{func.__name__}] 网络错误，第{retry_count}次重试，等待{actual_sleep:.1f}秒...")
-                        time.sleep(actual_sleep)
-                        continue
-                    else:
-                        print(f"[{func.__name__}] 其他错误: {msg}")
-                        raise e
-        
-        return wrapper
-    return decorator
-
-def tushare_retry(max_retries=10, base_sleep=60):
-    """
-    专门针对Tushare API的重试装饰器
-    
-    :param max_retries: int, 最大重试次数，默认10
-    :param base_sleep: int, 基础等待时间（秒），默认60
-    """
-    def decorator(func):
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            retry_count = 0
-            
-            while True:
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    msg = str(e)
-                    retry_count += 1
-                    
-                    # Tushare特有的限流错误
-                    tushare_limit_keywords = [
-                        "每分钟最多访问", "访问次数超限", "请求过于频繁"
-                    ]
-                    
-                    is_tushare_limit = any(keyword in msg for keyword in tushare_limit_keywords)
-                    
-                    if retry_count > max_retries:
-                        print(f"[{func.__name__}] Tushare重试次数超过限制({max_retries})，停止重试")
-                        raise e
-                    
-                    if is_tushare_limit:
-                        # 使用递增等待时间：60s, 75s, 90s, 105s...
-                        sleep_time = base_sleep + (retry_count - 1) * 15 + random.uniform(0, 10)
-                        print(f"[{func.__name__}] Tushare限流，第{retry_count}次重试，等待{sleep_time:.1f}秒...")
-                        time.sleep(sleep_time)
-                        continue
-                    else:
-                        print(f"[{func.__name__}] 非Tushare限流错误: {msg}")
-                        raise e
-        
-        return wrapper
-    return decorator
-
-# 使用示例
-if __name__ == "__main__":
-    import tushare as ts
-    import pandas as pd
-    
-    # 设置tushare token
-    ts.set_token('your_token_here')
-    pro = ts.pro_api()
-    
-    # 示例1: 使用频限重试装饰器
-    @retry_on_limit()
-    def get_daily_data(ts_code, start_date, end_date):
-        df = pro.daily(ts_code=ts_code, start_date=start_date, end_date=end_date)
-        return df
-    
-    # 示例2: 使用智能重试装饰器
-    @smart_retry(max_retries=3)
-    def get_stock_basic(ts_code):
-        df = pro.stock_basic(ts_code=ts_code)
-        return df
-    
-    # 示例3: 使用Tushare专用重试装饰器
-    @tushare_retry(max_retries=5, base_sleep=60)
-    def get_fund_share(ts_code):
-        df = pro.fund_share(ts_code=ts_code)
-        return df
-    
-    # 示例4: 自定义重试参数
-    @retry_on_limit(max_retries=5, sleep_time=30)
-    def get_index_weight(index_code, start_date, end_date):
-        df = pro.index_weight(index_code=index_code, start_date=start_date, end_date=end_date)
-        return df 
\ No newline at end of file
+    """同时处理限流、服务端错误与网络错误。"""
+    return RetryPolicy(attempts=max_retries + 1, base=float(network_sleep), cap=float(limit_sleep))
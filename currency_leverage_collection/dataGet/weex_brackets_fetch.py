@@ -1,16 +1,43 @@
+"""
+Weex 风险限额抓取
+
+1. 页面直取（settings.WEEX_HTML_ENABLED）：用异步 HTTP 并发下载各 symbol 的风险限额页，
+   表格已由服务端渲染、且页面的当前币对标签（span.coin-pair）就是目标币对时直接用 `_parse_ul` 正则解析；
+2. 浏览器回退：页面里没有渲染好的表格（需要执行脚本）或下载失败的 symbol，才用 Selenium 打开页面；
+   夹具 dataGet/fixtures/weex_getMetaDataV2.json 是真实录制（schema_verified）时，经 DevTools 网络事件
+   （chromedriver 性能日志）等到页面的数据接口响应完成，直接取响应 JSON 中的档位，一次响应含全部合约时同批
+   其余 symbol 不再打开页面；夹具仍是占位结构、响应解析不出档位时读取 ul.list-settle。
+   每个浏览器只完整加载一次页面，之后的 symbol 通过页面自己的币对下拉框切换（客户端渲染，不重新加载整个应用）；
+   读表要求币对标签为目标币对、切换后行内容与切换前不同，等不到时该 symbol 改为完整加载。
+
+输出 {BTCUSDT: [{lv, range, mlev, mmr, lev, notional_min, notional_max, mmr_rate}, ...]}（前四个为页面原文字符串，
+其余为解析好的数值）；meta 记录每种方式各解决了多少 symbol。
+"""
+
 from __future__ import annotations
 
+import argparse
+import asyncio
+import base64
+import importlib.util
 import json
 import re
 import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
 
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options as ChromeOptions
-from selenium.webdriver.common.by import By
-from selenium.common.exceptions import TimeoutException
+from config import settings
+from dataGet.utils import circuit_breaker, fixtures, http_client, rate_limit, retry_utils
 from dataGet.utils.multithread_utils import run_multithread
+from pipeline import tracing
+from pipeline.json_store import dump_json, load_json
+
+if TYPE_CHECKING:
+    from selenium import webdriver
+
+# selenium 只在浏览器回退时使用；未安装时页面直取照常工作
+HAS_SELENIUM = importlib.util.find_spec("selenium") is not None
 
 # 读取目标币种文件
 SURF_PAIRS_JSON = Path(__file__).resolve().parent.parent / "data" / "currency_kinds" / "surf_pairs.json"
@@ -21,13 +48,133 @@ OUT_BASE.mkdir(parents=True, exist_ok=True)
 OUT_JSON = OUT_BASE / "weex_selected.json"
 OUT_META = OUT_BASE / "weex_selected_meta.json"
 
-WEEX_BASE_URL = "https://www.weex.com/zh-CN/futures/introduction/risk-limit"
+WEEX_BASE_URL = f"{settings.WEEX_BASE_URL}/zh-CN/futures/introduction/risk-limit"
+WEEX_API_URL = settings.WEEX_API_URL
+
+API_HEADERS = {
+    "accept": "application/json, text/plain, */*",
+    "origin": "https://www.weex.com",
+    "referer": "https://www.weex.com/",
+    "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+}
+PAGE_HEADERS = {
+    "accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "user-agent": API_HEADERS["user-agent"],
+}
+PAGE_RETRY = retry_utils.RetryPolicy(attempts=2, base=1.0)
+# 风险限额页的币对下拉框（与 probe/weex_probe_cdp.py 一致）：切换币对时不重新加载页面
+WEEX_DROPDOWN_XPATH = "/html/body/div[5]/div/div/div[2]/div/div[2]/div/div[1]"
+WEEX_DROPDOWN_TOGGLE_XPATH = WEEX_DROPDOWN_XPATH + "/div[1]/span"
+WEEX_DROPDOWN_LIST_XPATH = WEEX_DROPDOWN_XPATH + "/div[2]//ul/li"
+
+# 浏览器内共用的读取函数：档位表的全部行（页面文本）与当前币对标签（span.coin-pair，如 "BTC/USDT"）
+_PAGE_JS = r"""
+const tierRows = () => {
+  const ul = document.querySelector('ul.list-settle');
+  if (!ul || !ul.offsetParent) return null;
+  const rows = [];
+  for (const li of ul.querySelectorAll(':scope > li')) {
+    if (li.classList.contains('list-title')) continue;
+    const t = Array.from(li.querySelectorAll(':scope > span'), (sp) => (sp.innerText || '').trim());
+    if (t.length >= 4) {
+      rows.push({lv: t[0], range: t[1], mlev: t[2], mmr: t[3]});
+    } else if (t.length) {
+      rows.push(Object.fromEntries(t.map((v, i) => ['col' + i, v])));
+    }
+  }
+  return rows;
+};
+const pairLabel = () => ((document.querySelector('.coin-pair') || {}).textContent || '').replace(/\s+/g, '').toUpperCase();
+"""
+
+# 在页面内点击下拉项切换币对，并在浏览器内等到当前币对标签变为目标（不产生 WebDriver 轮询）。
+# 返回 {ok, prev}：prev 为切换前表格行的快照，读表时据此确认表格已按新币对重新渲染
+_SWITCH_JS = _PAGE_JS + r"""
+const [base, toggleXpath, listXpath, timeoutMs, done] = arguments;
+const want = [base + '/USDT', base + 'USDT'];
+const norm = (el) => ((el && el.textContent) || '').replace(/\s+/g, '').toUpperCase();
+const one = (xp) => document.evaluate(xp, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+const item = () => {
+  const r = document.evaluate(listXpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+  for (let i = 0; i < r.snapshotLength; i++) {
+    if (want.includes(norm(r.snapshotItem(i)))) return r.snapshotItem(i);
+  }
+  return null;
+};
+const toggle = one(toggleXpath);
+if (!toggle) { done({ok: false}); return; }
+if (want.includes(norm(toggle))) { done({ok: true, prev: null}); return; }
+const prev = JSON.stringify(tierRows());
+const end = Date.now() + timeoutMs;
+let clicked = false;
+const step = () => {
+  if (!clicked) {
+    const li = item();
+    if (li) { li.click(); clicked = true; }
+  } else if (want.includes(norm(one(toggleXpath)))) {
+    // 标签先于表格更新时，读表一侧会等到行与 prev 不同
+    requestAnimationFrame(() => done({ok: true, prev: prev}));
+    return;
+  }
+  if (Date.now() > end) { done({ok: false}); return; }
+  setTimeout(step, 50);
+};
+if (!item()) toggle.click();  // 列表未展开时先展开
+step();
+"""
+
+# 在浏览器内等 ul.list-settle 渲染出档位行（区间带 ~、杠杆带 x 或费率带 %，与 _rendered 判断一致），
+# 然后一次返回全部行的页面文本 {lv, range, mlev, mmr}；数值字段回到 Python 由 _tier_numbers 统一解析。
+# 当前币对标签必须是目标币对；给了 prev（页面内切换前的表格快照）时行内容还必须与之不同，
+# 否则视为旧币对的表格尚未刷新，继续等待
+_TABLE_JS = _PAGE_JS + r"""
+const [want, prev, timeoutMs, done] = arguments;
+const end = Date.now() + timeoutMs;
+let why = '无档位行';
+const read = () => {
+  if (!want.includes(pairLabel())) { why = '币对标签为 ' + (pairLabel() || '空'); return null; }
+  const rows = tierRows();
+  if (!rows) { why = '无档位表'; return null; }
+  const ok = rows.slice(0, 5).some((r) => r.range !== undefined &&
+    (r.range.includes('~') || r.mlev.toLowerCase().includes('x') || r.mmr.includes('%')));
+  if (!ok) { why = '无档位行'; return null; }
+  if (prev && JSON.stringify(rows) === prev) { why = '表格仍是切换前的内容'; return null; }
+  return rows;
+};
+const step = () => {
+  let rows = null;
+  try { rows = read(); } catch (e) { done({ready: false, error: String(e)}); return; }
+  if (rows) { done({ready: true, rows: rows}); return; }
+  if (Date.now() > end) { done({ready: false, error: why}); return; }
+  setTimeout(step, 100);
+};
+step();
+"""
 
-UL_RE = re.compile(r"<ul[^>]*class=\"[^\"]*\\blist-settle\\b[^\"]*\"[^>]*>(.*?)</ul>", re.S | re.I)
+# 浏览器里视为“档位数据响应”的请求路径（页面自身调用的合约元数据接口 getMetaDataV2）
+CAPTURE_PATHS = (urlsplit(WEEX_API_URL).path,)
+
+# getMetaDataV2 的结构固定为夹具 dataGet/fixtures/weex_getMetaDataV2.json 中的字段名，不做猜测：
+# {"data": {"contractList": [{"symbol": "cmt_btcusdt", "riskLimitList": [{level, minPositionValue, ...}]}]}}
+# 外层结构不符时整个响应作废；单个合约或档位字段缺失 / 非数值时该合约改读页面表格（fail closed）。
+API_FIXTURE = Path(__file__).resolve().parent / "fixtures" / "weex_getMetaDataV2.json"
+API_CONTRACTS_PATH = ("data", "contractList")
+API_SYMBOL_KEY = "symbol"
+API_TIERS_KEY = "riskLimitList"
+API_LEVEL_KEY = "level"
+API_START_KEY = "minPositionValue"
+API_END_KEY = "maxPositionValue"
+API_LEV_KEY = "maxLeverage"
+API_MMR_KEY = "maintenanceMarginRate"
+API_TIER_KEYS = (API_LEVEL_KEY, API_START_KEY, API_END_KEY, API_LEV_KEY, API_MMR_KEY)
+
+PAIR_RE = re.compile(r"<span\b[^>]*class=\"[^\"]*\bcoin-pair\b[^\"]*\"[^>]*>(.*?)</span>", re.S | re.I)
+UL_RE = re.compile(r"<ul[^>]*class=\"[^\"]*\blist-settle\b[^\"]*\"[^>]*>(.*?)</ul>", re.S | re.I)
 LI_RE = re.compile(r"<li\b[^>]*>(.*?)</li>", re.S | re.I)
 SPAN_RE = re.compile(r"<span\b[^>]*>(.*?)</span>", re.S | re.I)
 TAG_RE = re.compile(r"<[^>]+>")
 WS_RE = re.compile(r"\s+")
+NUM_RE = re.compile(r"[-+]?[0-9]*\.?[0-9]+")
 
 
 def _clean_html_text(s: str) -> str:
@@ -39,7 +186,7 @@ def _clean_html_text(s: str) -> str:
 
 
 def _load_pairs(path: Path) -> List[Dict[str, str]]:
-    data = json.loads(path.read_text(encoding="utf-8"))
+    data = load_json(path)
     pairs = data.get("pairs") or []
     out: List[Dict[str, str]] = []
     for it in pairs:
@@ -57,7 +204,158 @@ def _build_code(base: str) -> str:
     # cmt_<base lower>usdt
     return f"cmt_{base.lower()}usdt"
 
-def _build_driver(headless: bool = True) -> webdriver.Chrome:
+
+def _pair_labels(base: str) -> List[str]:
+    # 页面当前币对标签的可接受写法（去空白、大写后比较），与 _SWITCH_JS 中的 want 一致
+    return [f"{base}/USDT", f"{base}USDT"]
+
+
+def _page_pair(html: str) -> Optional[str]:
+    """页面的当前币对标签（span.coin-pair，去空白、大写）；没有标签时返回 None。"""
+    m = PAIR_RE.search(html or "")
+    return WS_RE.sub("", _clean_html_text(m.group(1))).upper() if m else None
+
+
+class ApiSchemaError(ValueError):
+    """getMetaDataV2 的外层结构与夹具不符。"""
+
+
+def _norm_symbol(v: Any) -> Optional[str]:
+    """cmt_btcusdt → BTCUSDT（与 _build_code 相反）；其他形式返回 None。"""
+    if not isinstance(v, str):
+        return None
+    m = re.fullmatch(r"cmt_([0-9a-z]+)usdt", v.strip())
+    return f"{m.group(1).upper()}USDT" if m else None
+
+
+def _plain(v: Any) -> str:
+    """数值去掉多余的小数位（2000000.0 → 2000000，0.15000000000000002 → 0.15），与页面显示一致。"""
+    try:
+        return f"{float(v):.8f}".rstrip("0").rstrip(".")
+    except (TypeError, ValueError):
+        return str(v).strip()
+
+
+def _num(s: Any) -> Optional[float]:
+    m = NUM_RE.search(str(s or "").replace(",", ""))
+    return float(m.group(0)) if m else None
+
+
+def _tier_numbers(t: Dict[str, str]) -> Dict[str, Any]:
+    """在页面格式的字符串档位上附加数值：lev（最高杠杆）、notional_min / notional_max（持仓区间 USDT）、mmr_rate（小数）。"""
+    lo, _, hi = t["range"].partition("~")
+    mmr = _num(t["mmr"])
+    return {
+        **t,
+        "lev": _num(t["mlev"]),
+        "notional_min": _num(lo),
+        "notional_max": _num(hi),
+        "mmr_rate": round(mmr / 100, 10) if mmr is not None else None,
+    }
+
+
+def _percent(v: Any) -> str:
+    # 接口给的是小数（0.002），页面显示固定两位小数的百分数（0.20%、1.00%、0.67%），
+    # 响应与页面两种来源得到的 weex_selected.json 内容一致，增量跳过与内容摘要才不会因来源不同而变化
+    return f"{float(v) * 100:.2f}%"
+
+
+def _api_tier(t: Any) -> Optional[Dict[str, Any]]:
+    """接口的一档 → 与页面解析相同的字符串字段 {lv, range, mlev, mmr}；字段缺失或不是数值时返回 None。"""
+    if not isinstance(t, dict):
+        return None
+    try:
+        for k in API_TIER_KEYS:
+            float(t[k])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return _tier_numbers({
+        "lv": _plain(t[API_LEVEL_KEY]),
+        "range": f"{_plain(t[API_START_KEY])}~{_plain(t[API_END_KEY])}",
+        "mlev": f"{_plain(t[API_LEV_KEY])}x",
+        "mmr": _percent(t[API_MMR_KEY]),
+    })
+
+
+def _api_contracts(data: Any) -> List[Any]:
+    node = data
+    for k in API_CONTRACTS_PATH:
+        node = node.get(k) if isinstance(node, dict) else None
+    if not isinstance(node, list):
+        raise ApiSchemaError(f"响应中没有 {'.'.join(API_CONTRACTS_PATH)} 列表")
+    return node
+
+
+def _api_collect(data: Any) -> Tuple[Dict[str, List[Dict[str, Any]]], List[str]]:
+    """按固定结构取出各合约档位，返回 ({BTCUSDT: [{lv, range, mlev, mmr, ...}, ...]}, 结构不符的合约)。
+
+    外层结构不符时抛出 ApiSchemaError；单个合约只要有一档字段不全就整体丢弃，改读页面表格。
+    """
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    rejected: List[str] = []
+    contracts = _api_contracts(data)
+    for c in contracts:
+        sym = _norm_symbol(c.get(API_SYMBOL_KEY)) if isinstance(c, dict) else None
+        if not sym:
+            continue  # 非 USDT 永续（如币本位）不是目标
+        raw = c.get(API_TIERS_KEY)
+        tiers = [_api_tier(t) for t in raw] if isinstance(raw, list) else []
+        if not tiers or any(t is None for t in tiers):
+            rejected.append(sym)
+            continue
+        out[sym] = tiers
+    if contracts and not out and not rejected:
+        raise ApiSchemaError(f"{len(contracts)} 个合约的 {API_SYMBOL_KEY} 都不是 cmt_xxxusdt 形式")
+    return out, rejected
+
+
+def load_api_fixture() -> Dict[str, Any]:
+    """夹具中的 getMetaDataV2 响应。"""
+    return json.loads(API_FIXTURE.read_text(encoding="utf-8"))["response"]
+
+
+def schema_verified() -> bool:
+    """夹具是真实录制（有 recorded_at、没有 placeholder 标记）时为 True；只有这时才按 API_* 字段解析捕获的响应。"""
+    try:
+        data = json.loads(API_FIXTURE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return False
+    return not data.get("placeholder") and bool(data.get("recorded_at"))
+
+
+def record_fixture(keep: int = 5) -> Path:
+    """请求真实接口，把响应写入 API_FIXTURE：合约列表只留 BTC/ETH 等前 keep 个，其余字段原样保留。
+
+    外层结构与当前常量不符时保存完整响应，据此修改 API_* 常量后再录制一次。
+    """
+    resp = http_client.shared(WEEX_API_URL).get(WEEX_API_URL, headers=API_HEADERS, timeout=30.0)
+    resp.raise_for_status()
+    data = resp.json()
+    majors = ("BTCUSDT", "ETHUSDT", "SOLUSDT", "BNBUSDT", "DOGEUSDT")
+    try:
+        contracts = _api_contracts(data)
+        rank = {s: i for i, s in enumerate(majors)}
+        contracts[:] = sorted(
+            contracts, key=lambda c: rank.get(_norm_symbol(c.get(API_SYMBOL_KEY)) if isinstance(c, dict) else None, len(rank))
+        )[:keep]
+        tiers, rejected = _api_collect(data)
+        print(f"[weex] 录制完成：{len(tiers)} 个合约按当前字段解析成功，{len(rejected)} 个不符 {rejected}")
+    except ApiSchemaError as e:
+        print(f"[weex] 响应结构与当前字段不符（{e}），已保存完整响应")
+    API_FIXTURE.parent.mkdir(parents=True, exist_ok=True)
+    API_FIXTURE.write_text(json.dumps({
+        "url": WEEX_API_URL,
+        "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "response": data,
+    }, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    print(f"已写出: {API_FIXTURE}（核对 API_* 字段名；之后浏览器回退按此结构读取页面的数据响应）")
+    return API_FIXTURE
+
+
+def _build_driver(headless: bool = True) -> "webdriver.Chrome":
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options as ChromeOptions
+
     opts = ChromeOptions()
     if headless:
         opts.add_argument("--headless=new")
@@ -67,64 +365,84 @@ def _build_driver(headless: bool = True) -> webdriver.Chrome:
     opts.add_argument(
         "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
     )
+    # chromedriver 把 DevTools 的 Network 事件缓存在性能日志里，get_log 一次取回
+    opts.set_capability("goog:loggingPrefs", {"performance": "ALL"})
     return webdriver.Chrome(options=opts)
 
-def _wait_ul_render(driver: webdriver.Chrome, timeout: float = 15.0) -> None:
-    end = time.time() + timeout
-    last_err: Optional[Exception] = None
-    while time.time() < end:
-        try:
-            ul = driver.find_element(By.CSS_SELECTOR, "ul.list-settle")
-            if ul and ul.is_displayed():
-                # 自适应：不仅等待行数，还检测关键模式（~ / x / %）
-                lis = ul.find_elements(By.CSS_SELECTOR, ":scope > li")
-                if len(lis) >= 2:
-                    # 检查前3-5行是否有内容模式
-                    check_count = min(5, len(lis))
-                    for i in range(check_count):
-                        spans = lis[i].find_elements(By.CSS_SELECTOR, ":scope > span")
-                        texts = [(s.text or "").strip() for s in spans]
-                        if len(texts) >= 4:
-                            second, third, fourth = texts[1], texts[2], texts[3]
-                            if ("~" in second) or ("x" in third.lower()) or ("%" in fourth):
-                                return
-        except Exception as e:
-            last_err = e
-        time.sleep(0.3)
-    raise TimeoutException(f"等待 list-settle 渲染超时: {last_err}")
-
-def _parse_from_dom(driver: webdriver.Chrome) -> List[Dict[str, str]]:
+
+def _capture_tiers(driver: "webdriver.Chrome", timeout: float) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+    """driver.get 之后：从 Network 事件中等到数据接口的响应加载完成，取响应体解析全部合约的档位。
+
+    driver.get 返回时响应通常已经到达，第一次 get_log 即可命中。响应体解析失败（结构与夹具不符）或没有档位时
+    立即返回 None，不等满 timeout；超时返回 None。
+    """
+    watching: Dict[str, str] = {}
+    end = time.monotonic() + timeout
+    while True:
+        for entry in driver.get_log("performance"):
+            try:
+                msg = json.loads(entry["message"])["message"]
+            except (KeyError, TypeError, ValueError):
+                continue
+            method, params = msg.get("method"), msg.get("params") or {}
+            if method == "Network.responseReceived":
+                url = (params.get("response") or {}).get("url", "")
+                if any(p in url for p in CAPTURE_PATHS):
+                    watching[params.get("requestId")] = url
+            elif method == "Network.loadingFinished" and params.get("requestId") in watching:
+                try:
+                    body = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": params["requestId"]})
+                    text = base64.b64decode(body["body"]) if body.get("base64Encoded") else body["body"]
+                    tiers, _ = _api_collect(json.loads(text))
+                except Exception:
+                    return None
+                return tiers or None
+        if time.monotonic() >= end:
+            return None
+        time.sleep(0.05)
+
+
+def _switch_symbol(driver: "webdriver.Chrome", base: str, timeout: float) -> Tuple[bool, Optional[str]]:
+    """在已加载的风险限额页内切换到 base/USDT，返回 (是否切换成功, 切换前的表格快照)。
+
+    页面结构不符或超时返回 (False, None)，调用方改为完整加载；快照交给 _read_table，用于确认表格已刷新。
+    """
     try:
-        ul = driver.find_element(By.CSS_SELECTOR, "ul.list-settle")
+        driver.set_script_timeout(timeout + 1)
+        res = driver.execute_async_script(
+            _SWITCH_JS, base, WEEX_DROPDOWN_TOGGLE_XPATH, WEEX_DROPDOWN_LIST_XPATH, int(timeout * 1000)
+        ) or {}
     except Exception:
-        return []
-    items: List[Dict[str, str]] = []
-    lis = ul.find_elements(By.CSS_SELECTOR, ":scope > li")
-    for li in lis:
-        cls = (li.get_attribute("class") or "").lower()
-        if "list-title" in cls:
-            continue
-        spans = li.find_elements(By.CSS_SELECTOR, ":scope > span")
-        texts = [(s.text or "").strip() for s in spans]
-        if len(texts) >= 4:
-            items.append({
-                "lv": texts[0],
-                "range": texts[1],
-                "mlev": texts[2],
-                "mmr": texts[3],
-            })
-        elif texts:
-            items.append({f"col{i}": v for i, v in enumerate(texts)})
-    return items
+        return False, None
+    return bool(res.get("ok")), res.get("prev")
+
 
+def _read_table(driver: "webdriver.Chrome", base: str, timeout: float = 15.0, prev: Optional[str] = None) -> List[Dict[str, Any]]:
+    """一次 execute_async_script：在浏览器内等 base/USDT 的表格渲染好并取回全部行；超时抛出 TimeoutError。
 
-def _parse_ul(html: str) -> List[Dict[str, str]]:
-    """解析 UL.list-settle，返回 [ {lv, range, mlev, mmr}, ... ] 字段均为字符串。"""
+    页面的当前币对标签不是 base/USDT，或行内容仍与切换前的快照 prev 相同，都不算渲染好。
+    数值字段由 _tier_numbers 补上，与 HTML 直取、网络响应两种方式的解析（含 mmr_rate 的舍入）完全一致。
+    """
+    driver.set_script_timeout(timeout + 1)
+    res = driver.execute_async_script(_TABLE_JS, _pair_labels(base), prev, int(timeout * 1000)) or {}
+    if not res.get("ready"):
+        raise TimeoutError(f"等待 {base}/USDT 的 list-settle 渲染超时: {res.get('error') or '无档位行'}")
+    return [_tier_numbers(r) if "range" in r else r for r in res.get("rows") or []]
+
+
+def _parse_ul(html: str, base: Optional[str] = None) -> List[Dict[str, Any]]:
+    """解析 UL.list-settle，返回 [ {lv, range, mlev, mmr, lev, notional_min, notional_max, mmr_rate}, ... ]。
+
+    lv/range/mlev/mmr 为页面原文字符串，其余为 _tier_numbers 解析的数值（解析不出时为 None）。
+    给了 base 时页面的当前币对标签必须是 base/USDT，否则（如服务端忽略 ?code= 渲染了默认合约）返回 []。
+    """
+    if base is not None and _page_pair(html) not in _pair_labels(base):
+        return []
     m = UL_RE.search(html or "")
     if not m:
         return []
     ul_html = m.group(1)  # ul 内部
-    items: List[Dict[str, str]] = []
+    items: List[Dict[str, Any]] = []
     for li_html in LI_RE.findall(ul_html):
         # 跳过标题行：含有 list-title 或包含“档位/持仓/杠杆/维持”等关键字
         li_plain = _clean_html_text(li_html).lower()
@@ -135,47 +453,157 @@ def _parse_ul(html: str) -> List[Dict[str, str]]:
             for x in SPAN_RE.findall(li_html)
         ]
         if len(spans) >= 4:
-            items.append({
+            items.append(_tier_numbers({
                 "lv": spans[0],
                 "range": spans[1],
                 "mlev": spans[2],
                 "mmr": spans[3],
-            })
+            }))
         elif len(spans) > 0:
             # 容错：少列也保留原始文本
             items.append({f"col{i}": v for i, v in enumerate(spans)})
     return items
 
 
-def _process_batch(bases: List[str], headless: bool, per_wait: float, render_timeout: float) -> Dict[str, Any]:
-    """每个线程处理一批base，线程内复用一个driver。返回 {result, errors}。"""
-    result: Dict[str, List[Dict[str, str]]] = {}
+def _rendered(tiers: List[Dict[str, Any]]) -> bool:
+    """解析结果是否为渲染好的档位表（区间带 ~、杠杆带 x 或费率带 %，与浏览器内 _TABLE_JS 的判断一致）。"""
+    for t in tiers[:5]:
+        if {"lv", "range", "mlev", "mmr"} <= t.keys() and (
+            "~" in t["range"] or "x" in t["mlev"].lower() or "%" in t["mmr"]
+        ):
+            return True
+    return False
+
+
+async def _fetch_pages(bases: List[str], concurrency: int, timeout: float) -> Tuple[Dict[str, List[Dict[str, Any]]], List[str], Dict[str, int]]:
+    """页面直取：异步并发下载各 symbol 的风险限额页并用 _parse_ul 解析。
+
+    返回 (已解析的 {symbol: 档位}, 需要浏览器的 base 列表, 计数)。页面里没有 ul.list-settle、只有表头
+    或内容不像档位（客户端渲染的空壳）时判定为需要浏览器；当前币对标签不是目标币对（服务端渲染了
+    其他合约）的、下载失败的也交给浏览器。
+    """
+    sem = asyncio.Semaphore(max(1, concurrency))
+    result: Dict[str, List[Dict[str, Any]]] = {}
+    need_browser: List[str] = []
+    counts = {"server_rendered": 0, "client_render": 0, "wrong_pair": 0, "failed": 0}
+    breaker = circuit_breaker.get("weex", "html")
+
+    async with http_client.async_client(WEEX_BASE_URL, max_connections=concurrency) as client:
+
+        async def one(base: str) -> None:
+            flat = f"{base}USDT"
+            url = f"{WEEX_BASE_URL}?code={_build_code(base)}"
+            async with sem:
+                try:
+                    async for attempt in PAGE_RETRY.aretrying():
+                        with attempt, breaker.guard():
+                            r = await client.get(url, headers=PAGE_HEADERS, timeout=timeout,
+                                                 extensions={"trace_attrs": {"symbol": flat}})
+                            r.raise_for_status()
+                            html = r.text
+                except Exception:
+                    counts["failed"] += 1
+                    need_browser.append(base)
+                    return
+            tiers = _parse_ul(html)
+            if not _rendered(tiers):
+                counts["client_render"] += 1
+                need_browser.append(base)
+            elif _page_pair(html) not in _pair_labels(base):
+                counts["wrong_pair"] += 1
+                need_browser.append(base)
+            else:
+                counts["server_rendered"] += 1
+                result[flat] = tiers
+
+        await asyncio.gather(*(one(b) for b in bases))
+    return result, need_browser, counts
+
+
+def _process_batch(bases: List[str], headless: bool, render_timeout: float) -> Dict[str, Any]:
+    """每个线程处理一批base，线程内复用一个driver。返回 {result, errors}。
+
+    夹具已是真实录制时，档位优先取自页面数据接口的响应（_capture_tiers），同一响应里已有的 symbol 不再打开页面；
+    夹具仍是占位结构、或响应里没有时等待并读取 DOM 表格。
+    回放模式（HTTP_FIXTURE_MODE=replay）不启动浏览器，直接用 _parse_ul 解析录制的页面。
+    """
+    result: Dict[str, List[Dict[str, Any]]] = {}
     errors: List[Dict[str, Any]] = []
-    driver = _build_driver(headless=headless)
-    try:
+    captured: Dict[str, List[Dict[str, Any]]] = {}
+    # 只按真实录制的结构解析响应；某页取不到档位后，本批其余页面直接读 DOM
+    use_network = schema_verified()
+    use_switch = settings.WEEX_SWITCH_ENABLED
+    page_ready = False  # 当前浏览器里是否已有加载好的风险限额页（可在页面内切换币对）
+    replay = fixtures.mode() == "replay"
+    driver = None
+    if not replay:
+        with tracing.span("weex.driver_start", exchange="weex"):
+            driver = _build_driver(headless=headless)
         driver.set_page_load_timeout(60)
+    breaker = circuit_breaker.get("weex", "page")
+    try:
         for base in bases:
             flat = f"{base}USDT"
             code = _build_code(base)
             url = f"{WEEX_BASE_URL}?code={code}"
+            if captured.get(flat):
+                result[flat] = captured[flat]
+                continue
+            # 页面普遍超时时熔断：其余 symbol 不再各自等满加载/渲染超时
+            if not breaker.allow():
+                errors.append({"symbol": flat, "code": code, "url": url, "error": "circuit_open"})
+                result[flat] = []
+                continue
             try:
-                driver.get(url)
-                _wait_ul_render(driver, timeout=render_timeout)
-                # 自适应等到条件满足立即解析，无需固定等待；但为安全可以短暂缓冲
-                if per_wait > 0:
-                    time.sleep(per_wait)
-                tiers = _parse_from_dom(driver)
-            except TimeoutException:
-                tiers = []
+                with tracing.span("weex.page", exchange="weex", symbol=flat) as sp:
+                    tiers = None
+                    if replay:
+                        tiers = _parse_ul(fixtures.load_page(url) or "", base)
+                    elif page_ready and use_switch:
+                        switched, prev = _switch_symbol(driver, base, timeout=render_timeout)
+                        if switched:
+                            # 页面内切换：数据已在页面里，只等表格按新币对重新渲染；
+                            # 等不到（标签不符或仍是旧币对的行）时本 symbol 改为完整加载
+                            try:
+                                tiers = _read_table(driver, base, timeout=render_timeout, prev=prev)
+                                sp.attrs["source"] = "switch"
+                                fixtures.save_page(url, driver.page_source)
+                            except Exception:
+                                sp.attrs["switch_stale"] = True
+                        else:
+                            # 切换失败（页面结构不符）后本批其余 symbol 都完整加载
+                            use_switch = False
+                    if tiers is None:
+                        page_ready = False
+                        # 各线程的浏览器共用 weex 的令牌桶，控制整体翻页频率
+                        wait = rate_limit.acquire(url)
+                        if wait > 0:
+                            sp.attrs["rate_wait_ms"] = round(wait * 1000, 1)
+                        if use_network:
+                            driver.get_log("performance")  # 丢弃上一页的事件
+                        driver.get(url)
+                        if use_network:
+                            got = _capture_tiers(driver, timeout=render_timeout)
+                            use_network = got is not None
+                            captured.update(got or {})
+                        tiers = captured.get(flat) or []
+                        sp.attrs["source"] = "network" if tiers else "dom"
+                        if not tiers:
+                            tiers = _read_table(driver, base, timeout=render_timeout)
+                        page_ready = True
+                        fixtures.save_page(url, driver.page_source)
+                    sp.attrs["tiers"] = len(tiers)
+                breaker.record(True)
             except Exception:
                 tiers = []
+                breaker.record(False)
 
             if not tiers:
                 errors.append({"symbol": flat, "code": code, "url": url, "error": "no_table"})
             result[flat] = tiers
-            time.sleep(0.05)
     finally:
-        driver.quit()
+        if driver is not None:
+            driver.quit()
     return {"result": result, "errors": errors}
 
 
@@ -189,43 +617,82 @@ def _chunk_list(items: List[str], chunks: int) -> List[List[str]]:
     return out
 
 
-def main(headless: bool = True, per_wait: float = 0.8, render_timeout: float = 15.0, concurrency: int = 4) -> None:
+def main(headless: bool = True, render_timeout: float = 15.0, concurrency: int = 4) -> None:
     pairs = _load_pairs(SURF_PAIRS_JSON)
     bases = [it["base"] for it in pairs]
 
-    batches = _chunk_list(bases, concurrency)
+    # 1) 先直接下载页面解析，服务端未渲染表格的再交给浏览器
+    pending = list(bases)
+    html_result: Dict[str, List[Dict[str, Any]]] = {}
+    html_info: Dict[str, Any] = {"enabled": settings.WEEX_HTML_ENABLED, "requested": 0}
+    if settings.WEEX_HTML_ENABLED and pending:
+        with tracing.span("weex.html", exchange="weex", symbols=len(pending)) as sp:
+            html_result, pending, counts = asyncio.run(
+                _fetch_pages(pending, settings.WEEX_HTML_CONCURRENCY, timeout=render_timeout)
+            )
+            sp.attrs.update(counts)
+        html_info.update(requested=len(html_result) + len(pending), **counts)
+    need_browser = set(pending)
+    pending = [b for b in bases if b in need_browser]  # 保持目标列表顺序，便于分批
+    batches = _chunk_list(pending, concurrency) if pending else []
 
     def runner(batch: List[str]) -> Dict[str, Any]:
-        return _process_batch(batch, headless=headless, per_wait=per_wait, render_timeout=render_timeout)
-
-    mt_results = run_multithread(func=runner, data_list=batches, max_workers=concurrency, show_progress=True)
+        return _process_batch(batch, headless=headless, render_timeout=render_timeout)
 
-    merged_result: Dict[str, List[Dict[str, str]]] = {}
+    merged_result: Dict[str, List[Dict[str, Any]]] = dict(html_result)
     merged_errors: List[Dict[str, Any]] = []
-    for r in mt_results:
-        if not isinstance(r, dict):
-            continue
-        merged_result.update(r.get("result", {}))
-        merged_errors.extend(r.get("errors", []))
+    capture = schema_verified()
+    if pending and not capture:
+        print(f"[weex] {API_FIXTURE.name} 仍是占位结构，浏览器回退直接读页面表格（--record-fixture 录制后启用网络响应捕获）")
+    if pending and not HAS_SELENIUM and fixtures.mode() != "replay":
+        print(f"[weex] 未安装 selenium，{len(pending)} 个 symbol 无法回退到页面抓取")
+        for base in pending:
+            merged_result[f"{base}USDT"] = []
+            merged_errors.append({"symbol": f"{base}USDT", "code": _build_code(base), "error": "selenium_unavailable"})
+    elif pending:
+        with tracing.span("weex.scrape", exchange="weex", symbols=len(pending), concurrency=concurrency):
+            mt_results = run_multithread(func=runner, data_list=batches, max_workers=concurrency, show_progress=True)
+        for r in mt_results:
+            if not isinstance(r, dict):
+                continue
+            merged_result.update(r.get("result", {}))
+            merged_errors.extend(r.get("errors", []))
 
-    OUT_JSON.write_text(json.dumps(merged_result, ensure_ascii=False, indent=2), encoding="utf-8")
+    # 按目标列表顺序输出，两种来源混合时文件内容也稳定
+    merged_result = {f"{b}USDT": merged_result[f"{b}USDT"] for b in bases if f"{b}USDT" in merged_result}
+    dump_json(OUT_JSON, merged_result)
     meta = {
         "source": str(WEEX_BASE_URL),
         "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
         "count_symbols": len(merged_result),
         "count_errors": len(merged_errors),
         "errors": merged_errors[:200],
-        "note": "所有字段均为字符串，直接来自页面展示（lv, range, mlev, mmr）",
+        "note": "lv, range, mlev, mmr 为字符串，格式与页面展示一致（网络响应中的数值已按页面格式转换）；"
+                "lev, notional_min, notional_max, mmr_rate 为解析后的数值（mmr_rate 为小数）",
+        "html": html_info,
+        "html_resolved": len(html_result),
+        "network_capture": capture,
+        "fallback_symbols": len(pending),
         "headless": headless,
         "render_timeout": render_timeout,
-        "per_wait": per_wait,
         "concurrency": concurrency,
         "batches": len(batches),
+        "circuit": circuit_breaker.snapshot("weex"),
     }
     OUT_META.write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
-    print(f"已写出: {OUT_JSON} ({len(merged_result)} symbols), meta: {OUT_META} (errors={len(merged_errors)})")
+    print(
+        f"已写出: {OUT_JSON} ({len(merged_result)} symbols，页面直取 {len(html_result)}，"
+        f"浏览器 {len(pending)}), "
+        f"meta: {OUT_META} (errors={len(merged_errors)})"
+    )
 
 
 if __name__ == "__main__":
-    # 默认使用并发多实例+自适应等待。需要观察可设 headless=False。
-    main(headless=True, per_wait=0.8, render_timeout=15.0, concurrency=4)
+    ap = argparse.ArgumentParser(description="Weex 风险限额抓取")
+    ap.add_argument("--record-fixture", action="store_true", help="录制 getMetaDataV2 响应到 dataGet/fixtures/（不抓取）")
+    args = ap.parse_args()
+    if args.record_fixture:
+        record_fixture()
+    else:
+        # 默认使用并发多实例+自适应等待。需要观察可设 headless=False。
+        main(headless=True, render_timeout=15.0, concurrency=settings.WEEX_CONCURRENCY)
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import sys
 import subprocess
+import contextlib
 import time
 from pathlib import Path
 import os
@@ -9,6 +10,21 @@ import logging
 import random
 import traceback
 
+from config import settings
+from dataGet.dataGet_main import (
+    EXCHANGE_ARTIFACTS,
+    JOB_DEPS,
+    OUTPUT_FILES,
+    build_jobs as build_fetch_jobs,
+    print_summary,
+    write_freshness,
+)
+from dataGet.utils import circuit_breaker, rate_limit, retry_utils
+from pipeline.cadence import CadenceState, Source
+from pipeline import manifest, tracing
+from pipeline.dag import DagJob, DagScheduler
+from pipeline.stage_runner import StageImportError, run_inprocess
+
 def _resolve_base_dir() -> Path:
     if getattr(sys, "frozen", False):
         return Path.cwd()
@@ -24,6 +40,8 @@ def _resolve_python(base_dir: Path) -> str:
 
 BASE_DIR = _resolve_base_dir()
 PY = _resolve_python(BASE_DIR)
+# 运行模式：打包（frozen）后阶段模块不随 exe 分发，只能走子进程
+RUN_MODE = "subprocess" if getattr(sys, "frozen", False) else settings.PIPELINE_MODE
 
 # 路径（以项目根 currency_leverage_collection 为基准）
 # 优先使用基于 API 的币种抓取
@@ -38,6 +56,20 @@ LOG_DIR.mkdir(parents=True, exist_ok=True)
 APP_LOG = LOG_DIR / "app.log"
 LOCK_PATH = BASE_DIR / "app.lock"
 
+# 进程内模式的阶段入口：name -> (模块, 函数, 参数)
+STAGE_ENTRIES = {
+    "fetch_symbols": ("currencyGet_surf.fetch_symbols_api", "fetch_and_save_api", {}),
+    "tableMake_main": ("tableMake.tableMake_main", "main", {"mode": "inprocess"}),
+    "make_suggest_rules": ("tableMake.make_suggest_rules", "main", {}),
+}
+
+
+def _child_env() -> dict:
+    # 子进程以脚本路径启动，sys.path 不含项目根；显式补上以保证 `from config import settings` 可用
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([str(BASE_DIR)] + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else []))
+    return tracing.child_env(env)
+
 
 def run_py(name: str, path: Path, args: list[str] | None = None) -> int:
     args = args or []
@@ -50,14 +82,36 @@ def run_py(name: str, path: Path, args: list[str] | None = None) -> int:
     errp = LOG_DIR / f"{ts}_{name}.stderr.log"
     print(f"[+] 运行 {name}: {path}")
     logging.info("运行子任务 %s: %s", name, path)
+    start = time.time()
     with outp.open("w", encoding="utf-8", buffering=1) as fo, errp.open("w", encoding="utf-8", buffering=1) as fe:
         # 统一以项目根为工作目录，保证包导入如 `from config import settings` 正常
-        rc = subprocess.call([PY, str(path), *args], stdout=fo, stderr=fe, cwd=str(BASE_DIR))
-    print(f"[=] 完成 {name}, rc={rc}, 日志: {outp.name} / {errp.name}")
-    logging.info("完成子任务 %s, rc=%s", name, rc)
+        rc = subprocess.call([PY, str(path), *args], stdout=fo, stderr=fe, cwd=str(BASE_DIR), env=_child_env())
+    dur = time.time() - start
+    print(f"[=] 完成 {name}, rc={rc}, 用时 {dur:.1f}s, 日志: {outp.name} / {errp.name}")
+    logging.info("完成子任务 %s, rc=%s, 用时 %.1fs", name, rc, dur)
     return rc
 
 
+def run_stage(name: str, path: Path, kwargs: dict | None = None, log_dir: Path | None = LOG_DIR) -> int:
+    """按 RUN_MODE 运行一个 Python 阶段；进程内模式导入失败时回退到子进程。
+
+    kwargs 仅在进程内模式下追加给入口函数；log_dir=None 时输出沿用当前 stdout（并发阶段不能各自重定向）。
+    """
+    entry = STAGE_ENTRIES.get(name)
+    if RUN_MODE != "inprocess" or entry is None:
+        return run_py(name, path)
+    module, func, base_kwargs = entry
+    print(f"[+] 运行 {name}（进程内）: {module}.{func}")
+    logging.info("运行阶段 %s（进程内）: %s.%s", name, module, func)
+    try:
+        res = run_inprocess(name, module, func, {**base_kwargs, **(kwargs or {})}, log_dir=log_dir)
+    except StageImportError as e:
+        logging.warning("%s，回退子进程模式", e)
+        return run_py(name, path)
+    print(f"[=] 完成 {name}, rc={res.rc}, 导入 {res.import_sec:.2f}s, 运行 {res.run_sec:.1f}s")
+    return res.rc
+
+
 def run_ps1(name: str, path: Path, args: list[str] | None = None) -> int:
     args = args or []
     if not path.exists():
@@ -97,45 +151,151 @@ def release_lock() -> None:
         logging.exception("移除锁文件失败")
 
 
-def run_once() -> int:
+def build_cadence() -> CadenceState:
+    """常驻模式的数据源节奏：目标列表 + 各抓取任务，间隔取自 settings.REFRESH_INTERVALS。"""
+    files = {"fetch_symbols": settings.OUTPUT_JSON, **OUTPUT_FILES}
+    return CadenceState(
+        Source(name=name, interval=float(settings.REFRESH_INTERVALS.get(name, 3600)), artifact=path)
+        for name, path in files.items()
+    )
+
+
+def build_pipeline(due: set[str] | None = None, cadence: CadenceState | None = None) -> tuple[DagScheduler, dict]:
+    """按真实依赖组装一轮流水线：
+
+    fetch_symbols ─┬─ pair_id ──→ surf
+                   └─ surf_pairs → binance / bybit / mexc / weex ─┐
+    cmc_top20（无依赖）                                          ├→ tableMake_main → make_suggest_rules
+                                                                 ┘
+    due=None 表示全量运行；否则只抓取到期的数据源，其余数据源沿用磁盘上的最新结果。
+    传入 cadence 时，只有抓取结果内容发生变化才重建输出。
+    """
+    holder: dict = {}
+    state: dict = {"fetch_results": None, "rebuilt": False}
+    frozen = getattr(sys, "frozen", False)
+    inprocess = RUN_MODE == "inprocess"
+    stage_log = None if inprocess else LOG_DIR
+    full = due is None or "fetch_symbols" in due
+    fetch_due = set(JOB_DEPS) if full else set(due) & set(JOB_DEPS)
+    initial: list[str] = []
+
+    def fetch_symbols() -> int:
+        # 进程内模式下 pair_id.json 一落盘即放行 SURF 限额抓取
+        on_pair_ids = lambda _p: holder["sched"].publish("pair_id")
+        return run_stage("fetch_symbols", FETCH_SYMBOLS, kwargs={"on_pair_ids": on_pair_ids}, log_dir=stage_log)
+
+    jobs = []
+    if full:
+        jobs.append(DagJob("fetch_symbols", fetch_symbols, outputs=("surf_pairs", "pair_id")))
+    else:
+        initial += ["surf_pairs", "pair_id"]
+    if frozen:
+        # 打包运行时抓取脚本路径不在包内，整体交给 dataGet_main 子进程
+        jobs.append(DagJob(
+            "dataGet_main", lambda: run_py("dataGet_main", DATAGET_MAIN),
+            inputs=("surf_pairs", "pair_id"), outputs=("cmc_top20",) + EXCHANGE_ARTIFACTS, expires=True,
+        ))
+    else:
+        state["fetch_results"] = {}
+        jobs.extend(build_fetch_jobs(RUN_MODE, state["fetch_results"], python=PY, only=fetch_due))
+        for name, (_inputs, outputs) in JOB_DEPS.items():
+            if name not in fetch_due:
+                initial.extend(outputs)
+
+    def fetched_ok(name: str) -> bool:
+        job = "dataGet_main" if frozen and name in JOB_DEPS else name
+        return job in holder["sched"].records and holder["sched"].ok(job)
+
+    def table() -> int:
+        if not frozen:
+            # 过期/失败的交易所回退到最后一次成功快照（打包模式由 dataGet_main 子进程自行写出）
+            write_freshness(holder["sched"].records, fetch_due)
+        if cadence is not None:
+            ran = (["fetch_symbols"] if full else []) + sorted(fetch_due)
+            changed = [n for n in ran if fetched_ok(n) and cadence.absorb(n)]
+            if not changed:
+                print("[=] 本轮抓取的数据均无变化，跳过制表与发布")
+                logging.info("数据无变化（%s），跳过制表", ", ".join(ran))
+                return 0
+            print(f"[+] 数据有变化: {', '.join(changed)}，重建输出")
+            logging.info("数据有变化: %s，重建输出", ", ".join(changed))
+        state["rebuilt"] = True
+        return run_stage("tableMake_main", TABLE_MAKE, log_dir=stage_log)
+
+    def suggest() -> int:
+        if not state["rebuilt"]:
+            return 0
+        return run_stage("make_suggest_rules", SUGGEST_RULES, log_dir=stage_log)
+
+    # 制表只硬依赖目标列表；交易所为软依赖，个别交易所失败不阻塞出表
+    jobs.append(DagJob(
+        "tableMake_main", table,
+        inputs=("surf_pairs",), soft_inputs=EXCHANGE_ARTIFACTS, outputs=("table",),
+    ))
+    if SUGGEST_RULES.exists():
+        jobs.append(DagJob(
+            "make_suggest_rules", suggest,
+            inputs=("table",), soft_inputs=("cmc_top20",), outputs=("suggest",),
+        ))
+    # 抓取截止时间 = 本轮预算 - 留给制表/入库的时间；到期未完成的交易所不再等待
+    sched = DagScheduler(jobs, initial=initial, deadline=settings.FETCH_DEADLINE_SEC)
+    holder["sched"] = sched
+    return sched, state
+
+
+def run_once(due: set[str] | None = None, cadence: CadenceState | None = None) -> int:
     start = time.time()
+    logging.info("运行模式: %s, 本轮数据源: %s", RUN_MODE, "全部" if due is None else ", ".join(sorted(due)))
 
-    # 1) 获取目标币种集合
-    rc = run_py("fetch_symbols", FETCH_SYMBOLS)
-    if rc != 0:
-        print("[!] fetch_symbols 失败")
-        logging.error("fetch_symbols 失败, rc=%s", rc)
-        return rc
+    trace_path = tracing.start_trace("run_once")
+    retry_utils.new_run()
+    circuit_breaker.new_run()
+    sched, state = build_pipeline(due, cadence)
+    with contextlib.ExitStack() as stack:
+        if RUN_MODE == "inprocess":
+            # 进程内各阶段并发运行，统一写入本轮的 pipeline 日志
+            ts = time.strftime("%Y%m%d_%H%M%S")
+            fo = stack.enter_context((LOG_DIR / f"{ts}_pipeline.stdout.log").open("w", encoding="utf-8", buffering=1))
+            fe = stack.enter_context((LOG_DIR / f"{ts}_pipeline.stderr.log").open("w", encoding="utf-8", buffering=1))
+            stack.enter_context(contextlib.redirect_stdout(fo))
+            stack.enter_context(contextlib.redirect_stderr(fe))
+        with tracing.span("run_once", mode=RUN_MODE, due=sorted(due) if due else "all"):
+            sched.run()
+        if state["fetch_results"]:
+            print_summary(state["fetch_results"], sched.records)
+        report = sched.report()
+        print(report)
+        print(manifest.summary(limit=8))
+        print(tracing.summarize(trace_path))
+        print(rate_limit.describe())
+        print(retry_utils.describe())
+        print(circuit_breaker.describe())
+    logging.info("%s", report)
+    logging.info("追踪文件: %s（python -m pipeline.tracing 查看汇总）", trace_path)
 
-    # 2) 并行获取四所数据
-    rc = run_py("dataGet_main", DATAGET_MAIN)
-    if rc != 0:
-        print("[!] dataGet_main 失败")
-        logging.error("dataGet_main 失败, rc=%s", rc)
+    for name in ("fetch_symbols", "tableMake_main", "make_suggest_rules"):
+        rec = sched.records.get(name)
+        if rec is None or rec.status == "ok":
+            continue
+        rc = rec.rc if rec.rc not in (None, 0) else 1
+        print(f"[!] {name} 失败（{rec.status}）")
+        logging.error("%s 失败, status=%s, rc=%s %s", name, rec.status, rec.rc, rec.error)
         return rc
 
-    # 3) 制作表格并写库（tableMake_main 内部包含：生成 Excel → 建最小表 → Excel 入库）
-    rc = run_py("tableMake_main", TABLE_MAKE)
-    if rc != 0:
-        print("[!] tableMake 失败")
-        logging.error("tableMake 失败, rc=%s", rc)
-        return rc
-    # 3.1) 生成 Suggest Rules Excel
-    if SUGGEST_RULES.exists():
-        s_rc = run_py("make_suggest_rules", SUGGEST_RULES)
-        if s_rc != 0:
-            print("[!] make_suggest_rules 失败")
-            logging.error("make_suggest_rules 失败, rc=%s", s_rc)
-            return s_rc
-    prc = run_ps1("publish_latest_json", PUBLISH_PS1)
-    if prc != 0:
-        print("[!] publish_latest_json 失败")
-        logging.error("publish_latest_json 失败, rc=%s", prc)
-        return prc
+    # 制表与建议规则都因输入未变化而跳过时，发布内容与上次相同，无需再发布
+    unchanged = manifest.last_action("excel") == "skipped" and manifest.last_action("suggest_rules") in (None, "skipped")
+    if unchanged:
+        logging.info("输出未变化，跳过发布")
+    if state["rebuilt"] and not unchanged:
+        prc = run_ps1("publish_latest_json", PUBLISH_PS1)
+        if prc != 0:
+            print("[!] publish_latest_json 失败")
+            logging.error("publish_latest_json 失败, rc=%s", prc)
+            return prc
 
     dur = time.time() - start
-    print(f"[OK] 全流程完成，用时 {dur:.1f}s")
-    logging.info("全流程完成, 用时 %.1fs", dur)
+    print(f"[OK] 本轮完成，用时 {dur:.1f}s")
+    logging.info("本轮完成, 用时 %.1fs", dur)
     return 0
 
 
@@ -155,19 +315,26 @@ def main() -> int:
         logging.error("已有实例在运行，退出")
         return 1
 
-    logging.info("服务启动，进入常驻循环：每1小时执行一次")
+    cadence = build_cadence()
+    logging.info("服务启动，进入常驻循环：各数据源按各自节奏刷新")
+    logging.info("%s", cadence.describe())
     try:
         while True:
-            try:
-                rc = run_once()
-                if rc != 0:
-                    logging.warning("一次执行返回非零 rc=%s", rc)
-            except Exception:
-                logging.error("一次执行抛出异常：\n%s", traceback.format_exc())
-            # 抖动 0~60 秒，避免固定卡点
-            jitter = random.randint(0, 60)
-            sleep_seconds = 3600 + jitter
-            logging.info("休眠 %s 秒后再次执行", sleep_seconds)
+            due = set(cadence.due())
+            # 目标列表到期或打包运行（抓取只能整体执行）时全量运行
+            if due and ("fetch_symbols" in due or getattr(sys, "frozen", False)):
+                due = set(cadence.sources)
+            if due:
+                cadence.mark_run(due)
+                try:
+                    rc = run_once(due=due, cadence=cadence)
+                    if rc != 0:
+                        logging.warning("一次执行返回非零 rc=%s", rc)
+                except Exception:
+                    logging.error("一次执行抛出异常：\n%s", traceback.format_exc())
+                logging.info("%s", cadence.describe())
+            # 睡到最近一个数据源到期（不超过检查间隔），加 0~5 秒抖动避免固定卡点
+            sleep_seconds = min(cadence.next_due_in(), settings.DAEMON_TICK_SEC) + random.randint(0, 5)
             time.sleep(sleep_seconds)
     except KeyboardInterrupt:
         logging.info("收到中断信号，准备退出")
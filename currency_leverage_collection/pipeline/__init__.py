@@ -0,0 +1 @@
+# pipeline package
@@ -0,0 +1,183 @@
+"""
+离线基准测试：用录制的夹具回放整条流水线（目标列表 → 各交易所抓取 → 制表 → 建议规则）
+
+    python -m pipeline.bench --record             # 联网跑一轮，录制全部 HTTP 响应与 Weex 页面
+    python -m pipeline.bench --repeat 3           # 回放 3 次并汇总耗时
+    python -m pipeline.bench --delay-scale 1      # 回放时重现录制时的网络耗时
+
+每次运行都把代码复制到临时目录、在子进程中执行：结果、快照与运行清单从空状态开始，
+各次之间互不影响，也不会改动本目录下的 result/ 与 data/；基准运行不写数据库、不发布。
+汇总写入 result/_bench/<时间>.json。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+BENCH_DIR = ROOT / "result" / "_bench"
+# 复制到临时目录时跳过的内容：历史结果、抓取结果、夹具（按绝对路径引用）、构建产物
+_COPY_IGNORE = shutil.ignore_patterns(
+    "result", "build", "dataGet_api", "fixtures", "__pycache__", "*.pyc", ".git", "app.lock", "venv",
+)
+
+
+def _inner(out_path: Path) -> int:
+    """在临时副本中运行一轮流水线，把各任务耗时写入 out_path。"""
+    import main as app
+    from pipeline import tracing
+
+    trace_path = tracing.start_trace("bench")
+    sched, _state = app.build_pipeline()
+    t0 = time.perf_counter()
+    with tracing.span("bench", mode=app.RUN_MODE):
+        sched.run()
+    wall = time.perf_counter() - t0
+    print(sched.report())
+    jobs: Dict[str, Any] = {}
+    for r in sched.records.values():
+        jobs[r.name] = {
+            "status": r.status,
+            "rc": r.rc,
+            "run_sec": round(r.run_sec, 3),
+            "start": round(r.started_at, 3) if r.started_at is not None else None,
+            "end": round(r.ended_at, 3) if r.ended_at is not None else None,
+        }
+    out = {
+        "wall_sec": round(wall, 3),
+        "mode": app.RUN_MODE,
+        "critical_path": [r.name for r in sched.critical_path()],
+        "jobs": jobs,
+        "trace": str(trace_path),
+    }
+    out_path.write_text(json.dumps(out, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 0 if all(j["status"] == "ok" for j in jobs.values()) else 1
+
+
+def _run_copy(fixture_mode: str, fixture_dir: Path, delay_scale: float, timeout: float, keep: bool) -> Dict[str, Any]:
+    tmp = Path(tempfile.mkdtemp(prefix="bench_"))
+    app_dir = tmp / "app"
+    shutil.copytree(ROOT, app_dir, ignore=_COPY_IGNORE)
+    env = dict(os.environ)
+    env.update({
+        "HTTP_FIXTURE_MODE": fixture_mode,
+        "HTTP_FIXTURE_DIR": str(fixture_dir),
+        "HTTP_FIXTURE_DELAY_SCALE": str(delay_scale),
+        "TABLEMAKE_WRITE_DB": "false",
+        "PIPELINE_FORCE_REBUILD": "true",
+        "PYTHONPATH": str(app_dir),
+    })
+    env.pop("PIPELINE_TRACE_FILE", None)
+    env.pop("PIPELINE_TRACE_PARENT", None)
+    out_path = tmp / "bench_result.json"
+    t0 = time.perf_counter()
+    try:
+        proc = subprocess.run(
+            [sys.executable, "-m", "pipeline.bench", "--inner", str(out_path)],
+            cwd=str(app_dir), env=env, timeout=timeout, capture_output=True, text=True,
+        )
+        rc = proc.returncode
+        log = proc.stdout[-4000:] + proc.stderr[-4000:]
+    except subprocess.TimeoutExpired:
+        rc, log = 124, f"超时（{timeout:.0f}s）"
+    total = time.perf_counter() - t0
+    try:
+        result = json.loads(out_path.read_text(encoding="utf-8"))
+    except Exception:
+        result = {"jobs": {}}
+    result.update({"rc": rc, "process_sec": round(total, 3)})
+    if rc != 0:
+        result["log_tail"] = log
+    trace = Path(result.get("trace") or "")
+    if trace.exists():
+        BENCH_DIR.mkdir(parents=True, exist_ok=True)
+        dst = BENCH_DIR / trace.name
+        shutil.copyfile(trace, dst)
+        result["trace"] = str(dst)
+    if keep:
+        result["workdir"] = str(app_dir)
+    else:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return result
+
+
+def _summarize(runs: List[Dict[str, Any]]) -> str:
+    walls = [r["wall_sec"] for r in runs if "wall_sec" in r]
+    lines = [f"=== 离线基准：{len(runs)} 次 ==="]
+    for i, r in enumerate(runs, 1):
+        bad = [n for n, j in r.get("jobs", {}).items() if j["status"] != "ok"]
+        lines.append(
+            f"- 第 {i} 次: rc={r['rc']} 流水线 {r.get('wall_sec', float('nan')):.2f}s，进程 {r['process_sec']:.2f}s"
+            + (f"，未成功: {', '.join(bad)}" if bad else "")
+        )
+    if walls:
+        lines.append(f"流水线耗时：中位数 {statistics.median(walls):.2f}s，最小 {min(walls):.2f}s，最大 {max(walls):.2f}s")
+    names = sorted({n for r in runs for n in r.get("jobs", {})})
+    for n in names:
+        secs = [r["jobs"][n]["run_sec"] for r in runs if n in r.get("jobs", {})]
+        lines.append(f"  {n:<20} 中位数 {statistics.median(secs):7.2f}s")
+    if runs and runs[-1].get("critical_path"):
+        lines.append("关键路径（最后一次）: " + " → ".join(runs[-1]["critical_path"]))
+    return "\n".join(lines)
+
+
+def main(argv: List[str] | None = None) -> int:
+    from config import settings
+
+    ap = argparse.ArgumentParser(description="用录制的夹具离线回放整条流水线并计时")
+    ap.add_argument("--record", action="store_true", help="联网运行一轮并录制夹具（覆盖同名请求）")
+    ap.add_argument("--repeat", type=int, default=1, help="回放次数")
+    ap.add_argument("--delay-scale", type=float, default=settings.HTTP_FIXTURE_DELAY_SCALE, help="回放等待 = 录制耗时 × 倍率")
+    ap.add_argument("--fixtures", type=Path, default=settings.HTTP_FIXTURE_DIR, help="夹具目录")
+    ap.add_argument("--timeout", type=float, default=float(settings.RUN_BUDGET_SEC), help="单次运行超时（秒）")
+    ap.add_argument("--keep", action="store_true", help="保留临时工作目录，便于检查输出")
+    ap.add_argument("--inner", type=Path, help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+
+    if args.inner:
+        return _inner(args.inner)
+
+    fixture_dir = args.fixtures.resolve()
+    if args.record:
+        mode, repeat = "record", 1
+        print(f"[bench] 录制模式：联网运行一轮，夹具写入 {fixture_dir}")
+    else:
+        mode, repeat = "replay", max(1, args.repeat)
+        if not (fixture_dir / "http").exists():
+            print(f"[bench] 夹具目录为空：{fixture_dir}，请先运行 python -m pipeline.bench --record")
+            return 2
+
+    runs: List[Dict[str, Any]] = []
+    for i in range(repeat):
+        print(f"[bench] 第 {i + 1}/{repeat} 次（{mode}）…")
+        res = _run_copy(mode, fixture_dir, args.delay_scale, args.timeout, args.keep)
+        if res["rc"] != 0 and res.get("log_tail"):
+            print(res["log_tail"])
+        runs.append(res)
+
+    summary = _summarize(runs)
+    print(summary)
+    BENCH_DIR.mkdir(parents=True, exist_ok=True)
+    out = BENCH_DIR / f"{time.strftime('%Y%m%d_%H%M%S')}_{mode}.json"
+    out.write_text(json.dumps({
+        "mode": mode,
+        "fixtures": str(fixture_dir),
+        "delay_scale": args.delay_scale,
+        "runs": runs,
+    }, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"[bench] 结果已写出: {out}")
+    return 0 if all(r["rc"] == 0 for r in runs) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
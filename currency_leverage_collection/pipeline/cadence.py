@@ -0,0 +1,94 @@
+"""
+按数据源分别刷新的节奏状态
+
+常驻进程为每个数据源（交易所/CMC/目标列表）记录各自的刷新间隔、上次运行时间
+以及最新一档数据的内容摘要：
+
+- `due()` 给出本轮到期需要重新抓取的数据源；
+- 抓取完成后 `absorb(name)` 读入其结果文件，保存最新档位到内存并比较摘要，
+  返回数据是否发生变化——只有变化时才需要重建 Excel/HTML/JSON 与入库。
+  抓取脚本在数据未变化时不重写结果文件（见 dataGet/utils/http_cache.py），文件的 mtime 与大小
+  与上次吸收时相同即直接判定“无变化”，不再读盘与计算摘要。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pipeline.json_store import load_json
+
+
+@dataclass
+class Source:
+    name: str
+    interval: float  # 秒
+    artifact: Path  # 最新结果文件
+    last_run: float = 0.0
+    digest: Optional[str] = None
+    changed_at: Optional[float] = None
+    stamp: Optional[Tuple[int, int]] = None  # 上次吸收时结果文件的 (mtime_ns, size)
+
+
+def content_digest(obj: Any) -> str:
+    """对解析后的 JSON 取规范化摘要（键排序），与缩进/键顺序无关。"""
+    raw = json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CadenceState:
+    def __init__(self, sources: Iterable[Source]):
+        self.sources: Dict[str, Source] = {s.name: s for s in sources}
+        self.latest: Dict[str, Any] = {}  # name -> 最新档位数据
+        self._lock = threading.Lock()
+
+    def due(self, now: Optional[float] = None) -> List[str]:
+        now = time.time() if now is None else now
+        return [s.name for s in self.sources.values() if now - s.last_run >= s.interval]
+
+    def next_due_in(self, now: Optional[float] = None) -> float:
+        """距离最近一个数据源到期的秒数（已到期返回 0）。"""
+        now = time.time() if now is None else now
+        if not self.sources:
+            return 0.0
+        return max(0.0, min(s.last_run + s.interval - now for s in self.sources.values()))
+
+    def mark_run(self, names: Iterable[str], now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        with self._lock:
+            for n in names:
+                if n in self.sources:
+                    self.sources[n].last_run = now
+
+    def absorb(self, name: str) -> bool:
+        """读入数据源的最新结果并更新内存状态；返回内容是否与上一次不同。"""
+        src = self.sources[name]
+        if not src.artifact.exists():
+            return False
+        st = src.artifact.stat()
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == src.stamp:
+            return False
+        obj = load_json(src.artifact)
+        digest = content_digest(obj)
+        with self._lock:
+            self.latest[name] = obj
+            src.stamp = stamp
+            if digest == src.digest:
+                return False
+            src.digest = digest
+            src.changed_at = time.time()
+            return True
+
+    def describe(self, now: Optional[float] = None) -> str:
+        now = time.time() if now is None else now
+        parts = []
+        for s in self.sources.values():
+            left = max(0.0, s.last_run + s.interval - now)
+            parts.append(f"{s.name}={int(s.interval)}s(余{left:.0f}s)")
+        return "刷新节奏: " + ", ".join(parts)
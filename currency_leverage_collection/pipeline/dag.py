@@ -0,0 +1,311 @@
+"""
+依赖图（DAG）调度器
+
+每个任务声明自己真正依赖的产物（artifact）与产出的产物，调度器在产物就绪后
+立即启动下游任务，而不是按写死的顺序串行等待。运行结束后给出每个任务的
+就绪/开始/结束时间以及本轮的关键路径。
+
+- inputs：硬依赖，上游失败则本任务跳过（blocked）；
+- soft_inputs：软依赖，只等待上游结束，不要求成功（例如制表允许个别交易所缺失）；
+- 任务可在运行中途调用 `publish(artifact)` 提前发布产物，下游无需等待整个任务结束；
+- deadline：本轮时间预算（秒）。到期时仍未结束的 expires=True 任务记为 expired，
+  其产物按失败处理，下游（软依赖）不再等待；运行中的任务调用其 cancel()（如杀掉子进程树），
+  结果不再计入本轮。
+- 被放弃的任务线程跨轮登记：下一轮开始时它仍未结束，则同名任务不再启动（记为 stuck，产物按失败处理），
+  不会在同一进程里叠加第二个副本。
+"""
+
+from __future__ import annotations
+
+import contextvars
+import logging
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from pipeline import tracing
+
+# 跨轮登记被放弃（expired 时仍在运行）的任务线程：任务名 → (线程, 放弃时刻)
+_ABANDONED_LOCK = threading.Lock()
+_ABANDONED: Dict[str, Tuple[threading.Thread, float]] = {}
+
+
+def abandoned() -> Dict[str, float]:
+    """仍未结束的被放弃线程：任务名 → 已被放弃的秒数（已结束的顺便移出登记）。"""
+    now = time.time()
+    with _ABANDONED_LOCK:
+        for name in [n for n, (t, _) in _ABANDONED.items() if not t.is_alive()]:
+            del _ABANDONED[name]
+        return {n: now - at for n, (_, at) in _ABANDONED.items()}
+
+
+@dataclass
+class DagJob:
+    name: str
+    func: Callable[[], int]  # 返回码：0 表示成功
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    soft_inputs: Tuple[str, ...] = ()
+    priority: float = 0.0  # 同时就绪时优先级高者先提交（例如按历史耗时，最长的先跑）
+    expires: bool = False  # 超过本轮截止时间后可放弃等待
+    cancel: Optional[Callable[[], None]] = None  # 运行中被放弃时调用（在独立线程中执行，不阻塞调度）
+
+
+@dataclass
+class JobRecord:
+    name: str
+    status: str = "pending"  # pending / running / ok / failed / blocked / expired / stuck
+    rc: Optional[int] = None
+    ready_at: Optional[float] = None
+    started_at: Optional[float] = None
+    ended_at: Optional[float] = None
+    gated_by: Optional[str] = None  # 最后一个就绪的上游任务（关键路径回溯用）
+    error: str = ""
+
+    @property
+    def run_sec(self) -> float:
+        if self.started_at is None or self.ended_at is None:
+            return 0.0
+        return self.ended_at - self.started_at
+
+
+@dataclass
+class _Artifact:
+    state: str = "pending"  # pending / ready / failed
+    at: Optional[float] = None
+    producer: Optional[str] = None
+
+
+class DagScheduler:
+    def __init__(
+        self,
+        jobs: Iterable[DagJob],
+        initial: Iterable[str] = (),
+        max_workers: Optional[int] = None,
+        deadline: Optional[float] = None,
+    ):
+        self.jobs: Dict[str, DagJob] = {}
+        for j in jobs:
+            if j.name in self.jobs:
+                raise ValueError(f"任务重名: {j.name}")
+            self.jobs[j.name] = j
+        self.max_workers = max_workers or max(1, len(self.jobs))
+        self.deadline = deadline
+        self.records: Dict[str, JobRecord] = {n: JobRecord(name=n) for n in self.jobs}
+        self._artifacts: Dict[str, _Artifact] = {}
+        self._cond = threading.Condition()
+        self._t0 = 0.0
+        self._order: List[str] = sorted(self.jobs, key=lambda n: -self.jobs[n].priority)
+        self._threads: Dict[str, threading.Thread] = {}
+        self._stuck: Dict[str, float] = {}  # 本轮开始时上一轮线程仍未结束的任务 → 已被放弃的秒数
+
+        for a in initial:
+            self._artifacts[a] = _Artifact(state="ready", at=0.0)
+        for j in self.jobs.values():
+            for a in j.outputs:
+                if a in self._artifacts:
+                    raise ValueError(f"产物 {a} 被重复声明（{j.name}）")
+                self._artifacts[a] = _Artifact(producer=j.name)
+        for j in self.jobs.values():
+            for a in (*j.inputs, *j.soft_inputs):
+                if a not in self._artifacts:
+                    raise ValueError(f"任务 {j.name} 依赖的产物 {a} 没有任何任务产出")
+        self._check_acyclic()
+
+    def _check_acyclic(self) -> None:
+        deps = {
+            n: {self._artifacts[a].producer for a in (*j.inputs, *j.soft_inputs) if self._artifacts[a].producer}
+            for n, j in self.jobs.items()
+        }
+        seen: Set[str] = set()
+        stack: Set[str] = set()
+
+        def visit(n: str) -> None:
+            if n in stack:
+                raise ValueError(f"依赖图存在环: {n}")
+            if n in seen:
+                return
+            stack.add(n)
+            for d in deps[n]:
+                visit(d)
+            stack.discard(n)
+            seen.add(n)
+
+        for n in deps:
+            visit(n)
+
+    def _now(self) -> float:
+        return time.time() - self._t0
+
+    # ---- 产物状态 ----
+    def publish(self, artifact: str) -> None:
+        """提前发布一个产物（任务运行中途调用）。"""
+        with self._cond:
+            art = self._artifacts.get(artifact)
+            if art is None or art.state != "pending":
+                return
+            art.state = "ready"
+            art.at = self._now()
+            self._cond.notify_all()
+
+    def _settle_outputs(self, job: DagJob, ok: bool) -> None:
+        for a in job.outputs:
+            art = self._artifacts[a]
+            if art.state == "pending":
+                art.state = "ready" if ok else "failed"
+                art.at = self._now()
+
+    # ---- 调度 ----
+    def _runnable(self, job: DagJob) -> Optional[str]:
+        """返回 'run' / 'block' / None（仍需等待）。"""
+        hard = [self._artifacts[a] for a in job.inputs]
+        soft = [self._artifacts[a] for a in job.soft_inputs]
+        if any(a.state == "failed" for a in hard):
+            return "block"
+        if all(a.state == "ready" for a in hard) and all(a.state != "pending" for a in soft):
+            return "run"
+        return None
+
+    def _gate(self, job: DagJob) -> Tuple[Optional[str], float]:
+        last_at, last_by = 0.0, None
+        for a in (*job.inputs, *job.soft_inputs):
+            art = self._artifacts[a]
+            if art.at is not None and art.at >= last_at:
+                last_at, last_by = art.at, art.producer
+        return last_by, last_at
+
+    def _worker(self, job: DagJob) -> None:
+        rec = self.records[job.name]
+        with self._cond:
+            if rec.status == "expired":
+                # 排队期间已过截止时间：不再启动
+                return
+            self._threads[job.name] = threading.current_thread()
+            rec.started_at = self._now()
+        rc: int = 1
+        with tracing.span(f"job:{job.name}", after=rec.gated_by) as sp:
+            try:
+                rc = int(job.func() or 0)
+            except Exception:
+                rec.error = traceback.format_exc()
+                rc = 1
+            sp.attrs["rc"] = rc
+        with self._cond:
+            rec.rc = rc
+            rec.ended_at = self._now()
+            if rec.status == "expired":
+                # 已按截止时间放弃，结果不再影响本轮
+                return
+            rec.status = "ok" if rc == 0 else "failed"
+            self._settle_outputs(job, ok=(rc == 0))
+            self._cond.notify_all()
+
+    def _expire(self) -> None:
+        for name, job in self.jobs.items():
+            rec = self.records[name]
+            if job.expires and rec.status in ("pending", "running"):
+                running = rec.status == "running"
+                rec.status = "expired"
+                self._settle_outputs(job, ok=False)
+                thread = self._threads.get(name)
+                if running and thread is not None:
+                    with _ABANDONED_LOCK:
+                        _ABANDONED[name] = (thread, time.time())
+                if running and job.cancel is not None:
+                    threading.Thread(target=job.cancel, name=f"cancel-{name}", daemon=True).start()
+
+    def run(self) -> Dict[str, JobRecord]:
+        self._t0 = time.time()
+        self._stuck = {n: sec for n, sec in abandoned().items() if n in self.jobs}
+        if self._stuck:
+            logging.warning("上一轮被放弃的任务线程仍未结束，本轮不再启动: %s",
+                            ", ".join(f"{n}（已 {sec:.0f}s）" for n, sec in sorted(self._stuck.items())))
+        ex = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            with self._cond:
+                while True:
+                    if self.deadline is not None and self._now() >= self.deadline:
+                        self._expire()
+                    progressed = True
+                    while progressed:
+                        progressed = False
+                        for name in self._order:
+                            job = self.jobs[name]
+                            rec = self.records[name]
+                            if rec.status != "pending":
+                                continue
+                            verdict = self._runnable(job)
+                            if verdict == "block":
+                                rec.status = "blocked"
+                                rec.gated_by, rec.ready_at = self._gate(job)
+                                self._settle_outputs(job, ok=False)
+                                progressed = True
+                            elif verdict == "run" and name in self._stuck:
+                                rec.status = "stuck"
+                                rec.gated_by, rec.ready_at = self._gate(job)
+                                rec.error = f"上一轮被放弃的线程已卡住 {self._stuck[name]:.0f}s 仍未结束"
+                                self._settle_outputs(job, ok=False)
+                                progressed = True
+                            elif verdict == "run":
+                                rec.status = "running"
+                                rec.gated_by, rec.ready_at = self._gate(job)
+                                # 带上调度线程的 span 上下文，任务 span 挂在本轮根 span 之下
+                                ex.submit(contextvars.copy_context().run, self._worker, job)
+                    if all(r.status not in ("pending", "running") for r in self.records.values()):
+                        break
+                    wait = 1.0
+                    if self.deadline is not None:
+                        wait = max(0.05, min(wait, self.deadline - self._now()))
+                    self._cond.wait(timeout=wait)
+        finally:
+            # 有任务被放弃时不等待其线程结束
+            expired = any(r.status == "expired" for r in self.records.values())
+            ex.shutdown(wait=not expired)
+        return self.records
+
+    # ---- 报告 ----
+    def critical_path(self) -> List[JobRecord]:
+        """从最后结束的任务出发，沿“最后就绪的上游”回溯得到关键路径。"""
+        done = [r for r in self.records.values() if r.ended_at is not None]
+        if not done:
+            return []
+        cur: Optional[JobRecord] = max(done, key=lambda r: r.ended_at or 0.0)
+        path: List[JobRecord] = []
+        while cur is not None:
+            path.append(cur)
+            cur = self.records.get(cur.gated_by) if cur.gated_by else None
+        return list(reversed(path))
+
+    def report(self) -> str:
+        lines = ["=== DAG 调度报告 ==="]
+        order = sorted(self.records.values(), key=lambda r: (r.started_at is None, r.started_at or 0.0))
+        for r in order:
+            if r.status == "expired":
+                lines.append(f"- {r.name}: expired（截止 +{self.deadline:.0f}s 时未完成，已放弃等待）")
+                continue
+            if r.status == "stuck":
+                lines.append(f"- {r.name}: stuck（{r.error}，本轮未启动）")
+                continue
+            if r.started_at is None:
+                lines.append(f"- {r.name}: {r.status}")
+                continue
+            wait = (r.started_at - r.ready_at) if r.ready_at is not None else 0.0
+            lines.append(
+                f"- {r.name}: {r.status} rc={r.rc} start=+{r.started_at:.1f}s end=+{(r.ended_at or 0.0):.1f}s "
+                f"run={r.run_sec:.1f}s wait={wait:.1f}s"
+            )
+        path = self.critical_path()
+        if path:
+            total = (path[-1].ended_at or 0.0)
+            chain = " → ".join(f"{r.name}({r.run_sec:.1f}s)" for r in path)
+            lines.append(f"关键路径（总 {total:.1f}s）: {chain}")
+        left = abandoned()
+        if left:
+            lines.append("仍在运行的被放弃线程: " + ", ".join(f"{n}（已 {sec:.0f}s）" for n, sec in sorted(left.items())))
+        return "\n".join(lines)
+
+    def ok(self, name: str) -> bool:
+        return self.records[name].status == "ok"
@@ -0,0 +1,112 @@
+"""
+进程内 JSON 结果缓存
+
+各阶段仍然把结果落盘（子进程模式与人工排查都依赖这些文件），
+同时在本进程内缓存已解析的对象：同一进程中的下游阶段读取时直接复用，
+不再重复读盘与 json.loads。缓存以 (mtime_ns, size) 校验，文件被其它进程改写后自动失效。
+
+进程内运行的任务被放弃（超时或超过本轮截止时间）后，线程无法强制结束：`write_guard(cancelled)`
+标记该任务的上下文，放弃后它再调用 dump_json 会抛出 WriteCancelled，迟到的结果不会覆盖已被下游读取的文件。
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+_LOCK = threading.Lock()
+_CACHE: Dict[str, Tuple[int, int, Any]] = {}
+_GUARD: contextvars.ContextVar[Optional[threading.Event]] = contextvars.ContextVar("json_store_guard", default=None)
+
+
+class WriteCancelled(RuntimeError):
+    """所在任务已被放弃，不再写出结果文件。"""
+
+
+@contextlib.contextmanager
+def write_guard(cancelled: threading.Event) -> Iterator[None]:
+    """代码块内（含其中 asyncio.run 的协程）的 dump_json 在 cancelled 置位后被拦截。"""
+    token = _GUARD.set(cancelled)
+    try:
+        yield
+    finally:
+        _GUARD.reset(token)
+
+
+def _key(path: Path) -> str:
+    return str(Path(path).resolve())
+
+
+def _stamp(path: Path) -> Tuple[int, int]:
+    st = Path(path).stat()
+    return st.st_mtime_ns, st.st_size
+
+
+def _check_guard(path: Path) -> None:
+    cancelled = _GUARD.get()
+    if cancelled is not None and cancelled.is_set():
+        raise WriteCancelled(f"任务已被放弃，不再写出 {path}")
+
+
+def dump_json(path: Path, obj: Any, indent: int | None = 2) -> Path:
+    """写出 JSON 并登记到进程内缓存，返回路径。"""
+    path = Path(path)
+    _check_guard(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # 先写临时文件再原子替换，并发读取方不会看到写了一半的文件；
+    # 临时文件名带 pid 与线程号，被放弃后迟到的写入与替代它的新任务互不干扰
+    tmp = path.with_name(f"{path.name}.{os.getpid()}_{threading.get_ident()}.tmp")
+    try:
+        tmp.write_text(json.dumps(obj, ensure_ascii=False, indent=indent), encoding="utf-8")
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    mtime_ns, size = _stamp(path)
+    with _LOCK:
+        _CACHE[_key(path)] = (mtime_ns, size, obj)
+    return path
+
+
+def append_jsonl(path: Path, records: Iterable[Any]) -> Path:
+    """逐行追加 JSON 记录（流式写出的部分结果，只写新增部分）；同样受 write_guard 拦截，不进缓存。"""
+    path = Path(path)
+    _check_guard(path)
+    lines = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+    if lines:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("a", encoding="utf-8") as f:
+            f.write(lines)
+    return path
+
+
+def load_json(path: Path) -> Any:
+    """读取 JSON；若本进程内已有同一版本的解析结果则直接返回。
+
+    注意：返回对象为共享缓存，调用方不要原地修改。
+    """
+    path = Path(path)
+    mtime_ns, size = _stamp(path)
+    key = _key(path)
+    with _LOCK:
+        hit = _CACHE.get(key)
+    if hit is not None and hit[0] == mtime_ns and hit[1] == size:
+        return hit[2]
+    obj = json.loads(path.read_text(encoding="utf-8"))
+    with _LOCK:
+        _CACHE[key] = (mtime_ns, size, obj)
+    return obj
+
+
+def forget(path: Path) -> None:
+    with _LOCK:
+        _CACHE.pop(_key(path), None)
+
+
+def clear() -> None:
+    with _LOCK:
+        _CACHE.clear()
@@ -0,0 +1,110 @@
+"""
+各交易所的“最后一次成功”快照与新鲜度
+
+- 抓取成功且结果非空时，`save(name, path)` 把结果复制到 data/dataGet_api/_last_good/；
+- 每轮制表前 `write_freshness(ok)` 按本轮各数据源是否按时成功写出新鲜度：
+  成功的用本轮文件（fresh），失败/超过截止时间/结果为空（save 未登记）的回退到最后一次成功的快照（stale，带年龄）；
+- 制表通过 `source_path(name, default)` 取实际要读的文件，并把新鲜度写入输出 JSON。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Mapping
+
+ROOT = Path(__file__).resolve().parent.parent
+SNAP_DIR = ROOT / "data" / "dataGet_api" / "_last_good"
+INDEX_PATH = SNAP_DIR / "_index.json"
+FRESHNESS_PATH = ROOT / "data" / "dataGet_api" / "_freshness.json"
+
+_LOCK = threading.Lock()
+
+
+def _read(path: Path) -> Dict[str, Any]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def _tmp(path: Path) -> Path:
+    return path.with_name(f"{path.name}.{os.getpid()}_{threading.get_ident()}.tmp")
+
+
+def _write(path: Path, obj: Any) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _tmp(path)
+    try:
+        tmp.write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def snapshot_path(name: str) -> Path:
+    return SNAP_DIR / f"{name}.json"
+
+
+def save(name: str, path: Path) -> bool:
+    """结果文件存在且内容非空时登记为最后一次成功快照；返回是否登记。"""
+    path = Path(path)
+    try:
+        if not json.loads(path.read_text(encoding="utf-8")):
+            return False
+    except Exception:
+        return False
+    with _LOCK:
+        SNAP_DIR.mkdir(parents=True, exist_ok=True)
+        dst = snapshot_path(name)
+        tmp = _tmp(dst)
+        try:
+            shutil.copyfile(path, tmp)
+            os.replace(tmp, dst)
+        finally:
+            tmp.unlink(missing_ok=True)
+        index = _read(INDEX_PATH)
+        index[name] = {"saved_at": time.time(), "source": str(path)}
+        _write(INDEX_PATH, index)
+    return True
+
+
+def write_freshness(ok: Mapping[str, bool]) -> Dict[str, Dict[str, Any]]:
+    """ok：数据源 -> 本轮是否按时成功（本轮未抓取的数据源传 True，沿用现有文件）。"""
+    now = time.time()
+    with _LOCK:
+        index = _read(INDEX_PATH)
+    out: Dict[str, Dict[str, Any]] = {}
+    for name, good in ok.items():
+        saved_at = (index.get(name) or {}).get("saved_at")
+        if good:
+            status = "fresh"
+        elif saved_at is not None and snapshot_path(name).exists():
+            status = "stale"
+        else:
+            status = "missing"
+        out[name] = {
+            "status": status,
+            "fetched_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(saved_at)) if saved_at else None,
+            "age_sec": round(now - saved_at) if saved_at else None,
+        }
+    _write(FRESHNESS_PATH, out)
+    return out
+
+
+def load_freshness() -> Dict[str, Dict[str, Any]]:
+    return _read(FRESHNESS_PATH)
+
+
+def source_path(name: str, default: Path) -> Path:
+    """制表实际读取的文件：本轮过期的数据源改读最后一次成功的快照。"""
+    entry = load_freshness().get(name) or {}
+    snap = snapshot_path(name)
+    if entry.get("status") == "stale" and snap.exists():
+        return snap
+    return default
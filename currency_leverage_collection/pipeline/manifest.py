@@ -0,0 +1,194 @@
+"""
+按内容哈希的增量阶段跳过（运行清单）
+
+每个阶段运行后在 result/_manifest/<阶段>.json 中记录其输入、输出文件的 sha256 与耗时。
+下次运行时若输入哈希与上次完全一致、且上次的输出文件仍在且未被改动，
+则像构建系统一样跳过该阶段，直接沿用上次的输出，并在清单历史中记录
+“跳过”以及节省的时间（即上次实际运行的耗时）。
+
+设置环境变量 PIPELINE_FORCE_REBUILD=true 可强制全部重跑。
+
+各抓取脚本作为并发子进程各自调用 run_cached，因此清单按阶段分文件：每个文件只有所属阶段的进程改写，
+不同进程之间没有共享的读-改-写；临时文件名带 pid 与线程号，同一阶段的重叠运行也不会互相顶掉。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+MANIFEST_DIR = ROOT / "result" / "_manifest"
+HISTORY_LIMIT = 200  # 每个阶段保留的历史条数
+
+_LOCK = threading.Lock()
+
+
+def file_digest(path: Path) -> str:
+    p = Path(path)
+    if not p.exists():
+        return "missing"
+    h = hashlib.sha256()
+    with p.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _rel(path: Path) -> str:
+    p = Path(path).resolve()
+    try:
+        return p.relative_to(ROOT).as_posix()
+    except ValueError:
+        return str(p)
+
+
+def _abs(rel: str) -> Path:
+    p = Path(rel)
+    return p if p.is_absolute() else ROOT / p
+
+
+def digests(paths: Sequence[Path]) -> Dict[str, str]:
+    return {_rel(p): file_digest(p) for p in paths}
+
+
+def _stage_path(stage: str) -> Path:
+    return MANIFEST_DIR / f"{stage}.json"
+
+
+def _load(stage: str) -> Dict[str, Any]:
+    """单个阶段的清单：{"stage": 最近一次记录或 None, "history": [...]}。"""
+    try:
+        data = json.loads(_stage_path(stage).read_text(encoding="utf-8"))
+        if isinstance(data, dict):
+            data.setdefault("stage", None)
+            data.setdefault("history", [])
+            return data
+    except Exception:
+        pass
+    return {"stage": None, "history": []}
+
+
+def _save(stage: str, data: Dict[str, Any]) -> None:
+    path = _stage_path(stage)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}_{threading.get_ident()}.tmp")
+    try:
+        tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _append(data: Dict[str, Any], entry: Dict[str, Any]) -> None:
+    data["history"].append(entry)
+    data["history"] = data["history"][-HISTORY_LIMIT:]
+
+
+def _force() -> bool:
+    return os.environ.get("PIPELINE_FORCE_REBUILD", "false").lower() == "true"
+
+
+def _fresh(prev: Optional[Dict[str, Any]], inputs: Dict[str, str]) -> bool:
+    if not prev or prev.get("inputs") != inputs:
+        return False
+    outputs: Dict[str, str] = prev.get("outputs") or {}
+    return all(file_digest(_abs(rel)) == h for rel, h in outputs.items())
+
+
+def is_fresh(stage: str, inputs: Sequence[Path]) -> bool:
+    """run_cached 此时是否会跳过该阶段（输入未变化且输出未被改动，且未要求强制重跑）。"""
+    if _force():
+        return False
+    with _LOCK:
+        prev = _load(stage)["stage"]
+    return _fresh(prev, digests(inputs))
+
+
+def run_cached(
+    stage: str,
+    inputs: Sequence[Path],
+    func: Callable[[], Any],
+    outputs_of: Callable[[Any], Sequence[Path]],
+    force: bool = False,
+) -> Tuple[Any, bool]:
+    """输入未变化时跳过 `func`，否则运行并登记输出。
+
+    返回 (值, 是否跳过)。跳过时的值为上次登记的 value（路径），调用方按需转换。
+    """
+    in_hash = digests(inputs)
+    with _LOCK:
+        prev = _load(stage)["stage"]
+
+    if not (force or _force()) and _fresh(prev, in_hash):
+        saved = float(prev.get("duration_sec") or 0.0)
+        with _LOCK:
+            data = _load(stage)
+            _append(data, {
+                "stage": stage,
+                "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "action": "skipped",
+                "saved_sec": round(saved, 3),
+            })
+            data["stage"] = dict(prev, last_action="skipped")
+            _save(stage, data)
+        print(f"[manifest] {stage}: 输入未变化，跳过（节省约 {saved:.1f}s），沿用 {prev.get('value')}")
+        value = prev.get("value")
+        return (_abs(value) if value else None), True
+
+    t0 = time.perf_counter()
+    value = func()
+    dur = time.perf_counter() - t0
+    outputs = [Path(p) for p in outputs_of(value)]
+    with _LOCK:
+        data = _load(stage)
+        data["stage"] = {
+            "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "inputs": in_hash,
+            "outputs": digests(outputs),
+            "duration_sec": round(dur, 3),
+            "value": _rel(value) if isinstance(value, Path) else None,
+            "last_action": "ran",
+        }
+        _append(data, {
+            "stage": stage,
+            "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "action": "ran",
+            "duration_sec": round(dur, 3),
+        })
+        _save(stage, data)
+    return value, False
+
+
+def last_action(stage: str) -> Optional[str]:
+    """该阶段最近一次的动作：'ran' / 'skipped' / None（从未记录）。"""
+    with _LOCK:
+        prev = _load(stage)["stage"]
+    return (prev or {}).get("last_action")
+
+
+def summary(limit: int = 20) -> str:
+    """最近若干条运行/跳过记录及累计节省时间。"""
+    hist: List[Dict[str, Any]] = []
+    with _LOCK:
+        for path in sorted(MANIFEST_DIR.glob("*.json")):
+            hist.extend(_load(path.stem)["history"])
+    hist.sort(key=lambda h: h.get("at") or "")
+    saved = sum(float(h.get("saved_sec") or 0.0) for h in hist)
+    skipped = sum(1 for h in hist if h.get("action") == "skipped")
+    lines = [f"=== 运行清单（{MANIFEST_DIR.name}/）：累计跳过 {skipped} 次，节省约 {saved:.1f}s ==="]
+    for h in hist[-limit:]:
+        if h.get("action") == "skipped":
+            lines.append(f"- {h['at']} {h['stage']}: 跳过，节省 {h.get('saved_sec', 0)}s")
+        else:
+            lines.append(f"- {h['at']} {h['stage']}: 运行 {h.get('duration_sec', 0)}s")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    print(summary())
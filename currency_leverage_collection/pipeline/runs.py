@@ -0,0 +1,127 @@
+"""
+按运行版本化的结果目录与原子“最新”指针
+
+- 每轮制表的产物写入各自的 result/runs/<run_id>/，写完之前对读取方不可见；
+- 写完后 `publish(kind, files)` 把 JSON/HTML 镜像到 result/html、result/suggest（发布脚本与
+  线上 Streamlit 仍从这里取），再用一次 os.replace 原子替换指针文件 result/latest.json；
+- 读取方用 `latest(kind, key)` 直接读指针得到最新文件，O(1)，不再 glob + 排序历史文件；
+  指针不存在（旧数据）时回退到按文件名排序；
+- `compact(keep)` 只保留最近 keep 个运行目录及对应镜像，指针引用的版本永不删除。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Mapping, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULT_DIR = ROOT / "result"
+RUNS_DIR = RESULT_DIR / "runs"
+POINTER_PATH = RESULT_DIR / "latest.json"
+# 各类产物镜像（发布）目录与旧版按名排序的文件模式
+MIRROR_DIRS: Dict[str, Path] = {
+    "table": RESULT_DIR / "html",
+    "suggest": RESULT_DIR / "suggest",
+}
+LEGACY_GLOBS: Dict[str, Dict[str, str]] = {
+    "table": {"json": "Leverage&Margin_*.json", "html": "Leverage&Margin_*.html"},
+    "suggest": {"json": "suggest_rules_*.json"},
+}
+RUNS_KEEP: int = int(os.environ.get("RUNS_KEEP", "48"))
+
+_LOCK = threading.Lock()
+
+
+def _rel(p: Path) -> str:
+    return Path(p).resolve().relative_to(RESULT_DIR.resolve()).as_posix()
+
+
+def read_pointer() -> Dict[str, dict]:
+    try:
+        data = json.loads(POINTER_PATH.read_text(encoding="utf-8"))
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def new_run_dir(run_id: Optional[str] = None) -> Path:
+    d = RUNS_DIR / (run_id or time.strftime("%Y%m%d_%H%M%S"))
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+
+def _tmp(path: Path) -> Path:
+    # 常驻模式的一轮与手动运行可能同时发布，临时文件名带 pid 与线程号避免互相顶掉
+    return path.with_name(f"{path.name}.{os.getpid()}_{threading.get_ident()}.tmp")
+
+
+def _mirror(kind: str, src: Path) -> Path:
+    dst_dir = MIRROR_DIRS[kind]
+    dst_dir.mkdir(parents=True, exist_ok=True)
+    dst = dst_dir / src.name
+    tmp = _tmp(dst)
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return dst
+
+
+def publish(kind: str, files: Mapping[str, Path], mirror: tuple = ("json", "html")) -> Dict[str, str]:
+    """登记一类产物为最新版本：先镜像可发布的文件，再原子替换指针。"""
+    entry: Dict[str, str] = {"run_id": Path(next(iter(files.values()))).parent.name}
+    for key, path in files.items():
+        path = Path(path)
+        entry[key] = _rel(path)
+        if key in mirror:
+            entry[f"published_{key}"] = _rel(_mirror(kind, path))
+    with _LOCK:
+        pointer = read_pointer()
+        pointer[kind] = entry
+        pointer["updated_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        tmp = _tmp(POINTER_PATH)
+        try:
+            tmp.write_text(json.dumps(pointer, ensure_ascii=False, indent=2), encoding="utf-8")
+            os.replace(tmp, POINTER_PATH)
+        finally:
+            tmp.unlink(missing_ok=True)
+    return entry
+
+
+def latest(kind: str, key: str) -> Optional[Path]:
+    """按指针取最新产物；运行目录不在（例如线上只同步了镜像）时取发布镜像。"""
+    entry = read_pointer().get(kind) or {}
+    for k in (key, f"published_{key}"):
+        rel = entry.get(k)
+        if rel and (RESULT_DIR / rel).exists():
+            return RESULT_DIR / rel
+    pattern = (LEGACY_GLOBS.get(kind) or {}).get(key)
+    if pattern and kind in MIRROR_DIRS:
+        files = sorted(MIRROR_DIRS[kind].glob(pattern))
+        return files[-1] if files else None
+    return None
+
+
+def compact(keep: int = RUNS_KEEP) -> int:
+    """只保留最近 keep 个运行目录与对应镜像；返回删除的运行目录数。keep <= 0 表示不清理（与 TRACES_KEEP 一致）。"""
+    if keep <= 0 or not RUNS_DIR.exists():
+        return 0
+    pointer = read_pointer()
+    pinned = {(pointer.get(k) or {}).get("run_id") for k in MIRROR_DIRS}
+    runs = sorted(d for d in RUNS_DIR.iterdir() if d.is_dir())
+    removed = 0
+    for d in runs[:-keep]:
+        if d.name in pinned:
+            continue
+        for f in d.iterdir():
+            for mdir in MIRROR_DIRS.values():
+                (mdir / f.name).unlink(missing_ok=True)
+        shutil.rmtree(d, ignore_errors=True)
+        removed += 1
+    return removed
@@ -0,0 +1,89 @@
+"""
+进程内阶段运行器
+
+直接 import 阶段模块并调用其入口函数，省去每个阶段一次解释器启动与
+httpx/selenium/openpyxl/psycopg2 的重复导入。stdout/stderr 仍落到与子进程模式
+同名的日志文件中，便于对照排查。
+"""
+
+from __future__ import annotations
+
+import contextlib
+import importlib
+import logging
+import time
+import traceback
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+@dataclass
+class StageResult:
+    name: str
+    rc: int
+    import_sec: float
+    run_sec: float
+    value: Any = None
+
+
+class StageImportError(RuntimeError):
+    """阶段模块无法导入（调用方可据此回退到子进程模式）。"""
+
+
+def _exit_code(e: SystemExit) -> int:
+    code = e.code
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    # sys.exit("msg") 之类：按失败处理
+    print(code)
+    return 1
+
+
+def run_inprocess(
+    name: str,
+    module: str,
+    func: str = "main",
+    kwargs: Optional[Dict[str, Any]] = None,
+    log_dir: Optional[Path] = None,
+) -> StageResult:
+    """在当前进程中运行 `module.func(**kwargs)`。
+
+    - 导入耗时与运行耗时分别统计；
+    - 异常与 SystemExit 转换为返回码，不向上抛出；
+    - 模块导入失败时抛出 StageImportError。
+    """
+    kwargs = kwargs or {}
+    t0 = time.perf_counter()
+    try:
+        mod = importlib.import_module(module)
+        entry = getattr(mod, func)
+    except Exception as e:
+        raise StageImportError(f"导入阶段失败 {module}.{func}: {e}") from e
+    import_sec = time.perf_counter() - t0
+
+    ts = time.strftime("%Y%m%d_%H%M%S")
+    with contextlib.ExitStack() as stack:
+        if log_dir is not None:
+            log_dir.mkdir(parents=True, exist_ok=True)
+            fo = stack.enter_context((log_dir / f"{ts}_{name}.stdout.log").open("w", encoding="utf-8", buffering=1))
+            fe = stack.enter_context((log_dir / f"{ts}_{name}.stderr.log").open("w", encoding="utf-8", buffering=1))
+            stack.enter_context(contextlib.redirect_stdout(fo))
+            stack.enter_context(contextlib.redirect_stderr(fe))
+        t1 = time.perf_counter()
+        value: Any = None
+        try:
+            value = entry(**kwargs)
+            rc = 0
+        except SystemExit as e:
+            rc = _exit_code(e)
+        except Exception:
+            traceback.print_exc()
+            logging.error("阶段 %s 抛出异常：\n%s", name, traceback.format_exc())
+            rc = 1
+        run_sec = time.perf_counter() - t1
+
+    logging.info("阶段 %s 完成 rc=%s, 导入 %.2fs, 运行 %.2fs", name, rc, import_sec, run_sec)
+    return StageResult(name=name, rc=rc, import_sec=import_sec, run_sec=run_sec, value=value)
@@ -0,0 +1,331 @@
+"""
+轻量级结构化追踪（span）
+
+用法：
+    with span("binance.fetch", exchange="binance"):
+        ...
+
+- span 可嵌套（阶段 → 交易所 → HTTP 请求 / 页面加载），父子关系经 contextvars 传递；
+  线程池提交任务时用 `wrap(fn)` 带上当前上下文；
+- 每轮运行一个 JSONL 文件（result/_traces/<trace_id>.jsonl），每个 span 结束时追加一行；
+  新开一轮时只保留最近 TRACES_KEEP 个追踪文件（常驻模式每轮一个，不清理会无限增长）；
+- 本进程内追踪文件按轮绑定在 contextvars 上（`start_trace` 不改 os.environ）：上一轮被放弃、仍在运行的
+  线程带着旧上下文，只会写进上一轮的文件；
+- 子进程经环境变量（`child_env`）继承追踪文件与父 span，脚本无需额外改动；
+- HTTP 请求无论得到响应还是抛出异常（超时、连接错误）都记一个 span；
+- 未启动追踪（独立运行单个脚本）时 span 只计时不落盘；
+- `python -m pipeline.tracing [trace.jsonl]` 打印关键路径、最慢的 span 与各交易所合计。
+"""
+
+from __future__ import annotations
+
+import atexit
+import contextlib
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, TextIO, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+TRACE_DIR = ROOT / "result" / "_traces"
+ENV_FILE = "PIPELINE_TRACE_FILE"
+ENV_PARENT = "PIPELINE_TRACE_PARENT"
+# 保留的追踪文件个数（0 = 不清理）
+TRACES_KEEP: int = int(os.environ.get("TRACES_KEEP", "200"))
+
+_LOCK = threading.Lock()
+_OUT: Optional[Tuple[Path, TextIO]] = None  # 当前追踪文件的追加句柄，避免每个 span 重新打开
+
+
+@dataclass
+class Span:
+    name: str
+    span_id: str
+    parent_id: Optional[str]
+    start: float
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("pipeline_span", default=None)
+# 本轮的追踪文件：随上下文复制进 DAG 工作线程与 wrap() 的线程池任务
+_trace_path: contextvars.ContextVar[Optional[Path]] = contextvars.ContextVar("pipeline_trace_file", default=None)
+
+
+def trace_file() -> Optional[Path]:
+    """当前上下文所属轮次的追踪文件；未绑定时取父进程经环境变量传入的文件。"""
+    path = _trace_path.get()
+    if path is not None:
+        return path
+    p = os.environ.get(ENV_FILE)
+    return Path(p) if p else None
+
+
+def start_trace(name: str = "run") -> Path:
+    """开始一轮追踪：新建 JSONL 文件并绑定到当前上下文，之后从本上下文派生的线程与子进程都写入该文件。"""
+    TRACE_DIR.mkdir(parents=True, exist_ok=True)
+    path = TRACE_DIR / f"{time.strftime('%Y%m%d_%H%M%S')}_{name}.jsonl"
+    _trace_path.set(path)
+    prune(exclude=path)
+    return path
+
+
+def prune(keep: int = TRACES_KEEP, exclude: Optional[Path] = None) -> int:
+    """只保留最近 keep 个追踪文件（按文件名即开始时间排序）；返回删除的文件数。"""
+    if keep <= 0 or not TRACE_DIR.exists():
+        return 0
+    files = sorted(f for f in TRACE_DIR.glob("*.jsonl") if f != exclude)
+    removed = 0
+    for f in files[:max(0, len(files) - (keep - 1 if exclude else keep))]:
+        try:
+            f.unlink()
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def ensure_trace(name: str) -> Path:
+    """已有追踪（例如由父进程传入）则沿用，否则新开一轮。"""
+    return trace_file() or start_trace(name)
+
+
+def _emit(record: Dict[str, Any]) -> None:
+    path = trace_file()
+    if path is None:
+        return
+    global _OUT
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    with _LOCK:
+        if _OUT is None or _OUT[0] != path:
+            if _OUT is not None:
+                _OUT[1].close()
+            _OUT = (path, path.open("a", encoding="utf-8"))
+        # 父子进程追加同一文件：每行写完立即 flush，整行一次写入
+        _OUT[1].write(line + "\n")
+        _OUT[1].flush()
+
+
+@atexit.register
+def _close() -> None:
+    global _OUT
+    with _LOCK:
+        if _OUT is not None:
+            _OUT[1].close()
+            _OUT = None
+
+
+def _parent() -> tuple[Optional[str], Dict[str, Any]]:
+    cur = _current.get()
+    if cur is not None:
+        return cur.span_id, cur.attrs
+    # 环境变量里的父 span 只属于父进程传入的追踪文件，本进程新开的一轮从根开始
+    if _trace_path.get() is not None:
+        return None, {}
+    return os.environ.get(ENV_PARENT), {}
+
+
+@contextlib.contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Span]:
+    """记录一个 span；exchange 属性未给出时继承父 span。异常照常抛出，span 标记为 error。"""
+    parent_id, parent_attrs = _parent()
+    if "exchange" not in attrs and "exchange" in parent_attrs:
+        attrs["exchange"] = parent_attrs["exchange"]
+    sp = Span(name=name, span_id=uuid.uuid4().hex[:16], parent_id=parent_id, start=time.time(), attrs=attrs)
+    token = _current.set(sp)
+    status = "ok"
+    try:
+        yield sp
+    except BaseException as e:
+        status = f"error: {type(e).__name__}"
+        raise
+    finally:
+        _current.reset(token)
+        end = time.time()
+        _emit({
+            "name": name,
+            "span_id": sp.span_id,
+            "parent_id": sp.parent_id,
+            "start": round(sp.start, 6),
+            "end": round(end, 6),
+            "dur": round(end - sp.start, 6),
+            "status": status,
+            "pid": os.getpid(),
+            "thread": threading.current_thread().name,
+            "attrs": sp.attrs,
+        })
+
+
+def wrap(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """把当前 span 上下文带进线程池任务（每次调用复制一份上下文，可并发执行）。"""
+    ctx = contextvars.copy_context()
+
+    def runner(*args: Any, **kwargs: Any) -> Any:
+        return ctx.copy().run(fn, *args, **kwargs)
+
+    return runner
+
+
+def child_env(env: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """子进程环境：继承追踪文件，并以当前 span 作为子进程内顶层 span 的父节点。"""
+    env = dict(os.environ if env is None else env)
+    path = trace_file()
+    if path is not None:
+        env[ENV_FILE] = str(path)
+        parent_id, _ = _parent()
+        if parent_id:
+            env[ENV_PARENT] = parent_id
+    return env
+
+
+def httpx_hooks(asynchronous: bool = False, **attrs: Any) -> Dict[str, List[Callable[..., Any]]]:
+    """httpx.Client(event_hooks=...)：为每个 HTTP 请求记录一个叶子 span。
+
+    单个请求可经 `extensions={"trace_attrs": {...}}` 追加属性（例如 symbol）；
+    asynchronous=True 时返回 httpx.AsyncClient 需要的协程钩子。
+    """
+
+    def on_request(request: Any) -> None:
+        request.extensions["trace_t0"] = time.time()
+        request.extensions["trace_hook_attrs"] = attrs
+
+    def on_response(response: Any) -> None:
+        code = response.status_code
+        _emit_http(response.request, "ok" if code < 400 else f"http {code}", status_code=code)
+
+    if asynchronous:
+        async def on_request_async(request: Any) -> None:
+            on_request(request)
+
+        async def on_response_async(response: Any) -> None:
+            on_response(response)
+
+        return {"request": [on_request_async], "response": [on_response_async]}
+    return {"request": [on_request], "response": [on_response]}
+
+
+def _emit_http(req: Any, status: str, **extra: Any) -> None:
+    t0 = req.extensions.get("trace_t0")
+    if t0 is None:
+        return
+    # 只记一次：重定向后的请求或已记过响应的请求不再重复
+    req.extensions.pop("trace_t0", None)
+    parent_id, parent_attrs = _parent()
+    merged = {**(req.extensions.get("trace_hook_attrs") or {}), **(req.extensions.get("trace_attrs") or {})}
+    if "exchange" not in merged and "exchange" in parent_attrs:
+        merged["exchange"] = parent_attrs["exchange"]
+    merged.update({"method": req.method, "url": str(req.url.copy_with(query=None)), **extra})
+    end = time.time()
+    _emit({
+        "name": f"http {req.method} {req.url.host}{req.url.path}",
+        "span_id": uuid.uuid4().hex[:16],
+        "parent_id": parent_id,
+        "start": round(t0, 6),
+        "end": round(end, 6),
+        "dur": round(end - t0, 6),
+        "status": status,
+        "pid": os.getpid(),
+        "thread": threading.current_thread().name,
+        "attrs": merged,
+    })
+
+
+def http_error(request: Any, exc: BaseException) -> None:
+    """请求没有得到响应（超时、连接错误等）时记录 span；httpx 的事件钩子不覆盖这种情况，由客户端的 send 调用。"""
+    _emit_http(request, f"error: {type(exc).__name__}", error=str(exc)[:200])
+
+
+# ---- 汇总 ----
+def load(path: Path) -> List[Dict[str, Any]]:
+    out: List[Dict[str, Any]] = []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if line:
+            try:
+                out.append(json.loads(line))
+            except Exception:
+                continue
+    return out
+
+
+def latest_trace() -> Optional[Path]:
+    files = sorted(TRACE_DIR.glob("*.jsonl")) if TRACE_DIR.exists() else []
+    return files[-1] if files else None
+
+
+def critical_path(spans: List[Dict[str, Any]]) -> List[tuple[int, Dict[str, Any]]]:
+    """从最晚结束的根 span 出发，逐层沿最晚结束的子 span 下钻；返回 [(层级, span)]。
+
+    同层的 DAG 任务 span 带有 after 属性（最后就绪的上游任务），据此补上同层的前驱链。
+    """
+    ids = {s["span_id"] for s in spans}
+    children: Dict[Optional[str], List[Dict[str, Any]]] = defaultdict(list)
+    for s in spans:
+        children[s.get("parent_id") if s.get("parent_id") in ids else None].append(s)
+    path: List[tuple[int, Dict[str, Any]]] = []
+    level = children.get(None) or []
+    depth = 0
+    while level:
+        cur = max(level, key=lambda s: s["end"])
+        by_name = {s["name"]: s for s in level}
+        chain = [cur]
+        while (chain[0].get("attrs") or {}).get("after") and f"job:{chain[0]['attrs']['after']}" in by_name:
+            chain.insert(0, by_name[f"job:{chain[0]['attrs']['after']}"])
+        path.extend((depth, s) for s in chain)
+        level = children.get(cur["span_id"]) or []
+        depth += 1
+    return path
+
+
+def summarize(path: Path, top: int = 10) -> str:
+    spans = load(path)
+    if not spans:
+        return f"追踪为空: {path}"
+    t0 = min(s["start"] for s in spans)
+    lines = [f"=== 追踪汇总 {Path(path).name}：{len(spans)} 个 span，总时长 {max(s['end'] for s in spans) - t0:.1f}s ==="]
+
+    lines.append("关键路径：")
+    for depth, s in critical_path(spans):
+        lines.append(f"{'  ' * (depth + 1)}{s['name']}  {s['dur']:.2f}s  (+{s['start'] - t0:.1f}s → +{s['end'] - t0:.1f}s)")
+
+    lines.append(f"最慢的 {top} 个 span：")
+    for s in sorted(spans, key=lambda s: -s["dur"])[:top]:
+        ex = (s.get("attrs") or {}).get("exchange")
+        lines.append(f"  {s['dur']:8.2f}s  {s['name']}{f' [{ex}]' if ex else ''}  {s['status']}")
+
+    per_ex: Dict[str, Dict[str, float]] = defaultdict(lambda: {"wall": 0.0, "http": 0.0, "http_n": 0, "errors": 0})
+    by_ex: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for s in spans:
+        ex = (s.get("attrs") or {}).get("exchange")
+        if ex:
+            by_ex[ex].append(s)
+    for ex, items in by_ex.items():
+        agg = per_ex[ex]
+        agg["wall"] = max(s["end"] for s in items) - min(s["start"] for s in items)
+        for s in items:
+            if s["name"].startswith("http "):
+                agg["http"] += s["dur"]
+                agg["http_n"] += 1
+            if s["status"] != "ok":
+                agg["errors"] += 1
+    if per_ex:
+        lines.append("各交易所合计：")
+        for ex, agg in sorted(per_ex.items(), key=lambda kv: -kv[1]["wall"]):
+            lines.append(
+                f"  {ex:<10} 墙钟 {agg['wall']:7.1f}s  HTTP {int(agg['http_n'])} 次 / 累计 {agg['http']:.1f}s  异常 {int(agg['errors'])}"
+            )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    target = Path(sys.argv[1]) if len(sys.argv) > 1 else latest_trace()
+    if target is None:
+        print(f"未找到追踪文件：{TRACE_DIR}")
+        sys.exit(1)
+    print(summarize(target))
@@ -73,6 +73,13 @@ if (Test-Path $SuggestDir) {
   }
 }
 
+# Stage the latest pointer so readers resolve the newest files without scanning
+$Pointer = Join-Path $RepoDir "currency_leverage_collection\result\latest.json"
+if (Test-Path $Pointer) {
+  $pRel = $Pointer.Replace($RepoDir + "\", "")
+  git add -- "$pRel"
+}
+
 # Commit if there are staged changes
 $diff = git diff --cached --name-only
 if ([string]::IsNullOrWhiteSpace($diff)) {
@@ -9,15 +9,15 @@ import streamlit as st
 import re
 import json
 
+from pipeline import runs
+
 ROOT = Path(__file__).resolve().parent
-HTML_DIR = ROOT / "result" / "html"
-SUGGEST_DIR = ROOT / "result" / "suggest"
 BJ_TZ = timezone(timedelta(hours=8))
 
 
 def latest_json() -> Path | None:
-    files = sorted(HTML_DIR.glob("Leverage&Margin_*.json"))
-    return files[-1] if files else None
+    # result/latest.json 指针 O(1) 定位；无指针时回退到按文件名排序
+    return runs.latest("table", "json")
 
 
 @st.cache_data(ttl=0)
@@ -331,10 +331,9 @@ def main():
     with tabs[1]:
         st.subheader("Suggest Rule")
         try:
-            jfiles = sorted(SUGGEST_DIR.glob("suggest_rules_*.json"))
+            jpath = runs.latest("suggest", "json")
             df = None
-            if jfiles:
-                jpath = jfiles[-1]
+            if jpath is not None:
                 jdata = json.loads(jpath.read_text(encoding="utf-8"))
                 tiers = (jdata.get("tiers") or {}).get(sym)
                 if isinstance(tiers, list):
@@ -0,0 +1 @@
+# tableMake package
@@ -12,6 +12,9 @@ import openpyxl
 import psycopg2
 import psycopg2.extras
 
+from pipeline.manifest import run_cached
+from pipeline import runs, tracing
+
 # === 配置（与 db_write_platform_exchanges_setting.py 同步） ===
 PG_HOST = "platformuser.cluster-custom-csteuf9lw8dv.ap-northeast-1.rds.amazonaws.com"
 PG_PORT = 5432
@@ -27,6 +30,10 @@ EXS = {"BINANCE", "WEEX", "MECX", "BYBIT", "SURF"}
 
 
 def _latest_excel(dir_path: Path) -> Optional[Path]:
+    # 优先按 result/latest.json 指针定位；没有指针时回退到旧的按修改时间扫描
+    p = runs.latest("table", "xlsx")
+    if p is not None:
+        return p
     if not dir_path.exists():
         return None
     cands = sorted(dir_path.glob("Leverage&Margin_*.xlsx"), key=lambda p: p.stat().st_mtime, reverse=True)
@@ -226,21 +233,29 @@ def upsert_records(conn, table: str, records: List[Dict[str, Any]]):
     print(f"[ok] written: {len(rows)} rows to {table}")
 
 
-def main():
-    xlsx = _latest_excel(RESULT_DIR)
+def main(xlsx: Optional[Path] = None):
+    # 进程内调用时由上游直接传入刚生成的 Excel；独立运行时取 result/ 下最新一份
+    xlsx = xlsx or _latest_excel(RESULT_DIR)
     if not xlsx:
         print(f"[err] 未找到 Excel：{RESULT_DIR}/Leverage&Margin_*.xlsx")
         sys.exit(1)
     print(f"[info] 使用最新 Excel: {xlsx.name}")
 
-    records = build_records_from_excel(xlsx)
-    print(f"[build] rows from excel: {len(records)}")
-
-    conn = pg_connect()
-    try:
-        upsert_records(conn, TABLE_NAME, records)
-    finally:
-        conn.close()
+    def write() -> None:
+        with tracing.span("db.build_records") as sp:
+            records = build_records_from_excel(xlsx)
+            sp.attrs["rows"] = len(records)
+        print(f"[build] rows from excel: {len(records)}")
+
+        with tracing.span("db.upsert", table=TABLE_NAME, rows=len(records)):
+            conn = pg_connect()
+            try:
+                upsert_records(conn, TABLE_NAME, records)
+            finally:
+                conn.close()
+
+    # 与上次入库的是同一份 Excel（内容未变）时跳过整表 upsert
+    run_cached("db_upsert", [xlsx], write, lambda _v: [])
 
 
 if __name__ == "__main__":
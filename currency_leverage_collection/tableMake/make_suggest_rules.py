@@ -8,11 +8,12 @@ from typing import Any, Dict, List, Optional, Tuple
 from openpyxl import Workbook
 from openpyxl.styles import Alignment, Font, PatternFill, Border, Side
 
+from pipeline.json_store import load_json
+from pipeline.manifest import run_cached
+from pipeline import runs
+
 ROOT = Path(__file__).resolve().parent.parent
 DATA_DIR = ROOT / "data" / "dataGet_api"
-HTML_DIR = ROOT / "result" / "html"
-OUT_DIR = ROOT / "result" / "suggest"
-OUT_DIR.mkdir(parents=True, exist_ok=True)
 
 MAJOR_TIERS = [50_000, 200_000, 500_000, 1_000_000]
 MINOR_TIERS = [20_000, 100_000, 200_000]
@@ -21,8 +22,8 @@ EXS_SHOW = ["BINANCE", "WEEX", "MECX", "BYBIT"]
 
 
 def _latest_json() -> Optional[Path]:
-    files = sorted(HTML_DIR.glob("Leverage&Margin_*.json"))
-    return files[-1] if files else None
+    # 按 result/latest.json 指针直接定位，不再 glob 历史文件
+    return runs.latest("table", "json")
 
 
 def _num(v: Any) -> Optional[float]:
@@ -144,7 +145,7 @@ def _build_groups() -> Tuple[List[str], List[str]]:
     majors: List[str] = []
     if cmc_path.exists():
         try:
-            arr = json.loads(cmc_path.read_text(encoding="utf-8"))
+            arr = load_json(cmc_path)
             for it in arr:
                 s = str(it.get("name") or "").upper().strip()
                 if s:
@@ -152,8 +153,7 @@ def _build_groups() -> Tuple[List[str], List[str]]:
         except Exception:
             pass
     # 所有 SURF 支持的 USDT 交易对
-    surf_pairs = (ROOT / "data" / "currency_kinds" / "surf_pairs.json").read_text(encoding="utf-8")
-    sp = json.loads(surf_pairs)
+    sp = load_json(ROOT / "data" / "currency_kinds" / "surf_pairs.json")
     all_syms = []
     for p in sp.get("pairs", []):
         base = str(p.get("base") or "").upper().strip()
@@ -169,7 +169,7 @@ def generate_excel() -> Path:
     latest = _latest_json()
     if latest is None:
         raise FileNotFoundError("未找到 result/html 下的 Leverage&Margin_*.json")
-    data = json.loads(latest.read_text(encoding="utf-8"))
+    data = load_json(latest)
     payload: Dict[str, Dict[str, List[List[Any]]]] = data.get("data") or {}
 
     majors, minors = _build_groups()
@@ -249,18 +249,32 @@ def generate_excel() -> Path:
         write_sheet(sym, MINOR_TIERS)
 
     ts = time.strftime('%Y%m%d_%H%M%S')
-    out_xlsx = OUT_DIR / f"suggest_rules_{ts}.xlsx"
+    # 与所依据的制表结果放在同一个运行目录
+    out_dir = runs.new_run_dir(runs.read_pointer().get("table", {}).get("run_id"))
+    out_xlsx = out_dir / f"suggest_rules_{ts}.xlsx"
     wb.save(out_xlsx)
 
-    out_json = OUT_DIR / f"suggest_rules_{ts}.json"
+    out_json = out_dir / f"suggest_rules_{ts}.json"
     payload_out = {
         "generated_at": ts,
         "tiers": tiers_json,
     }
     out_json.write_text(json.dumps(payload_out, ensure_ascii=False, indent=2), encoding="utf-8")
+    runs.publish("suggest", {"xlsx": out_xlsx, "json": out_json}, mirror=("json",))
     return out_xlsx
 
 
+def main(force: bool = False) -> Path:
+    """增量生成：制表 JSON、CMC 与目标列表均未变化时跳过，返回上次的结果。"""
+    latest = _latest_json()
+    inputs = [p for p in (latest, DATA_DIR / "cmc" / "cmc_top20.json", ROOT / "data" / "currency_kinds" / "surf_pairs.json") if p]
+    path, _skipped = run_cached(
+        "suggest_rules", inputs, generate_excel,
+        lambda xlsx: [xlsx, xlsx.with_suffix(".json")], force=force,
+    )
+    return path
+
+
 if __name__ == "__main__":
-    path = generate_excel()
+    path = main()
     print(f"Saved: {path}")
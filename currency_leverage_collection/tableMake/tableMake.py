@@ -10,19 +10,36 @@ from openpyxl import Workbook
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Alignment, Font, PatternFill, Border, Side
 
+from pipeline.json_store import dump_json, load_json
+from pipeline.last_good import load_freshness, source_path
+from pipeline.manifest import run_cached
+from pipeline import runs, tracing
+from dataGet.utils import raw_archive
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR = BASE_DIR / "data" / "dataGet_api"
 SURF_PATH = BASE_DIR / "data" / "currency_kinds" / "surf_pairs.json"
 RESULT_DIR = BASE_DIR / "result"
 RESULT_DIR.mkdir(parents=True, exist_ok=True)
-RESULT_HTML_DIR = RESULT_DIR / "html"
-RESULT_HTML_DIR.mkdir(parents=True, exist_ok=True)
 
 EX_ORDER = ["binance", "weex", "mexc", "bybit", "surf"]  # 按样表顺序，增加 SURF
 
+# 各交易所的结果文件；本轮过期的交易所由 source_path 改读最后一次成功的快照
+SOURCE_FILES = {
+    "binance": DATA_DIR / "binance" / "binance_selected.json",
+    "bybit": DATA_DIR / "bybit" / "bybit_selected.json",
+    "mexc": DATA_DIR / "mexc" / "mexc_selected.json",
+    "weex": DATA_DIR / "weex" / "weex_selected.json",
+    "surf": DATA_DIR / "surf" / "surf_limits.json",
+}
+
+
+def _src(name: str) -> Path:
+    return source_path(name, SOURCE_FILES[name])
+
 # 读取 surf 目标（只取 USDT）
 def load_targets() -> List[str]:
-    data = json.loads(SURF_PATH.read_text(encoding="utf-8"))
+    data = load_json(SURF_PATH)
     outs: List[str] = []
     for p in data.get("pairs", []):
         base = str(p.get("base") or "").upper().strip()
@@ -36,10 +53,10 @@ def load_targets() -> List[str]:
 # 加载四家 selected 文件
 
 def load_binance() -> Dict[str, List[Dict[str, Any]]]:
-    p = DATA_DIR / "binance" / "binance_selected.json"
+    p = _src("binance")
     if not p.exists():
         return {}
-    items = json.loads(p.read_text(encoding="utf-8"))
+    items = load_json(p)
     # binance_selected 是列表，元素结构：{symbol, riskBrackets:[{bracketMaintenanceMarginRate, bracketNotionalCap, maxOpenPosLeverage, ...}]}
     out: Dict[str, List[Dict[str, Any]]] = {}
     if isinstance(items, list):
@@ -73,10 +90,10 @@ def load_surf() -> Dict[str, List[Dict[str, Any]]]:
     结构：{"items": [{symbol, pair_id, pair_name, max_leverage, max_order_size, max_mmr, ...}, ...]}
     输出：{ "ETHUSDT": [ {mlev, notional_usdt, mmr} ] }
     """
-    p = DATA_DIR / "surf" / "surf_limits.json"
+    p = _src("surf")
     if not p.exists():
         return {}
-    data = json.loads(p.read_text(encoding="utf-8"))
+    data = load_json(p)
     items = data.get("items") if isinstance(data, dict) else None
     out: Dict[str, List[Dict[str, Any]]] = {}
     if isinstance(items, list):
@@ -98,10 +115,10 @@ def load_surf() -> Dict[str, List[Dict[str, Any]]]:
     return out
 
 def load_bybit() -> Dict[str, List[Dict[str, Any]]]:
-    p = DATA_DIR / "bybit" / "bybit_selected.json"
+    p = _src("bybit")
     if not p.exists():
         return {}
-    data = json.loads(p.read_text(encoding="utf-8"))  # 结构：{symbol: [ {maximumLever, storingLocationValue, maintenanceMarginRate, ...}, ... ]}
+    data = load_json(p)  # 结构：{symbol: [ {maximumLever, storingLocationValue, maintenanceMarginRate, ...}, ... ]}
     out: Dict[str, List[Dict[str, Any]]] = {}
     if isinstance(data, dict):
         for sym, tiers in data.items():
@@ -112,10 +129,10 @@ def load_bybit() -> Dict[str, List[Dict[str, Any]]]:
 
 
 def load_mexc() -> Dict[str, List[Dict[str, Any]]]:
-    p = DATA_DIR / "mexc" / "mexc_selected.json"
+    p = _src("mexc")
     if not p.exists():
         return {}
-    data = json.loads(p.read_text(encoding="utf-8"))  # 结构：{symbol: [ {mlev, notional_usdt, mmr, ...}, ... ]}
+    data = load_json(p)  # 结构：{symbol: [ {mlev, notional_usdt, mmr, ...}, ... ]}
     out: Dict[str, List[Dict[str, Any]]] = {}
     if isinstance(data, dict):
         for sym, tiers in data.items():
@@ -126,10 +143,10 @@ def load_mexc() -> Dict[str, List[Dict[str, Any]]]:
 
 
 def load_weex() -> Dict[str, List[Dict[str, Any]]]:
-    p = DATA_DIR / "weex" / "weex_selected.json"
+    p = _src("weex")
     if not p.exists():
         return {}
-    data = json.loads(p.read_text(encoding="utf-8"))  # 结构：{symbol: [ {lv, range, mlev, mmr}, ... ]}
+    data = load_json(p)  # 结构：{symbol: [ {lv, range, mlev, mmr}, ... ]}
     out: Dict[str, List[Dict[str, Any]]] = {}
     if isinstance(data, dict):
         for sym, tiers in data.items():
@@ -397,7 +414,7 @@ def beautify_sheet(ws) -> None:
                 cell.alignment = Alignment(horizontal="center", vertical="center")
 
 
-def _build_html(symbols: List[str], html_payload: Dict[str, Dict[str, List[List[Any]]]], summaries: Dict[str, Dict[str, Any]], book_name: str) -> Path:
+def _build_html(symbols: List[str], html_payload: Dict[str, Dict[str, List[List[Any]]]], summaries: Dict[str, Dict[str, Any]], book_name: str, out_dir: Path, freshness: Optional[Dict[str, Any]] = None) -> Path:
     """生成带下拉的静态 HTML，联动展示四所数据。"""
     exchanges = ["BINANCE", "WEEX", "MECX", "BYBIT", "SURF"]
     data_json = json.dumps(html_payload, ensure_ascii=False)
@@ -507,22 +524,23 @@ def _build_html(symbols: List[str], html_payload: Dict[str, Dict[str, List[List[
             .replace("__SUMMARY__", summary_json)
             .replace("__SYMBOLS__", symbols_json)
             .replace("__EXS__", exs_json))
-    out = RESULT_HTML_DIR / f"{book_name}.html"
+    out = out_dir / f"{book_name}.html"
     out.write_text(html, encoding="utf-8")
-    json_out = RESULT_HTML_DIR / f"{book_name}.json"
-    json_out.write_text(json.dumps({"symbols": symbols, "data": html_payload, "summary": summaries}, ensure_ascii=False), encoding="utf-8")
+    json_out = out_dir / f"{book_name}.json"
+    dump_json(json_out, {"symbols": symbols, "data": html_payload, "summary": summaries, "freshness": freshness or {}}, indent=None)
     return out
 
 
 def make_excel() -> Path:
-    targets = load_targets()
-    sources = {
-        "binance": load_binance(),
-        "bybit": load_bybit(),
-        "mexc": load_mexc(),
-        "weex": load_weex(),
-        "surf": load_surf(),
-    }
+    with tracing.span("tableMake.load_sources"):
+        targets = load_targets()
+        sources = {
+            "binance": load_binance(),
+            "bybit": load_bybit(),
+            "mexc": load_mexc(),
+            "weex": load_weex(),
+            "surf": load_surf(),
+        }
 
     wb = Workbook()
     # 删除默认Sheet
@@ -572,16 +590,39 @@ def make_excel() -> Path:
         beautify_sheet(ws)
         autosize(ws)
 
+    # 本轮产物全部写入独立的运行目录，写完后再原子切换 result/latest.json 指针
     ts = time.strftime("%Y%m%d_%H%M%S")
-    out = RESULT_DIR / f"Leverage&Margin_{ts}.xlsx"
-    wb.save(out)
+    run_dir = runs.new_run_dir(ts)
+    out = run_dir / f"Leverage&Margin_{ts}.xlsx"
+    with tracing.span("tableMake.save_xlsx", sheets=len(wb.sheetnames)):
+        wb.save(out)
     # 生成 HTML（带下拉联动）
     # 仅使用实际创建了 Sheet 的币种（即 html_payload 的键集合）
     created_symbols = sorted(html_payload.keys())
-    _build_html(created_symbols, html_payload, summaries, out.stem)
+    # 各交易所数据新鲜度（fresh / stale + 快照年龄），随 JSON 一并输出
+    freshness = {ex: f for ex, f in load_freshness().items() if ex in SOURCE_FILES}
+    for ex, f in freshness.items():
+        if f.get("status") != "fresh":
+            print(f"[tableMake] {ex}: {f.get('status')}，数据时间 {f.get('fetched_at')}（{f.get('age_sec')}s 前）")
+    with tracing.span("tableMake.build_html", symbols=len(created_symbols)):
+        html_out = _build_html(created_symbols, html_payload, summaries, out.stem, run_dir, freshness)
+    runs.publish("table", {"xlsx": out, "html": html_out, "json": html_out.with_suffix(".json")})
+    runs.compact()
+    raw_archive.compact()
     return out
 
 
+def _outputs(xlsx: Path) -> List[Path]:
+    return [xlsx, xlsx.with_suffix(".html"), xlsx.with_suffix(".json")]
+
+
+def main(force: bool = False) -> Path:
+    """增量制表：输入文件与上次完全一致时跳过，直接返回上次生成的 Excel。"""
+    inputs = [SURF_PATH, *(_src(name) for name in SOURCE_FILES)]
+    path, _skipped = run_cached("excel", inputs, make_excel, _outputs, force=force)
+    return path
+
+
 if __name__ == "__main__":
     # 运行时守卫日志：用于定位外部误创建目录的问题
     import os
@@ -590,5 +631,5 @@ if __name__ == "__main__":
     print("[tableMake] RESULT_DIR:", RESULT_DIR)
     print("[tableMake] Guard: 本脚本输出到 'result/'")
 
-    path = make_excel()
+    path = main()
     print(f"已生成: {path}")
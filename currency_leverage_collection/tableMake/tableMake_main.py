@@ -1,10 +1,18 @@
 from __future__ import annotations
 
+import importlib
+import os
 import subprocess
 import sys
+import time
 from pathlib import Path
+from typing import Any, Dict, Optional
+
+from config import settings
+from pipeline import tracing
 
 BASE_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BASE_DIR.parent
 
 STEPS = [
     ("生成 Excel 报表", BASE_DIR / "tableMake.py"),
@@ -12,21 +20,59 @@ STEPS = [
     ("从最新 Excel 写入数据库 (upsert by symbol,exchange)", BASE_DIR / "excel_write_platform_exchanges_setting.py"),
 ]
 
+# 进程内模式：脚本 -> (模块, 入口函数)
+MODULES = {
+    "tableMake.py": ("tableMake.tableMake", "main"),
+    "setup_platform_exchanges_setting_schema.py": ("tableMake.setup_platform_exchanges_setting_schema", "main"),
+    "excel_write_platform_exchanges_setting.py": ("tableMake.excel_write_platform_exchanges_setting", "main"),
+}
+
 
 def run_step(title: str, script_path: Path) -> None:
     if not script_path.exists():
         raise FileNotFoundError(f"脚本不存在: {script_path}")
     print(f"\n===== {title} =====")
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([str(PROJECT_ROOT)] + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else []))
     cmd = [sys.executable, str(script_path)]
-    proc = subprocess.run(cmd, cwd=str(BASE_DIR))
+    with tracing.span(f"tableMake:{script_path.stem}"):
+        proc = subprocess.run(cmd, cwd=str(BASE_DIR), env=tracing.child_env(env))
     if proc.returncode != 0:
         raise SystemExit(f"步骤失败: {title} -> 返回码 {proc.returncode}")
 
 
-def main() -> None:
-    print("[info] tableMake_main 启动，顺序执行 3 个步骤…")
-    for title, script in STEPS:
-        run_step(title, script)
+def run_step_inprocess(title: str, script_path: Path, kwargs: Optional[Dict[str, Any]] = None) -> Any:
+    module, func = MODULES[script_path.name]
+    print(f"\n===== {title} =====")
+    t0 = time.time()
+    entry = getattr(importlib.import_module(module), func)
+    t1 = time.time()
+    try:
+        with tracing.span(f"tableMake:{script_path.stem}"):
+            value = entry(**(kwargs or {}))
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            raise SystemExit(f"步骤失败: {title} -> 返回码 {e.code}")
+        value = None
+    print(f"[time] {script_path.name}: 导入 {t1 - t0:.2f}s, 运行 {time.time() - t1:.2f}s")
+    return value
+
+
+def main(mode: str = "subprocess") -> None:
+    steps = STEPS if settings.TABLEMAKE_WRITE_DB else STEPS[:1]
+    print(f"[info] tableMake_main 启动，顺序执行 {len(steps)} 个步骤（模式={mode}）…")
+    if mode == "inprocess":
+        # 生成的 Excel 路径直接交给入库步骤，无需再按修改时间扫描 result/
+        xlsx = run_step_inprocess(*STEPS[0])
+        if settings.TABLEMAKE_WRITE_DB:
+            run_step_inprocess(*STEPS[1])
+            run_step_inprocess(*STEPS[2], kwargs={"xlsx": xlsx})
+    else:
+        for title, script in steps:
+            run_step(title, script)
+    if not settings.TABLEMAKE_WRITE_DB:
+        print("\n[ok] 已生成 Excel（TABLEMAKE_WRITE_DB=false，未写入数据库）。")
+        return
     print("\n[ok] 全部步骤完成：已生成 Excel，并将 5 列数据写入数据库表 platform_exchanges_setting_min。")
 
 
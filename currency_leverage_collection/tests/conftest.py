@@ -0,0 +1,8 @@
+"""测试从项目根目录导入 config / dataGet / pipeline（与 python main.py 的运行方式一致）。"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
@@ -0,0 +1,16 @@
+from dataGet import bybit_brackets_fetch as bybit
+from dataGet import mock_server
+
+
+def test_bulk_tiers_match_symbol_risk():
+    data = mock_server.MockData(mock_server.make_bases(5))
+    _, page = data.bybit_risk_limit({})
+    rows = {}
+    # 打乱顺序：gear 只能由 riskLimitValue 排序得出，不能依赖返回顺序或 id
+    for row in reversed(page["result"]["list"]):
+        rows.setdefault(row["symbol"], []).append(row)
+    assert rows
+    for sym, lst in rows.items():
+        assert all(str(r["id"]) != str(i + 1) for i, r in enumerate(lst))
+        _, risk = data.bybit_symbol_risk({"symbol": sym})
+        assert bybit._bulk_tiers(lst) == risk["result"]["list"]
@@ -0,0 +1,41 @@
+import json
+import threading
+
+import pytest
+
+from dataGet import bybit_brackets_fetch as bybit
+from pipeline.json_store import WriteCancelled, write_guard
+
+
+def _item(sym):
+    return {"symbol": sym, "data": {"result": {"list": [{"gear": "1", "symbol": sym}]}}}
+
+
+def _lines(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_appends_only_new_records_then_writes_once(tmp_path, monkeypatch):
+    out = tmp_path / "bybit_selected.json"
+    writer = bybit._StreamWriter(out, ["AUSDT", "BUSDT", "CUSDT"], flush_sec=0.0)
+    monkeypatch.setattr(bybit, "print_progress_bar", lambda *a: None)
+    writer.add(_item("BUSDT"))
+    writer.add(_item("AUSDT"))
+    assert [r["symbol"] for r in _lines(writer.partial)] == ["BUSDT", "AUSDT"]
+    assert not out.exists()
+
+    writer.add(_item("CUSDT"))
+    assert [r["symbol"] for r in _lines(writer.partial)] == ["BUSDT", "AUSDT", "CUSDT"]
+    writer.flush()
+    assert list(json.loads(out.read_text(encoding="utf-8"))) == ["AUSDT", "BUSDT", "CUSDT"]
+    assert not writer.partial.exists()
+
+
+def test_partial_append_respects_write_guard(tmp_path, monkeypatch):
+    monkeypatch.setattr(bybit, "print_progress_bar", lambda *a: None)
+    writer = bybit._StreamWriter(tmp_path / "bybit_selected.json", ["AUSDT"], flush_sec=0.0)
+    cancelled = threading.Event()
+    cancelled.set()
+    with write_guard(cancelled), pytest.raises(WriteCancelled):
+        writer.add(_item("AUSDT"))
+    assert not writer.partial.exists()
@@ -0,0 +1,115 @@
+import httpx
+import pytest
+
+from dataGet.utils import circuit_breaker
+from dataGet.utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+
+REQ = httpx.Request("GET", "https://example.com/")
+
+
+@pytest.fixture(autouse=True)
+def enabled(monkeypatch):
+    monkeypatch.setattr(circuit_breaker.settings, "CIRCUIT_ENABLED", True)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _breaker():
+    return CircuitBreaker("ex:ep", window=4, failure_rate=0.5, min_calls=4, cooldown=10.0)
+
+
+def test_opens_after_failure_rate(clock):
+    b = _breaker()
+    for ok in (True, False, True):
+        assert b.allow()
+        b.record(ok)
+    assert b.state == CLOSED  # 不足 min_calls
+    b.record(False)
+    assert b.state == OPEN
+    assert not b.allow()
+    assert b.snapshot()["rejected"] == 1
+
+
+def test_half_open_single_probe(clock):
+    b = _breaker()
+    for _ in range(4):
+        b.record(False)
+    clock[0] += 10.0
+    assert b.allow()
+    assert b.state == HALF_OPEN
+    assert not b.allow()  # 探测进行中，其余调用快速失败
+    b.record(False)
+    assert b.state == OPEN
+    clock[0] += 10.0
+    assert b.allow()
+    b.record(True)
+    assert b.state == CLOSED
+    assert [t["to"] for t in b.transitions] == [OPEN, HALF_OPEN, OPEN, HALF_OPEN, CLOSED]
+
+
+def test_guard_counts_only_server_and_network_failures(clock):
+    b = _breaker()
+    not_found = httpx.HTTPStatusError("404", request=REQ, response=httpx.Response(404, request=REQ))
+    for _ in range(4):
+        with pytest.raises(httpx.HTTPStatusError):
+            with b.guard():
+                raise not_found
+    assert b.state == CLOSED  # 404 记为成功
+    for _ in range(2):
+        with pytest.raises(httpx.ConnectError):
+            with b.guard():
+                raise httpx.ConnectError("down", request=REQ)
+    assert b.state == OPEN
+    with pytest.raises(CircuitOpen):
+        with b.guard():
+            pass
+
+
+def test_registry_and_new_run():
+    circuit_breaker.new_run()
+    b = circuit_breaker.get("bybit", "symbol-risk")
+    assert circuit_breaker.get("bybit", "symbol-risk") is b
+    assert set(circuit_breaker.snapshot("bybit")) == {"bybit:symbol-risk"}
+    assert circuit_breaker.snapshot("mexc") == {}
+    circuit_breaker.new_run()
+    assert circuit_breaker.get("bybit", "symbol-risk") is not b
+    circuit_breaker.new_run()
+
+
+@pytest.mark.parametrize("status", [403, 429, 400])
+def test_other_4xx_neither_counts_nor_closes(clock, status):
+    b = _breaker()
+    err = httpx.HTTPStatusError(str(status), request=REQ, response=httpx.Response(status, request=REQ))
+    for _ in range(4):
+        b.record(False)
+    clock[0] += 10.0
+    with pytest.raises(httpx.HTTPStatusError):
+        with b.guard():
+            raise err
+    assert b.state == HALF_OPEN  # 不能证明已恢复
+    assert b.allow()  # 探测名额已释放
+    b.record(True)
+    assert b.state == CLOSED
+
+    for _ in range(8):
+        with pytest.raises(httpx.HTTPStatusError):
+            with b.guard():
+                raise err
+    assert list(b.outcomes) == []  # 不计入失败率
+    assert b.snapshot()["ignored"] == 9
+
+
+def test_404_probe_closes(clock):
+    b = _breaker()
+    for _ in range(4):
+        b.record(False)
+    clock[0] += 10.0
+    with pytest.raises(httpx.HTTPStatusError):
+        with b.guard():
+            raise httpx.HTTPStatusError("404", request=REQ, response=httpx.Response(404, request=REQ))
+    assert b.state == CLOSED
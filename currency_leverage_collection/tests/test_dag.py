@@ -0,0 +1,182 @@
+import threading
+import time
+
+import pytest
+
+from pipeline import dag
+from pipeline.dag import DagJob, DagScheduler
+
+
+def _job(name, log, rc=0, **kw):
+    def func():
+        log.append(name)
+        return rc
+
+    return DagJob(name=name, func=func, **kw)
+
+
+def test_runs_in_dependency_order():
+    log = []
+    sched = DagScheduler([
+        _job("c", log, inputs=("b.out",), outputs=("c.out",)),
+        _job("b", log, inputs=("a.out",), outputs=("b.out",)),
+        _job("a", log, inputs=("seed",), outputs=("a.out",)),
+    ], initial=("seed",))
+    records = sched.run()
+    assert log == ["a", "b", "c"]
+    assert {n: r.status for n, r in records.items()} == {"a": "ok", "b": "ok", "c": "ok"}
+    assert [r.name for r in sched.critical_path()] == ["a", "b", "c"]
+
+
+def test_priority_orders_jobs_ready_together():
+    log = []
+    sched = DagScheduler([
+        _job("short", log, priority=1.0),
+        _job("long", log, priority=9.0),
+    ], max_workers=1)
+    sched.run()
+    assert log == ["long", "short"]
+
+
+def test_failed_hard_input_blocks_downstream():
+    log = []
+    sched = DagScheduler([
+        _job("a", log, rc=1, outputs=("a.out",)),
+        _job("b", log, inputs=("a.out",), outputs=("b.out",)),
+        _job("c", log, inputs=("b.out",)),
+    ])
+    records = sched.run()
+    assert log == ["a"]
+    assert [records[n].status for n in "abc"] == ["failed", "blocked", "blocked"]
+
+
+def test_exception_counts_as_failure():
+    def boom():
+        raise RuntimeError("boom")
+
+    sched = DagScheduler([DagJob("a", boom)])
+    records = sched.run()
+    assert records["a"].status == "failed" and records["a"].rc == 1
+    assert "RuntimeError" in records["a"].error
+
+
+def test_soft_input_waits_but_tolerates_failure():
+    log = []
+    sched = DagScheduler([
+        _job("good", log, outputs=("good.out",)),
+        _job("bad", log, rc=2, outputs=("bad.out",)),
+        _job("table", log, inputs=("good.out",), soft_inputs=("bad.out",)),
+    ])
+    records = sched.run()
+    assert records["table"].status == "ok"
+    assert log[-1] == "table"
+    assert records["table"].gated_by in ("good", "bad")
+
+
+def test_publish_releases_downstream_before_producer_ends():
+    started = threading.Event()
+    sched = None
+
+    def producer():
+        sched.publish("early")
+        # 下游在本任务结束前就已启动，否则这里会等满超时
+        return 0 if started.wait(timeout=5) else 1
+
+    def consumer():
+        started.set()
+        return 0
+
+    sched = DagScheduler([
+        DagJob("producer", producer, outputs=("early",)),
+        DagJob("consumer", consumer, inputs=("early",)),
+    ])
+    records = sched.run()
+    assert records["producer"].status == "ok"
+    assert records["consumer"].status == "ok"
+
+
+def test_deadline_expires_running_job_and_cancels_it():
+    release = threading.Event()
+    cancelled = threading.Event()
+    log = []
+
+    def slow():
+        release.wait(timeout=10)
+        return 0
+
+    def cancel():
+        cancelled.set()
+        release.set()
+
+    sched = DagScheduler([
+        DagJob("slow", slow, outputs=("slow.out",), expires=True, cancel=cancel),
+        _job("fast", log, outputs=("fast.out",)),
+        _job("table", log, inputs=("fast.out",), soft_inputs=("slow.out",)),
+    ], deadline=0.3)
+    t0 = time.perf_counter()
+    records = sched.run()
+    assert time.perf_counter() - t0 < 5
+    assert records["slow"].status == "expired"
+    assert records["table"].status == "ok"
+    assert cancelled.wait(timeout=5)
+    assert "expired" in sched.report()
+
+
+def test_deadline_does_not_expire_required_jobs():
+    def slow():
+        time.sleep(0.3)
+        return 0
+
+    sched = DagScheduler([DagJob("slow", slow)], deadline=0.05)
+    assert sched.run()["slow"].status == "ok"
+
+
+def test_rejects_invalid_graphs():
+    noop = lambda: 0  # noqa: E731
+    with pytest.raises(ValueError):
+        DagScheduler([DagJob("a", noop, inputs=("missing",))])
+    with pytest.raises(ValueError):
+        DagScheduler([DagJob("a", noop, outputs=("x",)), DagJob("b", noop, outputs=("x",))])
+    with pytest.raises(ValueError):
+        DagScheduler([
+            DagJob("a", noop, inputs=("b.out",), outputs=("a.out",)),
+            DagJob("b", noop, inputs=("a.out",), outputs=("b.out",)),
+        ])
+
+
+def test_abandoned_thread_blocks_next_run_until_it_ends():
+    release = threading.Event()
+    calls = []
+
+    def hung():
+        calls.append(1)
+        release.wait(timeout=10)
+        return 0
+
+    def build():
+        log = []
+        return DagScheduler([
+            DagJob("hung", hung, outputs=("hung.out",), expires=True),
+            _job("table", log, soft_inputs=("hung.out",)),
+        ], deadline=0.2)
+
+    try:
+        assert build().run()["hung"].status == "expired"
+        assert "hung" in dag.abandoned()
+
+        sched = build()
+        records = sched.run()
+        assert records["hung"].status == "stuck"
+        assert records["table"].status == "ok"
+        assert calls == [1]
+        assert "stuck" in sched.report() and "仍在运行的被放弃线程" in sched.report()
+    finally:
+        release.set()
+
+    deadline = time.monotonic() + 5
+    while "hung" in dag.abandoned() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert "hung" not in dag.abandoned()
+    # 线程结束后恢复正常调度
+    assert build().run()["hung"].status == "ok"
+    assert calls == [1, 1]
@@ -0,0 +1,47 @@
+import threading
+
+import pytest
+
+from dataGet import dataGet_main
+
+
+@pytest.fixture
+def stuck_thread(monkeypatch):
+    release = threading.Event()
+    worker = threading.Thread(target=release.wait, daemon=True)
+    worker.start()
+    monkeypatch.setitem(dataGet_main._THREADS, "mexc", (worker, threading.Event()))
+    monkeypatch.setitem(dataGet_main._ABANDONED_AT, "mexc", 0.0)
+    yield worker
+    release.set()
+    worker.join()
+    dataGet_main._ABANDONED_AT.pop("mexc", None)
+
+
+def _patch(monkeypatch, timeout):
+    monkeypatch.setitem(dataGet_main.settings.DATAGET_TIMEOUTS, "mexc", timeout)
+    monkeypatch.setattr(dataGet_main.settings, "DATAGET_INPROCESS_JOBS", ("mexc",))
+    calls = []
+    monkeypatch.setattr(dataGet_main, "_run_script", lambda name, *a, **kw: calls.append(name) or (name, 0, None, None, 0.0))
+    return calls
+
+
+def test_stuck_thread_falls_back_to_subprocess_for_timed_jobs(stuck_thread, monkeypatch):
+    calls = _patch(monkeypatch, 300)
+    assert dataGet_main._stuck_for("mexc") > 0
+    _name, rc, *_ = dataGet_main._run_job("mexc", dataGet_main.SCRIPTS["mexc"], [], "inprocess")
+    assert rc == 0 and calls == ["mexc"]
+
+
+def test_stuck_thread_reports_distinct_status_for_untimed_jobs(stuck_thread, monkeypatch):
+    calls = _patch(monkeypatch, 0)
+    _name, rc, *_ = dataGet_main._run_job("mexc", dataGet_main.SCRIPTS["mexc"], [], "inprocess")
+    assert rc == dataGet_main.STUCK_RC and calls == []
+
+
+def test_finished_thread_is_not_stuck(monkeypatch):
+    done = threading.Thread(target=lambda: None)
+    done.start()
+    done.join()
+    monkeypatch.setitem(dataGet_main._THREADS, "mexc", (done, threading.Event()))
+    assert dataGet_main._stuck_for("mexc") is None
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from dataGet.utils import json_stream
+
+PAYLOAD = {
+    "code": 0,
+    "meta": {"data": [{"symbol": "DECOYUSDT"}]},  # 不在候选路径上的同名数组
+    "data": [
+        {"symbol": "BTCUSDT", "brackets": [{"bracket": 1, "notionalCap": 50000}], "note": "a [tricky] {value}"},
+        {"info": {"symbol": "NESTEDUSDT"}, "symbol": " ethusdt ", "tiers": [[1, 2], [3, 4]]},
+        {"desc": "escaped \"symbol\": \"FAKEUSDT\" inside a string", "symbol": "SOLUSDT"},
+        {"pair": "NOSYMBOL"},
+        {"symbol": "DOGEUSDT", "unicode": "多空 é"},
+        "not-an-object",
+        {"symbol": "XRPUSDT", "empty": {}, "list": []},
+    ],
+    "tail": {"symbol": "AFTERUSDT"},
+}
+
+WANTED = {"BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT", "FAKEUSDT", "NESTEDUSDT"}
+
+
+def _expected(data, keys=("symbol",)):
+    items = []
+    for it in data:
+        if not isinstance(it, dict):
+            continue
+        raw = next((it[k] for k in keys if k in it), None)
+        if isinstance(raw, str) and raw.strip() and raw.strip().upper() in WANTED:
+            items.append((raw.strip().upper(), it))
+    return sum(isinstance(it, dict) for it in data), items
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_scan_matches_json_loads(indent):
+    buf = json.dumps(PAYLOAD, ensure_ascii=False, indent=indent).encode("utf-8")
+    sel = json_stream.scan(buf, [("data",)], WANTED.__contains__)
+    total, items = _expected(PAYLOAD["data"])
+    assert sel.path == ("data",)
+    assert sel.total == total
+    assert sel.items == items
+
+
+def test_select_file_and_fallback_paths(tmp_path):
+    rows = [{"s": "BTCUSDT", "symbol": "IGNORED"}, {"s": "ETHUSDT"}, {"symbol": "SOLUSDT"}, {"s": "ADAUSDT"}]
+    path = tmp_path / "ticker.json"
+    path.write_text(json.dumps({"list": rows}), encoding="utf-8")
+    sel = json_stream.select(path, [("data",), ("list",), ()], WANTED.__contains__, ("s", "symbol"))
+    total, items = _expected(rows, ("s", "symbol"))
+    assert sel.path == ("list",)
+    assert (sel.total, sel.items) == (total, items)
+
+
+def test_top_level_array(tmp_path):
+    rows = [{"symbol": "BTCUSDT", "x": [1, {"y": "]"}]}, {"symbol": "LTCUSDT"}]
+    sel = json_stream.scan(json.dumps(rows).encode("utf-8"), [()], WANTED.__contains__)
+    assert (sel.total, sel.items) == _expected(rows)
+
+
+def test_no_candidate_array_returns_none(tmp_path):
+    assert json_stream.scan(json.dumps({"data": {"BTCUSDT": []}}).encode(), [("data",)], WANTED.__contains__) is None
+    empty = tmp_path / "empty.json"
+    empty.write_bytes(b"")
+    assert json_stream.select(empty, [("data",)], WANTED.__contains__) is None
+    assert json_stream.select(tmp_path / "missing.json", [("data",)], WANTED.__contains__) is None
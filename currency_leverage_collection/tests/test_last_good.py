@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+from dataGet import dataGet_main
+from pipeline import last_good
+from pipeline.dag import DagScheduler
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    snap = tmp_path / "_last_good"
+    monkeypatch.setattr(last_good, "SNAP_DIR", snap)
+    monkeypatch.setattr(last_good, "INDEX_PATH", snap / "_index.json")
+    monkeypatch.setattr(last_good, "FRESHNESS_PATH", tmp_path / "_freshness.json")
+    return tmp_path
+
+
+def test_save_skips_empty_results(store):
+    out = store / "binance_selected.json"
+    out.write_text("[]", encoding="utf-8")
+    assert not last_good.save("binance", out)
+    out.write_text(json.dumps([{"symbol": "BTCUSDT"}]), encoding="utf-8")
+    assert last_good.save("binance", out)
+    assert last_good.snapshot_path("binance").exists()
+
+
+def _run_binance(store, monkeypatch, payload):
+    out = store / "binance_selected.json"
+    monkeypatch.setitem(dataGet_main.OUTPUT_FILES, "binance", out)
+    monkeypatch.setattr(dataGet_main, "_record_duration", lambda name, dur: None)
+
+    def fake_run_job(name, *_args, **_kw):
+        out.write_text(json.dumps(payload), encoding="utf-8")
+        return name, 0, None, None, 0.1
+
+    monkeypatch.setattr(dataGet_main, "_run_job", fake_run_job)
+    results = {}
+    sched = DagScheduler(dataGet_main.build_jobs("inprocess", results, only=["binance"]), initial=("surf_pairs",))
+    records = sched.run()
+    return results, dataGet_main.write_freshness(records, ["binance"])["binance"], out
+
+
+def test_empty_output_is_not_fresh(store, monkeypatch):
+    results, fresh, out = _run_binance(store, monkeypatch, [{"symbol": "BTCUSDT"}])
+    assert results["binance"]["returncode"] == "0" and fresh["status"] == "fresh"
+
+    results, fresh, out = _run_binance(store, monkeypatch, [])
+    assert results["binance"]["returncode"] == str(dataGet_main.EMPTY_RC)
+    assert fresh["status"] == "stale"
+    assert last_good.source_path("binance", out) == last_good.snapshot_path("binance")
@@ -0,0 +1,71 @@
+import pytest
+
+from pipeline import manifest
+
+
+@pytest.fixture
+def stage_env(tmp_path, monkeypatch):
+    monkeypatch.setattr(manifest, "MANIFEST_DIR", tmp_path / "_manifest")
+    monkeypatch.delenv("PIPELINE_FORCE_REBUILD", raising=False)
+    src = tmp_path / "input.json"
+    src.write_text('{"v": 1}', encoding="utf-8")
+    out = tmp_path / "output.json"
+    calls = []
+
+    def build():
+        calls.append(1)
+        out.write_text(src.read_text(encoding="utf-8"), encoding="utf-8")
+        return out
+
+    return src, out, build, calls
+
+
+def _run(src, build, **kw):
+    return manifest.run_cached("demo", [src], build, lambda p: [p], **kw)
+
+
+def test_unchanged_inputs_skip(stage_env):
+    src, out, build, calls = stage_env
+    assert _run(src, build) == (out, False)
+    assert manifest.is_fresh("demo", [src])
+    value, skipped = _run(src, build)
+    assert skipped and value == out
+    assert len(calls) == 1
+    assert manifest.last_action("demo") == "skipped"
+    assert "累计跳过 1 次" in manifest.summary()
+
+
+def test_changed_input_reruns(stage_env):
+    src, _out, build, calls = stage_env
+    _run(src, build)
+    src.write_text('{"v": 2}', encoding="utf-8")
+    assert not manifest.is_fresh("demo", [src])
+    assert _run(src, build)[1] is False
+    assert len(calls) == 2
+    assert manifest.last_action("demo") == "ran"
+
+
+def test_modified_output_reruns(stage_env):
+    src, out, build, calls = stage_env
+    _run(src, build)
+    out.write_text("edited", encoding="utf-8")
+    assert _run(src, build)[1] is False
+    assert len(calls) == 2
+
+
+def test_force_reruns(stage_env, monkeypatch):
+    src, _out, build, calls = stage_env
+    _run(src, build)
+    assert _run(src, build, force=True)[1] is False
+    monkeypatch.setenv("PIPELINE_FORCE_REBUILD", "true")
+    assert not manifest.is_fresh("demo", [src])
+    assert _run(src, build)[1] is False
+    assert len(calls) == 3
+
+
+def test_stages_use_separate_files(stage_env):
+    src, _out, build, _calls = stage_env
+    _run(src, build)
+    manifest.run_cached("other", [src], build, lambda p: [p])
+    assert sorted(p.name for p in manifest.MANIFEST_DIR.glob("*.json")) == ["demo.json", "other.json"]
+    assert not list(manifest.MANIFEST_DIR.glob("*.tmp"))
@@ -0,0 +1,85 @@
+import types
+
+import pytest
+
+from dataGet.utils import rate_limit
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(rate_limit, "time", types.SimpleNamespace(monotonic=c.monotonic, time=c.time))
+    return c
+
+
+@pytest.mark.parametrize("spec,expected", [
+    ("20/40", (20.0, 40.0)),
+    ("20", (20.0, 20.0)),
+    ("0.5", (0.5, 1.0)),
+    ("0", (0.0, 1.0)),
+    (None, (0.0, 1.0)),
+])
+def test_parse_limit(spec, expected):
+    assert rate_limit._parse_limit(spec) == expected
+
+
+def test_burst_then_overdraft_queue(clock):
+    b = rate_limit.TokenBucket("h", rate=2.0, burst=2.0)
+    assert [b.reserve() for _ in range(4)] == [0.0, 0.0, 0.5, 1.0]
+    clock.now += 2.0  # 补回 4 个令牌，但透支的 2 个先扣掉
+    assert b.reserve() == 0.0
+    assert b.tokens == pytest.approx(1.0)
+    clock.now += 10.0  # 不超过桶容量
+    b.reserve()
+    assert b.tokens == pytest.approx(1.0)
+    assert b.counters["waits"] == 2 and b.counters["wait_sec"] == pytest.approx(1.5)
+
+
+def test_unlimited_bucket_never_waits(clock):
+    b = rate_limit.TokenBucket("h", *rate_limit._parse_limit("0"))
+    assert all(b.reserve() == 0.0 for _ in range(100))
+
+
+def test_throttle_halves_rate_pauses_and_recovers(clock):
+    b = rate_limit.TokenBucket("h", rate=10.0, burst=10.0)
+    b.observe(429, {"retry-after": "3"})
+    assert b.rate == 5.0
+    assert b.reserve() == pytest.approx(3.0)
+    for _ in range(20):
+        b.observe(429, {})
+    assert b.rate == pytest.approx(10.0 * rate_limit.MIN_FRACTION)
+    b.observe(200, {})
+    assert b.rate == pytest.approx(0.5 + 10.0 * rate_limit.RECOVER_STEP)
+    for _ in range(100):
+        b.observe(200, {})
+    assert b.rate == 10.0
+    assert b.snapshot()["throttled"] == 21
+
+
+def test_pause_from_headers():
+    now = 1_700_000_000.0
+    assert rate_limit.pause_from_headers({"retry-after": "7"}, now) == 7.0
+    assert rate_limit.pause_from_headers({}, now) is None
+    assert rate_limit.pause_from_headers({"x-ratelimit-remaining": "3", "x-ratelimit-reset": "5"}, now) is None
+    assert rate_limit.pause_from_headers({"x-ratelimit-remaining": "0", "x-ratelimit-reset": "5"}, now) == 5.0
+    ms = {"x-bapi-limit-status": "0", "x-bapi-limit-reset-timestamp": str(int((now + 2) * 1000))}
+    assert rate_limit.pause_from_headers(ms, now) == pytest.approx(2.0)
+    assert rate_limit.pause_from_headers({"retry-after": "99999"}, now) == rate_limit.MAX_PAUSE
+
+
+def test_host_matching(monkeypatch):
+    monkeypatch.setattr(rate_limit.settings, "RATE_LIMITS", {"bybit": "50/100", "janapw": "3/6", "default": "0"})
+    assert rate_limit._config_for(rate_limit._host("https://api.bybit.com/v5/x")) == (50.0, 100.0)
+    assert rate_limit._config_for(rate_limit._host("https://http-gateway1.janapw.com/api")) == (3.0, 6.0)
+    assert rate_limit._config_for(rate_limit._host("https://example.com/")) == (0.0, 1.0)
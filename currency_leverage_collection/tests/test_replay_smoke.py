@@ -0,0 +1,70 @@
+"""
+回放冒烟测试：在代码的临时副本中，先让抓取脚本对 dataGet/mock_server.py 录制夹具，
+再关掉模拟服务、以 HTTP_FIXTURE_MODE=replay 重跑，输出应与录制时一致（与 pipeline.bench 相同的隔离方式）。
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from dataGet import mock_server
+from pipeline import bench
+
+JOBS = {
+    "mexc": "dataGet.mexc_brackets_fetch",
+    "bybit": "dataGet.bybit_brackets_fetch",
+    "binance": "dataGet.binance_brackets_fetch",
+}
+
+
+def _run(module, app, env):
+    proc = subprocess.run([sys.executable, "-m", module], cwd=str(app), env=env,
+                          capture_output=True, text=True, timeout=180)
+    assert proc.returncode == 0, proc.stdout[-2000:] + proc.stderr[-2000:]
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = tmp_path / "app"
+    # 与 bench 相同：不带历史结果、抓取结果与已录制的夹具
+    shutil.copytree(bench.ROOT, app, ignore=bench._COPY_IGNORE)
+    return app
+
+
+def test_record_then_replay_against_mock(app, tmp_path):
+    srv = mock_server.serve(symbols=30, seed=1)
+    env = dict(os.environ)
+    env.update({
+        "MOCK_EXCHANGE_URL": srv.base_url,
+        "HTTP_FIXTURE_MODE": "record",
+        "HTTP_FIXTURE_DIR": str(tmp_path / "fixtures"),
+        "HTTP_FIXTURE_DELAY_SCALE": "0",
+        "PIPELINE_FORCE_REBUILD": "true",
+        "PYTHONPATH": str(app),
+    })
+    env.pop("PIPELINE_TRACE_FILE", None)
+    env.pop("PIPELINE_TRACE_PARENT", None)
+    try:
+        for module in JOBS.values():
+            _run(module, app, env)
+        assert sum(s["ok"] for s in srv.stats().values()) > 0
+    finally:
+        srv.shutdown()
+        srv.server_close()
+
+    outputs = {name: app / "data" / "dataGet_api" / name / f"{name}_selected.json" for name in JOBS}
+    recorded = {name: json.loads(p.read_text(encoding="utf-8")) for name, p in outputs.items()}
+    assert all(recorded.values())
+    for p in outputs.values():
+        p.unlink()
+
+    env["HTTP_FIXTURE_MODE"] = "replay"
+    for module in JOBS.values():
+        _run(module, app, env)
+    for name, p in outputs.items():
+        assert json.loads(p.read_text(encoding="utf-8")) == recorded[name], name
@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from dataGet.utils import retry_utils
+from dataGet.utils.fixtures import FixtureMissing
+from dataGet.utils.retry_utils import RetryBudget, RetryPolicy
+
+REQ = httpx.Request("GET", "https://example.com/")
+
+
+def _status(code, **headers):
+    resp = httpx.Response(code, headers=headers, request=REQ)
+    return httpx.HTTPStatusError(f"HTTP {code}", request=REQ, response=resp)
+
+
+@pytest.mark.parametrize("exc,kind", [
+    (_status(429), retry_utils.THROTTLED),
+    (_status(503, **{"retry-after": "2"}), retry_utils.THROTTLED),
+    (_status(503), retry_utils.SERVER),
+    (_status(500), retry_utils.SERVER),
+    (_status(408), retry_utils.TIMEOUT),
+    (_status(404), retry_utils.CLIENT),
+    (httpx.ReadTimeout("t", request=REQ), retry_utils.TIMEOUT),
+    (httpx.ConnectError("c", request=REQ), retry_utils.NETWORK),
+    (FixtureMissing("not recorded"), retry_utils.FATAL),
+    (json.JSONDecodeError("x", "doc", 0), retry_utils.DECODE),
+    (KeyError("k"), retry_utils.OTHER),
+])
+def test_classify(exc, kind):
+    assert retry_utils.classify(exc) == kind
+
+
+def _flaky(errors):
+    calls = []
+
+    def func():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return "ok"
+
+    return func, calls
+
+
+def test_retries_retryable_errors_until_success():
+    func, calls = _flaky([_status(500), httpx.ConnectError("c", request=REQ)])
+    policy = RetryPolicy(attempts=3, base=0.0, budget=RetryBudget(0))
+    assert policy.call(func) == "ok"
+    assert len(calls) == 3
+
+
+def test_client_errors_are_not_retried():
+    func, calls = _flaky([_status(404)])
+    with pytest.raises(httpx.HTTPStatusError):
+        RetryPolicy(attempts=5, base=0.0, budget=RetryBudget(0)).call(func)
+    assert len(calls) == 1
+
+
+def test_attempts_limit():
+    func, calls = _flaky([_status(500)] * 5)
+    with pytest.raises(httpx.HTTPStatusError):
+        RetryPolicy(attempts=2, base=0.0, budget=RetryBudget(0)).call(func)
+    assert len(calls) == 2
+
+
+def test_shared_budget_stops_retries():
+    budget = RetryBudget(2)
+    policy = RetryPolicy(attempts=10, base=0.0, budget=budget)
+    func, calls = _flaky([_status(502)] * 10)
+    with pytest.raises(httpx.HTTPStatusError):
+        policy.call(func)
+    assert len(calls) == 3 and budget.used == 2
+    func, calls = _flaky([_status(502)])
+    with pytest.raises(httpx.HTTPStatusError):
+        policy.call(func)
+    assert len(calls) == 1
+    budget.reset()
+    assert policy.call(_flaky([_status(502)])[0]) == "ok"
+
+
+def test_backoff_is_capped_and_honours_retry_after():
+    policy = RetryPolicy(attempts=10, base=1.0, cap=4.0, max_retry_after=30.0, budget=RetryBudget(0))
+    assert all(0.0 <= policy.next_delay(_status(500), n) <= min(4.0, 2 ** (n - 1)) for n in range(1, 9))
+    assert policy.next_delay(_status(429, **{"retry-after": "12"}), 1) >= 12.0
+    assert policy.next_delay(_status(429, **{"retry-after": "600"}), 1) == 30.0
+    assert policy.next_delay(_status(500), 10) is None
+
+
+def test_async_retrying():
+    func, calls = _flaky([httpx.ReadTimeout("t", request=REQ)])
+    policy = RetryPolicy(attempts=3, base=0.0, budget=RetryBudget(0))
+
+    async def run():
+        async for attempt in policy.aretrying():
+            with attempt:
+                return func()
+
+    assert asyncio.run(run()) == "ok"
+    assert len(calls) == 2
@@ -0,0 +1,29 @@
+import pytest
+
+from pipeline import runs
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    result = tmp_path / "result"
+    monkeypatch.setattr(runs, "RESULT_DIR", result)
+    monkeypatch.setattr(runs, "RUNS_DIR", result / "runs")
+    monkeypatch.setattr(runs, "POINTER_PATH", result / "latest.json")
+    monkeypatch.setattr(runs, "MIRROR_DIRS", {"table": result / "html", "suggest": result / "suggest"})
+    for run_id in ("20240101_000000", "20240101_010000", "20240101_020000"):
+        d = runs.new_run_dir(run_id)
+        (d / f"Leverage&Margin_{run_id}.json").write_text("[]", encoding="utf-8")
+    return result
+
+
+@pytest.mark.parametrize("keep", [0, -1])
+def test_compact_non_positive_keep_keeps_everything(tree, keep):
+    assert runs.compact(keep) == 0
+    assert len(list(runs.RUNS_DIR.iterdir())) == 3
+
+
+def test_compact_keeps_latest_and_pinned(tree):
+    old = runs.RUNS_DIR / "20240101_000000"
+    runs.publish("table", {"json": old / "Leverage&Margin_20240101_000000.json"}, mirror=("json",))
+    assert runs.compact(1) == 1
+    assert sorted(d.name for d in runs.RUNS_DIR.iterdir()) == ["20240101_000000", "20240101_020000"]
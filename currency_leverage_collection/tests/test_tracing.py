@@ -0,0 +1,67 @@
+import contextvars
+import json
+import os
+import threading
+
+import httpx
+import pytest
+
+from dataGet.utils import http_client
+from pipeline import tracing
+
+
+@pytest.fixture
+def trace_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_DIR", tmp_path)
+    monkeypatch.delenv(tracing.ENV_FILE, raising=False)
+    monkeypatch.delenv(tracing.ENV_PARENT, raising=False)
+    return tmp_path
+
+
+def _spans(path):
+    tracing._close()
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_request_error_emits_span(trace_dir):
+    def handler(request):
+        raise httpx.ConnectTimeout("timed out", request=request)
+
+    def go():
+        path = tracing.start_trace("err")
+        client = http_client._Client(event_hooks=tracing.httpx_hooks(), transport=httpx.MockTransport(handler))
+        with tracing.span("fetch", exchange="bybit"), pytest.raises(httpx.ConnectTimeout):
+            client.get("https://api.example.com/v5/x", extensions={"trace_attrs": {"symbol": "BTCUSDT"}})
+        return path
+
+    path = contextvars.copy_context().run(go)
+    http = [s for s in _spans(path) if s["name"].startswith("http ")]
+    assert len(http) == 1
+    assert http[0]["status"] == "error: ConnectTimeout"
+    assert http[0]["attrs"]["exchange"] == "bybit" and http[0]["attrs"]["symbol"] == "BTCUSDT"
+
+
+def test_trace_file_is_bound_per_run(trace_dir):
+    release = threading.Event()
+    done = threading.Event()
+
+    def straggler():
+        release.wait(timeout=5)
+        with tracing.span("late"):
+            pass
+        done.set()
+
+    def go():
+        first = tracing.start_trace("first")
+        threading.Thread(target=tracing.wrap(straggler), daemon=True).start()
+        second = tracing.start_trace("second")
+        with tracing.span("next_run"):
+            pass
+        release.set()
+        assert done.wait(timeout=5)
+        return first, second
+
+    first, second = contextvars.copy_context().run(go)
+    assert [s["name"] for s in _spans(first)] == ["late"]
+    assert [s["name"] for s in _spans(second)] == ["next_run"]
+    assert tracing.ENV_FILE not in os.environ
@@ -0,0 +1,87 @@
+import json
+import time
+
+import pytest
+
+from dataGet import weex_brackets_fetch as weex
+from dataGet.mock_server import MockData
+
+PAGE = (
+    '<div class="head"><span class="coin-pair"> COMP/USDT <i class="el-icon-arrow-down"></i></span></div>'
+    '<ul class="list-settle">'
+    '<li class="list-title"><span>档位</span><span>持仓数量（USDT）</span><span>最高杠杆</span><span>维持保证金率</span></li>'
+    '<li><span>1</span><span>0 ~ 20,000</span><span>50x</span><span>1.00%</span></li>'
+    '<li><span>2</span><span>20,001 ~ 100,000</span><span>25x</span><span>2.00%</span></li>'
+    '<li><span>3</span><span>&nbsp;x</span></li>'
+    '</ul>'
+)
+
+
+def test_parse_ul_rows_and_numbers():
+    rows = weex._parse_ul(PAGE, "COMP")
+    assert [r["lv"] for r in rows[:2]] == ["1", "2"]
+    assert rows[1] == {
+        "lv": "2", "range": "20,001 ~ 100,000", "mlev": "25x", "mmr": "2.00%",
+        "lev": 25.0, "notional_min": 20001.0, "notional_max": 100000.0, "mmr_rate": 0.02,
+    }
+    assert rows[2] == {"col0": "3", "col1": "x"}
+    assert weex._rendered(rows)
+
+
+def test_parse_ul_rejects_other_pair():
+    # 服务端忽略 ?code= 渲染了别的合约时不能当作目标币对的档位
+    assert weex._parse_ul(PAGE, "BTC") == []
+    assert weex._parse_ul(PAGE.replace("coin-pair", "coin-name"), "COMP") == []
+    assert weex._parse_ul(PAGE) != []  # 不给 base 时不检查标签
+    assert weex._parse_ul("<html></html>", "COMP") == []
+
+
+def test_parse_ul_mock_page():
+    data = MockData(["BTC", "ETH"])
+    _status, html = data.weex_page({"code": "cmt_ethusdt"})
+    rows = weex._parse_ul(html, "ETH")
+    assert rows and all("~" in r["range"] and r["mmr"].endswith("%") for r in rows)
+    _status, fallback = data.weex_page({"code": "cmt_nopeusdt"})
+    assert weex._parse_ul(fallback, "NOPE") == []
+
+
+class _Driver:
+    """只实现 _capture_tiers 用到的两个方法：性能日志与 Network.getResponseBody。"""
+
+    def __init__(self, body):
+        url = "https://http-gateway1.janapw.com" + weex.CAPTURE_PATHS[0]
+        events = [
+            {"method": "Network.responseReceived", "params": {"requestId": "1", "response": {"url": url}}},
+            {"method": "Network.loadingFinished", "params": {"requestId": "1"}},
+        ]
+        self.logs = [[{"message": json.dumps({"message": e})} for e in events]]
+        self.body = body
+
+    def get_log(self, _kind):
+        return self.logs.pop(0) if self.logs else []
+
+    def execute_cdp_cmd(self, _cmd, _params):
+        return {"body": self.body, "base64Encoded": False}
+
+
+def test_capture_returns_tiers_from_response():
+    body = json.dumps(weex.load_api_fixture())
+    tiers = weex._capture_tiers(_Driver(body), timeout=5)
+    assert tiers["BTCUSDT"][0]["mlev"] == "400x"
+
+
+@pytest.mark.parametrize("body", ["<html>blocked</html>", json.dumps({"data": {"list": []}}), json.dumps({"data": {"contractList": []}})])
+def test_capture_gives_up_on_unparsable_response(body):
+    t0 = time.perf_counter()
+    assert weex._capture_tiers(_Driver(body), timeout=5) is None
+    assert time.perf_counter() - t0 < 1  # 不等满超时
+
+
+def test_schema_verified_requires_recording(tmp_path, monkeypatch):
+    fixture = tmp_path / "meta.json"
+    monkeypatch.setattr(weex, "API_FIXTURE", fixture)
+    assert not weex.schema_verified()
+    fixture.write_text(json.dumps({"recorded_at": None, "placeholder": True, "response": {}}), encoding="utf-8")
+    assert not weex.schema_verified()
+    fixture.write_text(json.dumps({"recorded_at": "2026-10-16 12:00:00", "response": {}}), encoding="utf-8")
+    assert weex.schema_verified()